@@ -6,14 +6,29 @@
 .. moduleauthor:: Scott W. Fleming <fleming@stsci.edu>
 """
 
+import csv
+import hashlib
 import os
+import sys
+import tempfile
 import unittest
+import unittest.mock
+import pandas as pd
 from check_file_names import read_known_missions, read_known_filters
-from check_dirpath_lower import check_dirpath_lower
-from check_file_compliance import check_file_compliance
+from check_dirpath_lower import check_dirpath_lower, check_dirs_lower
+from check_file_compliance import (check_file_compliance, check_unique_values,
+                                   parse_file_names)
 from check_in_known_filters import check_in_known_filters
 from check_in_known_missions import check_in_known_missions
 from check_is_version_string import check_is_version_string
+from get_all_files import get_all_files
+from make_checksums import compute_checksums, write_checksums
+
+sys.path.append("../")
+from bin.hash_files import hash_files
+from bin.scan_files import scan_files
+from lib.FileInventory import FileInventory
+from lib.FileManifest import FileManifest
 
 #--------------------
 
@@ -80,6 +95,16 @@ class TestCheckDirpathLower(unittest.TestCase):
             self.assertIn(self.check_string_1, context_manager.output)
             self.assertIn(self.check_string_2, context_manager.output)
 
+    def test_dirs_not_lower_root(self):
+        """ Test case of a list of unique directories, where the root
+        directory is skipped. """
+        dir_list = ['/Root/all_lower', '/Root/All_lower']
+        with self.assertLogs(level="DEBUG") as context_manager:
+            check_dirs_lower(dir_list, '/Root')
+            self.assertEqual(context_manager.output,
+                             ["WARNING:root:Subdirectory is not all "
+                              "lowercase: /All_lower"])
+
 #--------------------
 
 class TestCheckFileCompliance(unittest.TestCase):
@@ -250,6 +275,73 @@ class TestCheckFileCompliance(unittest.TestCase):
             self.assertEqual(context_manager.output[0],
                              self.bad_file_part8_string)
 
+    def test_multi_bad_order(self):
+        """ Test case of several bad files, where the warnings should come in
+        the order the files were given. """
+        file_list = [self.bad_part6_file, self.good_file_1,
+                     self.bad_part3_file, self.bad_fields_file]
+        with self.assertLogs(level="DEBUG") as context_manager:
+            results = check_file_compliance(file_list, self.mission,
+                                            self.known_missions,
+                                            self.known_filters, None, None)
+        self.assertEqual(context_manager.output,
+                         [self.bad_file_part6_string,
+                          self.bad_file_part3_string,
+                          self.bad_file_fields_string])
+        self.assertNotIn(self.good_file_1, results)
+
+    def test_parse_file_names(self):
+        """ Test that file names are split into one column per field. """
+        table = parse_file_names([self.good_file_2, self.bad_fields_file])
+        self.assertEqual(list(table["n_fields"]), [8, 9])
+        self.assertEqual(table["instrument"][0], "wfc3ir-30mas")
+        self.assertEqual(table["filter"][0], "f105w")
+        self.assertTrue(table["filter"].isna()[1])
+
+    def test_unique_values(self):
+        """ Test that each unique field value is only checked once. """
+        seen = []
+
+        def check(val):
+            seen.append(val)
+            return val == "k2"
+
+        table = parse_file_names([self.good_file_1, self.bad_part3_file,
+                                  self.good_file_1, self.bad_fields_file])
+        passed = check_unique_values(table["mission"], check)
+        self.assertEqual(sorted(seen), ["bad", "k2"])
+        self.assertEqual(list(passed), [True, False, True, True])
+        self.assertIsInstance(table["mission"].dtype, pd.CategoricalDtype)
+
+    def test_inventory(self):
+        """ Test that an inventory gives the same warnings as its list of
+        paths, with or without cached results. """
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "sub"))
+            for ifile in [self.bad_part6_file, self.good_file_1,
+                          self.bad_fields_file]:
+                name = os.path.basename(ifile)
+                open(os.path.join(root, name), 'w').close()
+                open(os.path.join(root, "sub", name), 'w').close()
+            inventory = FileInventory(root)
+            paths = inventory.paths()
+            cached = {paths[0]: ["Cached warning."]}
+
+            for kwargs in [{}, {"cached": cached}]:
+                with self.assertLogs(level="DEBUG") as expected_logs:
+                    expected = check_file_compliance(
+                        paths, self.mission, self.known_missions,
+                        self.known_filters, None, None, **kwargs)
+                with self.assertLogs(level="DEBUG") as context_manager:
+                    results = check_file_compliance(
+                        inventory, self.mission, self.known_missions,
+                        self.known_filters, None, None, **kwargs)
+                self.assertEqual(results, expected)
+                self.assertEqual(context_manager.output,
+                                 expected_logs.output)
+            self.assertEqual(len(results), 4)
+            self.assertEqual(results[paths[0]], ["Cached warning."])
+
 
 #--------------------
 
@@ -373,5 +465,296 @@ class TestIsVersionString(unittest.TestCase):
 
 #--------------------
 
+class TestGetAllFiles(unittest.TestCase):
+    """ Main test class for get_all_files module. """
+
+    def setUp(self):
+        """ Build a small directory tree with links to walk. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        os.makedirs(os.path.join(self.root, "sub", "deeper"))
+        self.file_1 = os.path.join(self.root, "file_1.txt")
+        self.file_2 = os.path.join(self.root, "sub", "deeper", "file_2.txt")
+        for name in [self.file_1, self.file_2]:
+            with open(name, 'w') as ofile:
+                ofile.write("test")
+        # A symbolic link to a file, a hard link to a file, and a symbolic
+        # link pointing back up the tree.
+        self.sym_file = os.path.join(self.root, "sub", "sym_1.txt")
+        os.symlink(self.file_1, self.sym_file)
+        self.hard_file = os.path.join(self.root, "sub", "hard_2.txt")
+        os.link(self.file_2, self.hard_file)
+        os.symlink(self.root, os.path.join(self.root, "sub", "loop"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_all_files(self):
+        """ Test that files and symbolic links to files are all found. """
+        found = get_all_files(self.root)
+        self.assertEqual(sorted(found), sorted([self.file_1, self.file_2,
+                                                self.sym_file,
+                                                self.hard_file]))
+
+    def test_skip_sym(self):
+        """ Test that symbolic links to files are skipped if requested. """
+        found = get_all_files(self.root, skip_sym=True)
+        self.assertNotIn(self.sym_file, found)
+        self.assertEqual(len(found), 3)
+
+    def test_link_loop(self):
+        """ Test that following links does not loop forever. """
+        with self.assertLogs(level="WARNING") as context_manager:
+            found = list(scan_files(self.root, follow_links=True))
+        self.assertEqual(len(found), 4)
+        self.assertIn("Symbolic link loop skipped", context_manager.output[0])
+
+    def test_removed_during_scan(self):
+        """ Test that a file removed between listing its directory and
+        reading its size is skipped, rather than stopping the scan. """
+        real_scandir = os.scandir
+
+        class Removed(object):
+            def __init__(self, entry):
+                self._entry = entry
+
+            def __getattr__(self, name):
+                return getattr(self._entry, name)
+
+            def stat(self, follow_symlinks=True):
+                raise FileNotFoundError(self._entry.path)
+
+        class Listing(object):
+            def __init__(self, path):
+                self._entries = real_scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self._entries.close()
+
+            def __iter__(self):
+                for entry in self._entries:
+                    yield (Removed(entry) if entry.name == "file_1.txt"
+                           else entry)
+
+        with unittest.mock.patch("os.scandir", Listing):
+            with self.assertLogs(level="WARNING") as context_manager:
+                found = list(scan_files(self.root))
+        self.assertEqual(sorted(x.name for x in found),
+                         ["file_2.txt", "hard_2.txt", "sym_1.txt"])
+        self.assertIn("Could not read file " + self.file_1,
+                      context_manager.output[0])
+
+    def test_hard_link_duplicate(self):
+        """ Test that hard-linked copies of a file are flagged. """
+        found = list(scan_files(self.root))
+        duplicates = [x for x in found if x.duplicate_of]
+        self.assertEqual(len(duplicates), 1)
+        self.assertIn(duplicates[0].path, [self.file_2, self.hard_file])
+        self.assertEqual(duplicates[0].size, 4)
+
+    def test_order(self):
+        """ Test that files come back breadth first and in name order, however
+        many threads read the directories. """
+        for name in ["zzz_other.txt", "aaa_other.txt"]:
+            with open(os.path.join(self.root, name), 'w') as ofile:
+                ofile.write("test")
+        expected = [os.path.join(self.root, "aaa_other.txt"), self.file_1,
+                    os.path.join(self.root, "zzz_other.txt"),
+                    self.hard_file, self.sym_file, self.file_2]
+        for workers in [1, 4]:
+            found = list(scan_files(self.root, workers=workers))
+            self.assertEqual([x.path for x in found], expected)
+            self.assertEqual(found[-1].duplicate_of, self.hard_file)
+
+    def test_inventory(self):
+        """ Test that a file inventory matches a walk of the directory. """
+        inventory = FileInventory(self.root)
+        self.assertEqual(sorted(inventory.paths()),
+                         sorted(get_all_files(self.root)))
+        self.assertEqual(inventory.endings(), {"1.txt", "2.txt"})
+        selected = list(inventory.with_endings(["2.txt"]))
+        self.assertEqual(len(selected), 2)
+        self.assertEqual(selected[0].fields[0], selected[0].name.split("_")[0])
+        self.assertEqual(selected[0].size, 4)
+
+    def test_inventory_directories(self):
+        """ Test that each directory holding files is stored once. """
+        inventory = FileInventory(self.root)
+        self.assertEqual(sorted(inventory.directories()),
+                         sorted([self.root, os.path.join(self.root, "sub"),
+                                 os.path.join(self.root, "sub", "deeper")]))
+        for rec in inventory:
+            self.assertEqual(rec.path, os.path.join(rec.dirpath, rec.name))
+
+#--------------------
+
+class TestFileManifest(unittest.TestCase):
+    """ Main test class for the FileManifest used by incremental checks. """
+
+    def setUp(self):
+        """ Build a small directory and an empty manifest. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(self.root)
+        self.file_1 = os.path.join(self.root, "file_1.txt")
+        self.file_2 = os.path.join(self.root, "file_2.txt")
+        for name in [self.file_1, self.file_2]:
+            with open(name, 'w') as ofile:
+                ofile.write("test")
+        self.manifest = FileManifest(os.path.join(self.tmp_dir.name, "test"))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp_dir.cleanup()
+
+    def _run_check(self, signature="a"):
+        """ Split a fresh inventory and store a result for each file. """
+        to_check, cached, removed = self.manifest.split(
+            FileInventory(self.root), "test_step", signature)
+        results = {rec.path: ["checked " + rec.name] for rec in to_check}
+        self.manifest.update("test_step", to_check, results)
+        return to_check, cached, removed
+
+    def test_unchanged(self):
+        """ Test that unchanged files reuse their stored results. """
+        self._run_check()
+        to_check, cached, removed = self._run_check()
+        self.assertEqual(to_check, [])
+        self.assertEqual(cached[self.file_1], ["checked file_1.txt"])
+
+    def test_changed_added_removed(self):
+        """ Test that only changed and added files are checked again. """
+        self._run_check()
+        with open(self.file_1, 'a') as ofile:
+            ofile.write("more")
+        os.remove(self.file_2)
+        file_3 = os.path.join(self.root, "file_3.txt")
+        with open(file_3, 'w') as ofile:
+            ofile.write("test")
+        to_check, cached, removed = self._run_check()
+        self.assertEqual(sorted(x.path for x in to_check),
+                         [self.file_1, file_3])
+        self.assertEqual(cached, {})
+        self.assertEqual(removed, [self.file_2])
+
+    def test_new_signature(self):
+        """ Test that changed check settings invalidate stored results. """
+        self._run_check()
+        to_check, cached, removed = self._run_check(signature="b")
+        self.assertEqual(len(to_check), 2)
+        self.assertEqual(cached, {})
+
+    def test_hdu_indexes(self):
+        """ Test that HDU offsets are only returned for unchanged files. """
+        records = list(FileInventory(self.root))
+        self.manifest.update_hdu_indexes(
+            records, {self.file_1: [(0, 2880), (5760, 8640)],
+                      self.file_2: []})
+        self.assertEqual(self.manifest.get_hdu_indexes(records),
+                         {self.file_1: [(0, 2880), (5760, 8640)]})
+        with open(self.file_1, 'a') as ofile:
+            ofile.write("more")
+        self.assertEqual(
+            self.manifest.get_hdu_indexes(FileInventory(self.root)), {})
+
+    def test_cached_compliance(self):
+        """ Test that cached file name warnings are logged as-is. """
+        cached = {self.file_1: ["cached warning"]}
+        with self.assertLogs(level="DEBUG") as context_manager:
+            results = check_file_compliance([self.file_1], "test", set(),
+                                            set(), None, None, cached=cached)
+        self.assertEqual(context_manager.output,
+                         ["WARNING:root:cached warning"])
+        self.assertEqual(results, cached)
+
+#--------------------
+
+class TestChecksums(unittest.TestCase):
+    """ Main test class for computing and reusing file checksums. """
+
+    def setUp(self):
+        """ Build a small directory and an empty manifest. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(os.path.join(self.root, "sub"))
+        self.contents = {"empty.txt": b"",
+                         "small.txt": b"test",
+                         os.path.join("sub", "large.fits"):
+                         bytes(range(256)) * 100,
+                         }
+        for name, data in self.contents.items():
+            with open(os.path.join(self.root, name), 'wb') as ofile:
+                ofile.write(data)
+        self.manifest = FileManifest(os.path.join(self.tmp_dir.name, "test"))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp_dir.cleanup()
+
+    def test_hash_files(self):
+        """ Test that digests match hashlib, reading in small blocks. """
+        paths = [os.path.join(self.root, name) for name in self.contents]
+        missing = os.path.join(self.root, "missing.txt")
+        with self.assertLogs(level="WARNING"):
+            results = dict(hash_files(paths + [missing], block_size=1000,
+                                      workers=2))
+        self.assertIsNone(results.pop(missing))
+        for name, data in self.contents.items():
+            self.assertEqual(results[os.path.join(self.root, name)],
+                             (hashlib.md5(data).hexdigest(),
+                              hashlib.sha256(data).hexdigest()))
+
+    def test_reuse(self):
+        """ Test that only changed files are hashed again. """
+        checksums, hashed = compute_checksums(FileInventory(self.root),
+                                              self.manifest)
+        self.assertEqual(len(hashed), 3)
+        small = os.path.join(self.root, "small.txt")
+        with open(small, 'ab') as ofile:
+            ofile.write(b"more")
+        new_checksums, hashed = compute_checksums(FileInventory(self.root),
+                                                  self.manifest)
+        self.assertEqual([rec.path for rec in hashed], [small])
+        self.assertNotEqual(new_checksums[small], checksums[small])
+        checksums.pop(small)
+        new_checksums.pop(small)
+        self.assertEqual(new_checksums, checksums)
+        checksums, hashed = compute_checksums(FileInventory(self.root),
+                                              self.manifest, reuse=False)
+        self.assertEqual(len(hashed), 3)
+
+    def test_write(self):
+        """ Test the rows of the checksum manifest. """
+        inventory = FileInventory(self.root)
+        checksums, hashed = compute_checksums(inventory)
+        output = os.path.join(self.tmp_dir.name, "test.checksums.csv")
+        write_checksums(checksums, inventory, self.root, output)
+        with open(output, 'r', newline='') as ifile:
+            rows = list(csv.reader(ifile))
+        self.assertEqual(rows[0], ["path", "size", "md5", "sha256"])
+        self.assertEqual([row[0] for row in rows[1:]],
+                         sorted(self.contents))
+        self.assertEqual(rows[1][1:], ["0", hashlib.md5(b"").hexdigest(),
+                                       hashlib.sha256(b"").hexdigest()])
+
+    def test_no_stat(self):
+        """ Test that files without a size or modification time are hashed,
+        but not stored in the manifest. """
+        records = [rec._replace(size=None, mtime=None)
+                   for rec in FileInventory(self.root)]
+        checksums, hashed = compute_checksums(records, self.manifest)
+        self.assertEqual(len(checksums), 3)
+        self.assertEqual(self.manifest.get_checksums(records), {})
+        output = os.path.join(self.tmp_dir.name, "test.checksums.csv")
+        write_checksums(checksums, records, self.root, output)
+        with open(output, 'r', newline='') as ifile:
+            rows = list(csv.reader(ifile))
+        self.assertEqual([row[1] for row in rows[1:]], [""] * 3)
+
+#--------------------
+
 if __name__ == "__main__":
     unittest.main()
@@ -24,13 +24,31 @@ def check_dirpath_lower(file_list, root_dir):
     :type root_dir: str
     """
 
-    # Get a unique list of directory paths.  Removes the root directory if
-    # present.
+    # Get a unique list of directory paths.
+    check_dirs_lower(set([os.path.dirname(x) for x in file_list]), root_dir)
+
+#--------------------
+
+def check_dirs_lower(dir_list, root_dir):
+    """
+    Checks if directory paths are all lowercase, given a list of the unique
+        directories (such as from a FileInventory).  Each directory is only
+        checked once, however many files it holds.
+
+    :param dir_list: The list of directories to check.
+
+    :type dir_list: list
+
+    :param root_dir: Optional root directory to skip when checking compliance.
+
+    :type root_dir: str
+    """
+
+    # Removes the root directory if present.
     if root_dir:
-        unique_dirs = set([os.path.dirname(x).replace(root_dir, '')
-                           for x in file_list])
+        unique_dirs = set([x.replace(root_dir, '') for x in dir_list])
     else:
-        unique_dirs = set([os.path.dirname(x) for x in file_list])
+        unique_dirs = set(dir_list)
 
     # Check for any subdirectories that are not lowercase.
     failed_dirs = list(filter(lambda x: not x.islower(), unique_dirs))
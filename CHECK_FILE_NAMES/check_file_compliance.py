@@ -7,23 +7,162 @@
 """
 
 import logging
+import numpy
 import os
+import pandas as pd
 
 from check_in_known_missions import check_in_known_missions
 from check_in_known_filters import check_in_known_filters
 from check_is_version_string import check_is_version_string
 
+# The "fields" (strings separated by an underscore) expected in a file name,
+# in order.
+FIELD_NAMES = ["hlsp", "project", "mission", "instrument", "target", "filter",
+               "version", "product_ext"]
+
+# --------------------
+
+
+def check_product_extension(istring):
+    """
+    Checks if the eighth field of a file name has a <product>.<extension>
+        format.
+
+    :param istring: The string to check.
+
+    :type istring: str
+
+    :returns: bool - True if in the expected format, false otherwise.
+    """
+
+    # This is fairly free-form, but generally must be <x>.<y>.  An exception
+    # is if a file is gzipped, in which case the format is <x>.<y>.gz.
+    prod_ext_str = istring
+    if istring[-3:] == '.gz':
+        prod_ext_str = prod_ext_str.strip('.gz')
+    return len(prod_ext_str.split('.')) >= 2
+
+# --------------------
+
+
+def check_unique_values(values, check):
+    """
+    Runs a check once for each unique value in a column of file name fields,
+        and broadcasts the results back to every file.
+
+    :param values: One field of every file name.
+
+    :type values: pandas.Series
+
+    :param check: The check to run, taking a single value and returning a
+        bool.
+
+    :type check: function
+
+    :returns: pandas.Series -- The result of the check for every file.  Empty
+        values always pass.
+    """
+
+    # A categorical column already holds each unique value once, so the
+    # results are looked up by category code.  A code of -1 is empty.
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        results = numpy.array([check(val) for val in
+                               values.cat.categories] + [True], dtype=bool)
+        return pd.Series(results[codes], index=values.index)
+
+    results = {val: check(val) for val in values.dropna().unique()}
+    passed = values.map(results)
+    return passed.where(values.notna(), True).astype(bool)
+
+# --------------------
+
+
+def get_file_names(file_list):
+    """
+    Returns the name of every file, and a function giving the full path of
+        the file at a position in the list.  A FileInventory keeps names
+        apart from their directories, so its paths are only joined for the
+        files that need one.
+
+    :param file_list: The HLSP files, as a FileInventory or a list of paths.
+
+    :type file_list: list or lib.FileInventory.FileInventory
+
+    :returns: tuple -- The list of file names, and the function.
+    """
+
+    if hasattr(file_list, "names") and hasattr(file_list, "path"):
+        return file_list.names(), file_list.path
+
+    paths = list(file_list)
+    return [ifile.rpartition(os.sep)[2] for ifile in paths], paths.__getitem__
+
+# --------------------
+
+
+def parse_file_names(file_list, rows=None):
+    """
+    Splits all file names at once into a table, with one column for each of
+        the FIELD_NAMES.  Files that do not have the expected number of
+        fields are given empty values.  The fields are stored as categoricals,
+        so a value shared by many files, like the mission, is only kept once.
+
+    :param file_list: The HLSP files to parse, as a FileInventory or a list
+        of paths.
+
+    :type file_list: list or lib.FileInventory.FileInventory
+
+    :param rows: Optional positions in file_list of the files to parse.  By
+        default every file is parsed.
+
+    :type rows: list
+
+    :returns: pandas.DataFrame -- The file name, number of fields, and each
+        field of every file, indexed by position in file_list.
+    """
+
+    names = get_file_names(file_list)[0]
+    if rows is None:
+        rows = range(len(names))
+    else:
+        names = [names[ii] for ii in rows]
+    n_fields = numpy.array([name.count('_') for name in names], dtype=int) + 1
+
+    table = pd.DataFrame({"name": pd.Series(names, dtype=object),
+                          "n_fields": n_fields,
+                          })
+    table.index = pd.Index(rows)
+
+    # Names with the expected number of fields are joined and split in one
+    # go, and every n-th value then belongs to the same field.  This avoids
+    # making a list of fields for each file.
+    n_expected = len(FIELD_NAMES)
+    expected = numpy.flatnonzero(n_fields == n_expected)
+    all_fields = "_".join([names[ii] for ii in expected]).split('_')
+    for ii, field in enumerate(FIELD_NAMES):
+        values = numpy.full(len(names), None, dtype=object)
+        if len(expected) > 0:
+            values[expected] = all_fields[ii::n_expected]
+        table[field] = pd.Categorical(values)
+
+    return table
+
 # --------------------
 
 
 def check_file_compliance(file_list, hlsp_name, known_missions, known_filters,
-                          exclude_missions, exclude_filters):
+                          exclude_missions, exclude_filters, cached=None):
     """
-    Checks if file names satisfy MAST HLSP requirements.
+    Checks if file names satisfy MAST HLSP requirements.  All file names are
+        parsed together, and each unique value of a field is only checked
+        once.
 
-    :param file_list: The list of HLSP files to check.
+    :param file_list: The HLSP files to check, as a FileInventory or a list
+        of paths.  Full paths are only built for files that are reported or
+        have to be looked up in cached.
 
-    :type file_list: list
+    :type file_list: list or lib.FileInventory.FileInventory
 
     :param hlsp_name: The name of the HLSP.
 
@@ -48,66 +187,142 @@ def check_file_compliance(file_list, hlsp_name, known_missions, known_filters,
         the file names that will be temporarily accepted (for this run only).
 
     :type exclude_filters: list
+
+    :param cached: Optional warnings from an earlier run, keyed by file.
+        These files are not checked again, their warnings are logged as-is.
+
+    :type cached: dict
+
+    :returns: dict -- The warnings logged for each file with any warnings.
     """
 
-    # This controls how many "fields" (strings separated by an underscore) are
-    # expected.
-    n_fields_expected = 8
+    if cached is None:
+        cached = {}
 
-    for ifile in file_list:
-        ifile_base = os.path.basename(ifile)
+    if not hasattr(file_list, "path"):
+        file_list = list(file_list)
+    path_of = get_file_names(file_list)[1]
 
-        # Check that the file name is all lowercase.
-        if not ifile_base.islower():
-            logging.warning("File is not all lowercase: " + ifile)
+    # Check the files without cached results all together.
+    to_check = None
+    if cached:
+        to_check = [ii for ii in range(len(file_list))
+                    if path_of(ii) not in cached]
+    checked = check_file_names_table(parse_file_names(file_list, to_check),
+                                     path_of, hlsp_name, known_missions,
+                                     known_filters, exclude_missions,
+                                     exclude_filters)
+
+    # Log the warnings in the order the files were given.  Only files with
+    # warnings need to be visited.
+    results = {}
+    order = (map(path_of, range(len(file_list))) if cached else checked)
+    for ifile in order:
+        warnings = cached.get(ifile) or checked.get(ifile)
+        if warnings:
+            for msg in warnings:
+                logging.warning(msg)
+            results[ifile] = warnings
+
+    return results
 
+# --------------------
+
+
+def check_file_names_table(table, path_of, hlsp_name, known_missions,
+                           known_filters, exclude_missions, exclude_filters):
+    """
+    Checks a table of file names made by parse_file_names, and returns a
+        dictionary of warnings for each file that fails a check, keyed by
+        path.  See check_file_compliance for the other parameters.
+
+    :param table: The parsed file names to check.
+
+    :type table: pandas.DataFrame
+
+    :param path_of: Gives the full path of a file from its index in table.
+        It is only called for files that fail a check.
+
+    :type path_of: function
+    """
+
+    n_fields_expected = len(FIELD_NAMES)
+
+    # Add any values to temporarily accept to the known values just once,
+    # rather than for each file.
+    if exclude_missions:
+        known_missions = known_missions.union(exclude_missions)
+    if exclude_filters:
+        known_filters = known_filters.union(exclude_filters)
+
+    def in_missions(val):
+        return check_in_known_missions(val, known_missions, None)
+
+    def in_filters(val):
+        return check_in_known_filters(val, known_filters, None)
+
+    # Run each check over the whole table.  Fields of names without the
+    # expected number of fields are empty, and never fail a check.
+    fields_ok = (table["n_fields"] == n_fields_expected)
+    bad = pd.DataFrame({
+        # Check that the file name is all lowercase.
+        "lower": ~table["name"].str.islower().astype(bool),
         # Check that this file has the corret number of fields.
-        splits = ifile_base.split('_')
+        "fields": ~fields_ok,
+        # Check the first field is "hlsp"
+        "hlsp": fields_ok & (table["hlsp"] != "hlsp"),
+        # Check that the second field matches the HLSP name.
+        "project": fields_ok & (table["project"] != hlsp_name),
+        # Check that the third field is in the list of known missions.
+        "mission": fields_ok & ~check_unique_values(table["mission"],
+                                                    in_missions),
+        # The fourth field is the instrument part, but can also include other
+        # data like "resolution", etc.  No specific checks for this.
+
+        # The fifth field is the target name part, and is by definition very
+        # free-form.  No specific checks for this.
 
-        if len(splits) != n_fields_expected:
-            logging.warning("File does not have " + str(n_fields_expected) +
+        # Check that the sixth field is in the list of known filters.
+        "filter": fields_ok & ~check_unique_values(table["filter"],
+                                                   in_filters),
+        # Check that the seventh field looks like a version number.
+        "version": fields_ok & ~check_unique_values(table["version"],
+                                                    check_is_version_string),
+        # The eighth field is a product and extension piece.
+        "product_ext": fields_ok & ~check_unique_values(
+            table["product_ext"], check_product_extension),
+        }, index=table.index)
+
+    # Only the files that failed a check need their warnings written out.
+    failed = bad.any(axis=1)
+    results = {}
+    for row, flags in zip(table[failed].itertuples(),
+                          bad[failed].itertuples(index=False)):
+        ifile = path_of(row.Index)
+        warnings = []
+        if flags.lower:
+            warnings.append("File is not all lowercase: " + ifile)
+        if flags.fields:
+            warnings.append("File does not have " + str(n_fields_expected) +
                             " parts: " + ifile)
-        else:
-            # Check the first field is "hlsp"
-            if splits[0] != "hlsp":
-                logging.warning('Field 1 is not "hlsp": ' + ifile)
-
-            # Check that the second field matches the HLSP name.
-            if splits[1] != hlsp_name:
-                logging.warning('Field 2 is not "' + hlsp_name + '": ' + ifile)
-
-            # Check that the third field is in the list of known missions.
-            if not check_in_known_missions(splits[2], known_missions,
-                                           exclude_missions):
-                logging.warning('Field 3 ("' + splits[2] + '") is not in list '
-                                'of known missions: ' + ifile)
-
-            # The fourth field is the instrument part, but can also include other
-            # data like "resolution", etc.  No specific checks for this.
-
-            # The fifth field is the target name part, and is by definition very
-            # free-form.  No specific checks for this.
-
-            # Check that the sixth field is in the list of known filters.
-            if not check_in_known_filters(splits[5], known_filters,
-                                          exclude_filters):
-                logging.warning('Field 6 ("' + splits[5] + '") is not in list '
-                                'of known filters: ' + ifile)
-
-            # Check that the seventh field looks like a version number.
-            if not check_is_version_string(splits[6]):
-                logging.warning('Field 7 does not appear to be a valid version'
-                                ' string: ' + ifile)
-
-            # The eighth field is a product and extension piece.  This is fairly
-            # free-form, but generally must be <x>.<y>.  An exception is if a
-            # file is gzipped, in which case the format is <x>.<y>.gz.
-            prod_ext_str = splits[7]
-            if splits[7][-3:] == '.gz':
-                prod_ext_str = prod_ext_str.strip('.gz')
-            product_extension_splits = prod_ext_str.split('.')
-            if len(product_extension_splits) < 2:
-                logging.warning('Field 8 does not have <product>.<extension> '
-                                'format: ' + ifile)
+        if flags.hlsp:
+            warnings.append('Field 1 is not "hlsp": ' + ifile)
+        if flags.project:
+            warnings.append('Field 2 is not "' + hlsp_name + '": ' + ifile)
+        if flags.mission:
+            warnings.append('Field 3 ("' + row.mission + '") is not in list '
+                            'of known missions: ' + ifile)
+        if flags.filter:
+            warnings.append('Field 6 ("' + row.filter + '") is not in list '
+                            'of known filters: ' + ifile)
+        if flags.version:
+            warnings.append('Field 7 does not appear to be a valid version'
+                            ' string: ' + ifile)
+        if flags.product_ext:
+            warnings.append('Field 8 does not have <product>.<extension> '
+                            'format: ' + ifile)
+        results[ifile] = warnings
+
+    return results
 
 # --------------------
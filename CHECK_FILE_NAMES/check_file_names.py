@@ -17,9 +17,9 @@ import sys
 
 sys.path.append("../")
 from bin.new_logger import new_logger
-from check_dirpath_lower import check_dirpath_lower
+from check_dirpath_lower import check_dirs_lower
 from check_file_compliance import check_file_compliance
-from get_all_files import get_all_files
+from make_checksums import make_checksums
 from lib.HLSPFile import HLSPFile
 
 # This file contains a list of known values for the "mission" part of a MAST
@@ -27,6 +27,9 @@ from lib.HLSPFile import HLSPFile
 KNOWN_MISSIONS_FILE = "known_missions.dat"
 KNOWN_FILTERS_FILE = "known_filters.dat"
 
+# Results of this step are stored in the HLSP file manifest under this name.
+MANIFEST_STEP = "check_file_names"
+
 # CURRENT_DIR will allow this script to find the .dat files when run from
 # outside the CHECK_FILE_NAMES directory as well.
 CURRENT_DIR = os.path.dirname(__file__)
@@ -61,7 +64,8 @@ def read_known_filters():
 
 
 def check_file_names(idir, hlsp_name, root_dir="", exclude_missions=None,
-                     exclude_filters=None, skip_sym=False):
+                     exclude_filters=None, skip_sym=False, inventory=None,
+                     incremental=True, checksums=False):
     """
     Checks all files contained below this directory for MAST HLSP compliance.
 
@@ -90,6 +94,23 @@ def check_file_names(idir, hlsp_name, root_dir="", exclude_missions=None,
     :param skip_sym: If True, will ignore symbolic links.
 
     :type skip_sym: Boolean
+
+    :param inventory: Optional inventory of idir to check.  If not provided,
+        idir is walked once here.  Either way the inventory is attached to
+        the HLSPFile, so later ingestion steps can reuse it.
+
+    :type inventory: lib.FileInventory.FileInventory
+
+    :param incremental: If True, only files that were changed or added since
+        the last run are checked, and the warnings stored in the HLSP file
+        manifest are reused for the rest.
+
+    :type incremental: Boolean
+
+    :param checksums: If True, write a manifest of the checksums of all files
+        afterwards with make_checksums, reusing the same inventory.
+
+    :type checksums: Boolean
     """
 
     # Start logging to an output file.
@@ -108,26 +129,62 @@ def check_file_names(idir, hlsp_name, root_dir="", exclude_missions=None,
     # Read in list of known filters from reference file.
     known_filters = read_known_filters()
 
-    # Get list of all files.
-    all_file_list = get_all_files(idir, skip_sym=skip_sym)
-    # Record the total number of files found, in case user needs to confirm.
-    filenames_log.info('Total files found: ' + str(len(all_file_list)))
+    # Start a new HLSPFile.
+    new_file = HLSPFile(name=hlsp_name.strip().lower())
+    new_file.update_filepaths(input=os.path.abspath(idir))
 
-    # Make sure all sub-directories are lowercase.
-    check_dirpath_lower(all_file_list, root_dir)
+    # Take an inventory of all files, unless one was provided.  Later steps
+    # reuse this inventory instead of walking the directory again.
+    if inventory is None:
+        inventory = new_file.get_inventory(skip_sym=skip_sym)
+    else:
+        new_file.set_inventory(inventory)
+    # Record the total number of files found, in case user needs to confirm.
+    filenames_log.info('Total files found: ' + str(len(inventory)))
+
+    # Make sure all sub-directories are lowercase.  The inventory lists each
+    # directory once, so this is checked per directory rather than per file.
+    check_dirs_lower(inventory.directories(), root_dir)
+
+    # Look up the results of the last run in the manifest.  These are only
+    # reused if the names and values being checked against are unchanged.
+    cached = {}
+    if incremental:
+        manifest = new_file.get_manifest()
+        signature = manifest.make_signature([hlsp_name,
+                                             sorted(known_missions),
+                                             sorted(known_filters),
+                                             exclude_missions,
+                                             exclude_filters,
+                                             ])
+        to_check, cached, removed = manifest.split(inventory, MANIFEST_STEP,
+                                                   signature)
+        filenames_log.info('Files changed or added since last check: ' +
+                           str(len(to_check)))
+        filenames_log.info('Files removed since last check: ' +
+                           str(len(removed)))
 
     # Check file names for compliance.
-    check_file_compliance(all_file_list, hlsp_name, known_missions,
-                          known_filters, exclude_missions, exclude_filters)
+    results = check_file_compliance(inventory, hlsp_name, known_missions,
+                                    known_filters, exclude_missions,
+                                    exclude_filters, cached=cached)
 
-    # Start a new HLSPFile.
-    new_file = HLSPFile(name=hlsp_name.strip().lower())
-    new_file.update_filepaths(input=os.path.abspath(idir))
+    # Store the new results for the next run.
+    if incremental:
+        manifest.update(MANIFEST_STEP, to_check, results)
+        manifest.close()
+
+    # Record the results in the HLSPFile.
     new_file.toggle_ingest(0, state=True)
     new_file.save(caller=__file__)
 
     filenames_log.info('Finished at ' + datetime.datetime.now().isoformat())
 
+    # Write the checksum manifest, which has its own log file.
+    if checksums:
+        make_checksums(idir, hlsp_name, inventory=inventory,
+                       incremental=incremental)
+
     return logfile
 
 # --------------------
@@ -166,6 +223,16 @@ def setup_args():
                         help="If set, will ignore symbolic links",
                         default=False)
 
+    parser.add_argument("--full", dest="incremental", action="store_false",
+                        help="If set, will check every file again instead of"
+                        " only files changed since the last run.",
+                        default=True)
+
+    parser.add_argument("--checksums", dest="checksums", action="store_true",
+                        help="If set, will also write a manifest of the"
+                        " checksums of all files.",
+                        default=False)
+
     return parser
 
 # --------------------
@@ -178,6 +245,7 @@ if __name__ == "__main__":
     # Call main function.
     check_file_names(INPUT_ARGS.idir, INPUT_ARGS.hlsp_name, INPUT_ARGS.root_dir,
                      INPUT_ARGS.exclude_missions, INPUT_ARGS.exclude_filters,
-                     INPUT_ARGS.skip_sym)
+                     INPUT_ARGS.skip_sym, incremental=INPUT_ARGS.incremental,
+                     checksums=INPUT_ARGS.checksums)
 
 # --------------------
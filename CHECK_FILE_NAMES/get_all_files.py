@@ -6,9 +6,11 @@
 .. moduleauthor:: Scott W. Fleming <fleming@stsci.edu>
 """
 
-import os
 import sys
 
+sys.path.append("../")
+from bin.scan_files import scan_files
+
 #--------------------
 
 def get_all_files(idir, skip_sym = False):
@@ -24,26 +26,7 @@ def get_all_files(idir, skip_sym = False):
     :type skip_sym: Boolean
     """
 
-    # Initialize list that will contain all files.
-    all_files = []
-
-    # Walk through all files, making sure there aren't so many that a list can't
-    # be created (based on 32- or 64-bit machine limits).
-    for dirname, _, file_list in os.walk(idir):
-        if len(all_files) + len(file_list) < sys.maxsize:
-            if not skip_sym:
-                found_files = [os.path.abspath(os.path.join(dirname, x))
-                               for x in file_list]
-            else:
-                found_files =  [os.path.abspath(os.path.join(dirname, x))
-                                for x in file_list if not os.path.islink(
-                        os.path.join(dirname, x))]
-            all_files.extend(found_files)
-        else:
-            raise IndexError("There are too many files to store in a single "
-                             "array inside " + idir + ", run again on a subset "
-                             "of the directories.")
-
-    return all_files
+    # The names are all that's needed here, so skip the per-file stat calls.
+    return [x.path for x in scan_files(idir, skip_sym=skip_sym, stat=False)]
 
 #--------------------
@@ -0,0 +1,239 @@
+"""
+.. module:: make_checksums
+    :synopsis: Computes the MD5 and SHA-256 checksums of every file in an
+        HLSP delivery and writes them to a checksum manifest next to the
+        .hlsp file.  Checksums stored in the HLSP file manifest are reused for
+        files that have not changed since they were hashed, and the rest are
+        hashed in parallel.  This can be run on its own, or after the file
+        names are checked with check_file_names.py --checksums.
+"""
+
+import argparse
+import csv
+import datetime
+import logging
+import os
+import sys
+import time
+
+sys.path.append("../")
+from bin.hash_files import ALGORITHMS, hash_files
+from bin.new_logger import new_logger
+from lib.HLSPFile import HLSPFile
+
+# The checksum manifest shares the default .hlsp file name, with this
+# extension.
+CHECKSUMS_EXT = ".checksums.csv"
+
+# --------------------
+
+
+def compute_checksums(records, manifest=None, reuse=True, workers=None):
+    """
+    Return the (md5, sha256) checksums of a collection of files keyed by
+    path, and a list of the records of the files that were hashed.  Files
+    that could not be read are left out.
+
+    :param records: The inventory records of the files, such as a whole
+        FileInventory.
+
+    :type records: iterable
+
+    :param manifest: Optional HLSP file manifest.  Checksums stored in it are
+        reused for unchanged files, and new checksums are stored in it.
+
+    :type manifest: lib.FileManifest.FileManifest
+
+    :param reuse: If False, every file is hashed again, even if the manifest
+        holds its checksums.
+
+    :type reuse: Boolean
+
+    :param workers: Number of threads hashing files.
+
+    :type workers: int
+    """
+
+    records = list(records)
+    checksums = {}
+    if manifest and reuse:
+        checksums = manifest.get_checksums(records)
+
+    # Start with the largest files, so a few big files are not left to be
+    # hashed one at a time at the end.
+    to_hash = [rec for rec in records if rec.path not in checksums]
+    to_hash.sort(key=lambda rec: rec.size or 0, reverse=True)
+
+    for path, digests in hash_files([rec.path for rec in to_hash],
+                                    workers=workers):
+        if digests:
+            checksums[path] = digests
+
+    if manifest:
+        manifest.update_checksums(to_hash, checksums)
+
+    return checksums, to_hash
+
+# --------------------
+
+
+def write_checksums(checksums, records, root, output):
+    """
+    Write a checksum manifest in CSV format, with one row per file giving the
+    path relative to the data directory, the size and each checksum.
+
+    :param checksums: The checksums of each file, keyed by path.
+
+    :type checksums: dict
+
+    :param records: The inventory records of the files.
+
+    :type records: iterable
+
+    :param root: The data directory that paths are written relative to.
+
+    :type root: str
+
+    :param output: The file path of the checksum manifest.
+
+    :type output: str
+    """
+
+    rows = [[os.path.relpath(rec.path, root), rec.size]
+            + list(checksums[rec.path])
+            for rec in records if rec.path in checksums]
+    rows.sort()
+
+    with open(output, 'w', newline='') as ofile:
+        writer = csv.writer(ofile)
+        writer.writerow(["path", "size"] + list(ALGORITHMS))
+        writer.writerows(rows)
+
+# --------------------
+
+
+def make_checksums(idir, hlsp_name, skip_sym=False, inventory=None,
+                   incremental=True, workers=None):
+    """
+    Computes checksums for all files contained below this directory and
+    writes them to a checksum manifest next to the .hlsp file.  Returns the
+    file path of the checksum manifest.
+
+    :param idir: The directory containing HLSP files to hash.
+
+    :type idir: str
+
+    :param hlsp_name: The name of the HLSP.
+
+    :type hlsp_name: str
+
+    :param skip_sym: If True, will ignore symbolic links.
+
+    :type skip_sym: Boolean
+
+    :param inventory: Optional inventory of idir, such as the one made by
+        check_file_names.  If not provided, idir is walked once here.
+
+    :type inventory: lib.FileInventory.FileInventory
+
+    :param incremental: If True, the checksums stored in the HLSP file
+        manifest are reused for files that have not changed.
+
+    :type incremental: Boolean
+
+    :param workers: Number of threads hashing files.
+
+    :type workers: int
+    """
+
+    # Start logging to an output file.
+    logfile = "make_checksums.log"
+    checksums_log = new_logger(logfile)
+    checksums_log.info('Started at ' + datetime.datetime.now().isoformat())
+
+    # Start a new HLSPFile to find the manifest and output paths.
+    new_file = HLSPFile(name=hlsp_name.strip().lower())
+    new_file.update_filepaths(input=os.path.abspath(idir))
+
+    # Take an inventory of all files, unless one was provided.
+    if inventory is None:
+        inventory = new_file.get_inventory(skip_sym=skip_sym)
+    else:
+        new_file.set_inventory(inventory)
+    checksums_log.info('Total files found: ' + str(len(inventory)))
+
+    # Hash every file without stored checksums.
+    start = time.time()
+    with new_file.get_manifest() as manifest:
+        checksums, hashed = compute_checksums(inventory, manifest,
+                                              reuse=incremental,
+                                              workers=workers)
+    elapsed = time.time() - start
+
+    # Files that could not be stat'ed have no size to add.
+    hashed_bytes = sum(rec.size for rec in hashed
+                       if rec.path in checksums and rec.size is not None)
+    checksums_log.info('Files hashed: ' + str(len(hashed)))
+    checksums_log.info('Files with reused checksums: ' +
+                       str(len(inventory) - len(hashed)))
+    checksums_log.info('Hashed {0} bytes in {1:.1f} s ({2:.1f} MB/s)'.format(
+        hashed_bytes, elapsed, hashed_bytes / 1e6 / max(elapsed, 1e-6)))
+    if len(checksums) < len(inventory):
+        logging.warning('Files that could not be hashed: ' +
+                        str(len(inventory) - len(checksums)))
+
+    # Write the checksum manifest next to the .hlsp file.
+    output = os.path.splitext(new_file.get_output_filepath())[0]
+    output = "".join([output, CHECKSUMS_EXT])
+    write_checksums(checksums, inventory, inventory.root, output)
+    checksums_log.info('Checksums written to ' + output)
+
+    checksums_log.info('Finished at ' + datetime.datetime.now().isoformat())
+
+    return output
+
+# --------------------
+
+def setup_args():
+    """
+    Set up command-line arguments and options.
+
+    :returns: ArgumentParser -- Stores arguments and options.
+    """
+
+    parser = argparse.ArgumentParser(description="Write a manifest of the"
+                                     " checksums of all HLSP files.")
+
+    parser.add_argument("idir", action="store", type=str, help="[Required]"
+                        " Full path to the folder containing HLSP files.")
+
+    parser.add_argument("hlsp_name", action="store", type=str.lower,
+                        help="[Required] Name of the HLSP.")
+
+    parser.add_argument("--skip_sym", dest="skip_sym", action="store_true",
+                        help="If set, will ignore symbolic links",
+                        default=False)
+
+    parser.add_argument("--full", dest="incremental", action="store_false",
+                        help="If set, will hash every file again instead of"
+                        " only files changed since the last run.",
+                        default=True)
+
+    parser.add_argument("--workers", dest="workers", action="store", type=int,
+                        help="Optional number of threads hashing files.")
+
+    return parser
+
+# --------------------
+
+if __name__ == "__main__":
+
+    # Create ArgumentParser object that holds command-line args and options.
+    INPUT_ARGS = setup_args().parse_args()
+
+    # Call main function.
+    make_checksums(INPUT_ARGS.idir, INPUT_ARGS.hlsp_name, INPUT_ARGS.skip_sym,
+                   incremental=INPUT_ARGS.incremental,
+                   workers=INPUT_ARGS.workers)
+
+# --------------------
@@ -6,14 +6,29 @@
 .. moduleauthor:: Scott W. Fleming <fleming@stsci.edu>
 """
 
+import gzip
 import io
 import itertools
 import logging
+import math
+import mmap
+import numpy
+import os
 import sys
+import tempfile
 import unittest
 from astropy.io import fits
 from apply_metadata_check import validate_date, validate_time, check_date_obs
-from apply_metadata_check import apply_check
+from apply_metadata_check import apply_check, check_files
+from apply_metadata_check import check_files_parallel
+from compile_check_plan import compile_check_plan, KeywordCheck, LogMessage
+from read_fits_headers import parse_headers, prefetch_headers
+from read_fits_headers import read_fits_headers
+from raw_fits_header import parse_raw_header, RawHeader
+from validate_dates import check_dates, flag_messages, DateValues
+from validate_dates import DATE_END_EARLY, DATE_OBS_OUTSIDE, DATE_END_OUTSIDE
+from validate_dates import DAY, NO_TIME_OBS, TIME_FORMAT
+from verify_checksums import ones_complement_sum, verify_file, verify_files
 
 sys.path.append("../")
 from lib import FitsKeyword
@@ -584,5 +599,516 @@ class TestApplyCheck(unittest.TestCase):
 # --------------------
 
 
+class TestCompileCheckPlan(unittest.TestCase):
+    """
+    Test class for the compile_check_plan() method.
+    """
+
+    def setUp(self):
+        self.template = FitsKeyword.FitsKeywordList(
+            'timeseries', 'k2', {'DATE-OBS': {'header': 0,
+                                              'hlsp_status': 'required',
+                                              'caom_status': 'required',
+                                              'alternates': ['DATE']},
+                                 'FILTER': {'header': 1,
+                                            'hlsp_status': 'required',
+                                            'caom_status': 'omitted',
+                                            'multiple': True},
+                                 'NOHDRKY': {'header': -999,
+                                             'hlsp_status': 'required',
+                                             'caom_status': 'omitted'}})
+
+    def test_plan(self):
+        """ Test that keywords are grouped by HDU and messages hoisted. """
+        plan = compile_check_plan(self.template)
+        self.assertEqual(plan.max_hdu, 1)
+        self.assertEqual(plan.primaries, ((0, frozenset(['DATE-OBS'])),
+                                          (1, frozenset(['FILTER']))))
+        checks = [step for step in plan.steps
+                  if isinstance(step, KeywordCheck)]
+        self.assertEqual([c.name for c in checks[0].candidates],
+                         ['DATE-OBS', 'DATE'])
+        self.assertEqual(checks[0].missing[0].logstring,
+                         'Missing HLSP required keyword: "DATE".')
+        messages = [step for step in plan.present_steps
+                    if isinstance(step, LogMessage)]
+        self.assertEqual(messages, [LogMessage(
+            'Missing HLSP required keyword: NOHDRKY, and no default value is'
+            ' specififed.', 'error')])
+
+    def test_apply_plan(self):
+        """ Test that a compiled plan gives the same messages. """
+        hdulist = fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU()])
+        hdulist[0].header['DATE'] = '2020-01-01T00:00:00'
+        hdulist[1].header['FILTER'] = 'MULTI'
+        counts = {}
+        apply_check('', compile_check_plan(self.template), hdulist, counts)
+        self.assertEqual(counts, dict(
+            [('Missing HLSP required keyword: NOHDRKY, and no default value'
+              ' is specififed.', {'count': 1, 'type': 'error'}),
+             ('Keyword "FILTER" is set to "MULTI" but does not have at least'
+              ' two of keyword FILTERnn.', {'count': 1, 'type': 'error'})]))
+        counts_template = {}
+        apply_check('', self.template, hdulist, counts_template)
+        self.assertEqual(counts_template, counts)
+
+    def test_signatures(self):
+        """ Test that files with the same keys share resolved checks. """
+        plan = compile_check_plan(self.template)
+        signatures = {}
+        all_counts = []
+        for date_obs in ['2020-01-01T00:00:00', '2020-13-01T00:00:00']:
+            hdulist = fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU()])
+            hdulist[0].header['DATE-OBS'] = date_obs
+            hdulist[1].header['FILTER'] = 'MULTIPLE'
+            counts = {}
+            apply_check('', plan, hdulist, counts, signatures=signatures)
+            all_counts.append(counts)
+        self.assertEqual(len(signatures), 1)
+        # The DATE-OBS value is still checked for each file.
+        self.assertNotIn('second part of "DATE-OBS" does not look like a'
+                         ' 2-digit month.', all_counts[0])
+        self.assertIn('second part of "DATE-OBS" does not look like a'
+                      ' 2-digit month.', all_counts[1])
+        self.assertIn('Keyword "FILTER" is set to "MULTIPLE" but should be'
+                      ' set to "MULTI".', all_counts[1])
+
+# --------------------
+
+
+class TestReadFitsHeaders(unittest.TestCase):
+    """
+    Test class for the read_fits_headers() method.
+    """
+
+    def setUp(self):
+        """ Write a multi-extension file with image, table and heap data. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fitsfile = os.path.join(self.tmp_dir.name, "test.fits")
+        primary = fits.PrimaryHDU(numpy.zeros((3, 5), dtype=numpy.int16))
+        primary.header["DATE-OBS"] = "2018-04-16T12:00:00"
+        table = fits.BinTableHDU.from_columns(
+            [fits.Column(name="a", format="PD()",
+                         array=[numpy.arange(3.), numpy.arange(7.)])])
+        image = fits.ImageHDU(numpy.ones((4, 4, 2)))
+        image.header["TESTKW"] = "last"
+        self.hdulist = fits.HDUList([primary, table, image])
+        self.hdulist.writeto(self.fitsfile)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_all_headers(self):
+        """ Test that headers match those read by astropy. """
+        headers = read_fits_headers(self.fitsfile, 2)
+        self.assertEqual(len(headers), 3)
+        with fits.open(self.fitsfile) as hdulist:
+            for header, hdu in zip(headers, hdulist):
+                self.assertEqual(header.tostring(), hdu.header.tostring())
+
+    def test_stop_early(self):
+        """ Test that only the headers needed are read. """
+        self.assertEqual(len(read_fits_headers(self.fitsfile, 0)), 1)
+        self.assertEqual(len(read_fits_headers(self.fitsfile, -1)), 1)
+        self.assertEqual(len(read_fits_headers(self.fitsfile, 10)), 3)
+
+    def test_gzip(self):
+        """ Test that gzip-compressed files are read the same way. """
+        gzfile = self.fitsfile + ".gz"
+        with open(self.fitsfile, 'rb') as ifile:
+            with gzip.open(gzfile, 'wb') as ofile:
+                ofile.write(ifile.read())
+        headers = read_fits_headers(gzfile, 2)
+        self.assertEqual(headers[2]["TESTKW"], "last")
+
+    def test_gzip_stops_early(self):
+        """ Test that a gzip-compressed file is only decompressed as far as
+        the headers needed. """
+        with open(self.fitsfile, 'rb') as ifile:
+            compressed = gzip.compress(ifile.read())
+        # Cut the file off, then add a second member with bad data.
+        gzfile = self.fitsfile + ".gz"
+        with open(gzfile, 'wb') as ofile:
+            ofile.write(compressed[:len(compressed) // 2])
+        self.assertEqual(len(read_fits_headers(gzfile, 0)), 1)
+        with open(gzfile, 'wb') as ofile:
+            ofile.write(compressed + b'\x1f\x8b' + b'bad' * 1000)
+        self.assertEqual(len(read_fits_headers(gzfile, 2)), 3)
+        with self.assertRaises(OSError):
+            read_fits_headers(gzfile, 3)
+
+    def test_mapped_end_card(self):
+        """ Test that END inside a card of a mapped file is not taken as the
+        END card. """
+        fitsfile = os.path.join(self.tmp_dir.name, "end.fits")
+        primary = fits.PrimaryHDU()
+        primary.header["COMMENT"] = "END     END"
+        primary.header["ENDKEY"] = "END"
+        fits.HDUList([primary, fits.ImageHDU(numpy.ones(5))]).writeto(
+            fitsfile)
+        headers = read_fits_headers(fitsfile, 1)
+        self.assertEqual(headers[0]["ENDKEY"], "END")
+        self.assertEqual(headers[1]["NAXIS1"], 5)
+
+    def test_hdu_index(self):
+        """ Test that an HDU index matches astropy, and is used to read only
+        the headers needed. """
+        hdu_index = []
+        headers = read_fits_headers(self.fitsfile, 1, hdu_index=hdu_index)
+        self.assertEqual(len(hdu_index), 2)
+        read_fits_headers(self.fitsfile, 5, hdu_index=hdu_index)
+        with fits.open(self.fitsfile) as hdulist:
+            self.assertEqual(hdu_index,
+                             [(hdu._header_offset, hdu._data_offset)
+                              for hdu in hdulist])
+        headers = read_fits_headers(self.fitsfile, 2, hdu_index=hdu_index[:1],
+                                    hdus={2})
+        self.assertEqual(headers[:2], [None, None])
+        self.assertEqual(headers[2]["TESTKW"], "last")
+
+    def test_hdu_index_truncated(self):
+        """ Test that a file truncated after it was indexed raises OSError,
+        whether or not the file is compressed. """
+        hdu_index = []
+        read_fits_headers(self.fitsfile, 1, hdu_index=hdu_index)
+        with open(self.fitsfile, 'rb') as ifile:
+            contents = ifile.read(hdu_index[1].header + 100)
+        truncated = os.path.join(self.tmp_dir.name, "truncated.fits")
+        with open(truncated, 'wb') as ofile:
+            ofile.write(contents)
+        with gzip.open(truncated + ".gz", 'wb') as ofile:
+            ofile.write(contents)
+        for path in [truncated, truncated + ".gz"]:
+            with self.assertRaises(OSError):
+                read_fits_headers(path, 2, hdu_index=list(hdu_index),
+                                  hdus={2})
+
+    def test_hdu_index_stale(self):
+        """ Test that an indexed header past the end of a truncated file
+        raises OSError. """
+        hdu_index = []
+        read_fits_headers(self.fitsfile, 2, hdu_index=hdu_index)
+        # Cut the file on the last page boundary before the third header.
+        size = (hdu_index[2].header - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+        self.assertGreater(size, 0)
+        with open(self.fitsfile, 'rb') as ifile:
+            contents = ifile.read(size)
+        truncated = os.path.join(self.tmp_dir.name, "truncated.fits")
+        with open(truncated, 'wb') as ofile:
+            ofile.write(contents)
+        for hdus in [{2}, {1, 2}]:
+            with self.assertRaises(OSError):
+                read_fits_headers(truncated, 2, hdu_index=list(hdu_index),
+                                  hdus=hdus)
+
+    def test_not_fits(self):
+        """ Test that a file that is not FITS raises an OSError. """
+        badfile = os.path.join(self.tmp_dir.name, "bad.fits")
+        with open(badfile, 'w') as ofile:
+            ofile.write("not a fits file")
+        with self.assertRaises(OSError):
+            read_fits_headers(badfile, 0)
+
+    def test_prefetch(self):
+        """ Test that prefetched headers come back in order. """
+        badfile = os.path.join(self.tmp_dir.name, "bad.fits")
+        with open(badfile, 'w') as ofile:
+            ofile.write("not a fits file")
+        file_list = [self.fitsfile, badfile] * 5
+        prefetched = list(prefetch_headers(file_list, 2, 3))
+        self.assertEqual([fitsfile for fitsfile, _ in prefetched], file_list)
+        headers = parse_headers(prefetched[0][1].result())
+        self.assertEqual(headers[2]["TESTKW"], "last")
+        with self.assertRaises(OSError):
+            prefetched[1][1].result()
+
+    def test_apply_check_headers(self):
+        """ Test that apply_check accepts a list of headers. """
+        template = FitsKeyword.FitsKeywordList(
+            'timeseries', 'k2', {'TESTKW': {'header': 2,
+                                            'hlsp_status': 'required',
+                                            'caom_status': 'omitted'},
+                                 'MISSKW': {'header': 1,
+                                            'hlsp_status': 'required',
+                                            'caom_status': 'omitted'}})
+        counts = {}
+        apply_check('', template, read_fits_headers(self.fitsfile, 2), counts)
+        self.assertEqual(list(counts.keys()),
+                         ['Missing HLSP required keyword: "MISSKW".'])
+
+    def test_check_files_parallel(self):
+        """ Test that files checked by workers match a serial check. """
+        template = FitsKeyword.FitsKeywordList(
+            'timeseries', 'k2', {'MISSKW': {'header': 1,
+                                            'hlsp_status': 'required',
+                                            'caom_status': 'omitted'},
+                                 'DATE-OBS': {'header': 0,
+                                              'hlsp_status': 'required',
+                                              'caom_status': 'omitted'}})
+        badfile = os.path.join(self.tmp_dir.name, "bad.fits")
+        with open(badfile, 'w') as ofile:
+            ofile.write("not a fits file")
+        file_list = [self.fitsfile, badfile, self.fitsfile]
+        serial, serial_dates, serial_indexes = check_files(file_list,
+                                                          template, 1)
+        serial = dict(serial)
+        parallel, parallel_dates, parallel_indexes = check_files_parallel(
+            file_list, template, 1, 2)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel_dates, serial_dates)
+        self.assertEqual(parallel_indexes, serial_indexes)
+        self.assertEqual(len(serial_indexes[self.fitsfile]), 2)
+        self.assertEqual(dict(check_files(file_list, template, 1, 2)[0]),
+                         serial)
+        self.assertEqual(list(parallel[badfile].keys()),
+                         ['astropy.io could not open file.'])
+        self.assertEqual(serial_dates,
+                         [DateValues(self.fitsfile, "2018-04-16T12:00:00",
+                                     None, None, None)] * 2)
+
+# --------------------
+
+
+class TestRawHeader(unittest.TestCase):
+    """
+    Test class for the raw_fits_header module, cross-checked against astropy.
+    """
+
+    def setUp(self):
+        self.header = fits.Header()
+        values = ["abc", "it's", "  lead", "trail  ", "", "a/b", 1, -5, 1.5,
+                  -2.5e-10, True, False, 3+4j, "MULTI", "2018-04-16T12:00:00"]
+        for ii, value in enumerate(values):
+            self.header["KEY" + str(ii)] = (value, "a comment / with slash")
+        self.header["COMMENT"] = "a comment card"
+        self.header.append(fits.Card.fromstring("KEYD    = 1.5D3"))
+        self.header.append(fits.Card.fromstring("KEYU    ="))
+        self.header["KEY0"] = "abc"
+
+    def test_match_astropy(self):
+        """ Test that keys and values match those read by astropy. """
+        raw = self.header.tostring().encode('ascii')
+        raw_header = parse_raw_header(raw)
+        header = fits.Header.fromstring(raw)
+        self.assertIsInstance(raw_header, RawHeader)
+        self.assertEqual(raw_header.keys(), list(header.keys()))
+        for key in header.keys():
+            if key != "COMMENT":
+                self.assertEqual(repr(raw_header[key]), repr(header[key]))
+        self.assertEqual(raw_header.get("key1"), "it's")
+        self.assertEqual(raw_header.get("MISSING", 5), 5)
+        self.assertNotIn("EY1", raw_header)
+        with self.assertRaises(KeyError):
+            raw_header["MISSING"]
+
+    def test_fallback(self):
+        """ Test that headers with special cards are read by astropy. """
+        for key, value in [("HIERARCH ESO DET", 1),
+                           ("LONGSTR", "x" * 100),
+                           ("DP1", "AXIS.1: 1"),
+                           ]:
+            header = self.header.copy()
+            header[key] = value
+            parsed = parse_raw_header(header.tostring().encode('ascii'))
+            self.assertIsInstance(parsed, fits.Header)
+            self.assertEqual(list(parsed.keys()), list(header.keys()))
+
+    def test_check_files(self):
+        """ Test that files checked with raw headers match astropy. """
+        template = FitsKeyword.FitsKeywordList(
+            'timeseries', 'k2', {'KEY13': {'header': 0,
+                                           'hlsp_status': 'required',
+                                           'caom_status': 'omitted',
+                                           'multiple': True},
+                                 'DATE-OBS': {'header': 1,
+                                              'hlsp_status': 'required',
+                                              'caom_status': 'omitted'}})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fitsfile = os.path.join(tmp_dir, "test.fits")
+            table = fits.BinTableHDU.from_columns(
+                [fits.Column(name="a", format="D", array=numpy.arange(3.))])
+            table.header["DATE-OBS"] = "2018-04-16"
+            fits.HDUList([fits.PrimaryHDU(header=self.header),
+                          table]).writeto(fitsfile)
+            headers = read_fits_headers(fitsfile, 1, fast=True)
+            self.assertIsInstance(headers[1], RawHeader)
+            file_list = [fitsfile] * 3
+            self.assertEqual(check_files(file_list, template, 1),
+                             check_files(file_list, template, 1,
+                                         fast_headers=True))
+
+# --------------------
+
+
+class TestVerifyChecksums(unittest.TestCase):
+    """
+    Test class for verifying the CHECKSUM and DATASUM cards of FITS files.
+    """
+
+    def setUp(self):
+        """ Write a file with checksums, holding image and table data. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fitsfile = os.path.join(self.tmp_dir.name, "test.fits")
+        table = fits.BinTableHDU.from_columns(
+            [fits.Column(name="a", format="PD()",
+                         array=[numpy.arange(3.), numpy.arange(7.)])])
+        ascii_table = fits.TableHDU.from_columns(
+            [fits.Column(name="b", format="A7",
+                         array=numpy.array(["x", "yy", "zzz"]))])
+        fits.HDUList([fits.PrimaryHDU(numpy.arange(15.).reshape(3, 5)),
+                      table, ascii_table]).writeto(self.fitsfile,
+                                                   checksum=True)
+        with open(self.fitsfile, 'rb') as ifile:
+            self.contents = ifile.read()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, contents):
+        """ Write a copy of the file with new contents. """
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb') as ofile:
+            ofile.write(contents)
+        return path
+
+    def test_sum(self):
+        """ Test the ones' complement sum, including the end-around carry. """
+        self.assertEqual(ones_complement_sum(b'\x00\x00\x00\x01' * 3), 3)
+        self.assertEqual(ones_complement_sum(b'\xff\xff\xff\xff\x00\x00'
+                                             b'\x00\x02'), 2)
+        self.assertEqual(ones_complement_sum(b'\x80\x00\x00\x00', 0x80000001),
+                         2)
+
+    def test_valid(self):
+        """ Test that files written by astropy pass, compressed or not. """
+        self.assertEqual(verify_file(self.fitsfile), [])
+        gzfile = self.write("test.fits.gz", gzip.compress(self.contents))
+        self.assertEqual(verify_file(gzfile), [])
+
+    def test_corrupted(self):
+        """ Test that changed data and headers are flagged in their HDU. """
+        contents = bytearray(self.contents)
+        contents[2880 + 100] ^= 1
+        self.assertEqual(verify_file(self.write("data.fits", contents)),
+                         [("DATASUM does not match the data of HDU 0.",
+                           'error'),
+                          ("CHECKSUM does not match HDU 0.", 'error')])
+        with fits.open(self.fitsfile) as hdulist:
+            hdulist[1].header["EXTRA"] = "changed"
+            hdulist.writeto(os.path.join(self.tmp_dir.name, "header.fits"))
+        self.assertEqual(
+            verify_file(os.path.join(self.tmp_dir.name, "header.fits")),
+            [("CHECKSUM does not match HDU 1.", 'error')])
+
+    def test_files(self):
+        """ Test that files without cards pass, and bad files are flagged in
+        file order. """
+        plain = os.path.join(self.tmp_dir.name, "plain.fits")
+        fits.PrimaryHDU(numpy.ones(5)).writeto(plain)
+        truncated = self.write("truncated.fits", self.contents[:4000])
+        file_list = [self.fitsfile, truncated, plain]
+        results = list(verify_files(file_list, workers=2))
+        self.assertEqual([fitsfile for fitsfile, messages in results],
+                         file_list)
+        self.assertEqual([len(messages) for fitsfile, messages in results],
+                         [0, 1, 0])
+        self.assertEqual(results[1][1][0][1], 'error')
+
+    def test_missing_bitpix(self):
+        """ Test that a header with data but no BITPIX is flagged as an error
+        for that file, rather than stopping the other files. """
+        cards = [b'SIMPLE  =                    T',
+                 b'NAXIS   =                    1',
+                 b'NAXIS1  =                   10',
+                 b'END']
+        header = b''.join(card.ljust(80) for card in cards).ljust(2880)
+        badfile = self.write("nobitpix.fits", header + b'\x00' * 2880)
+        results = list(verify_files([badfile, self.fitsfile], workers=2))
+        self.assertEqual(results[0][1],
+                         [("Could not verify checksums, file is truncated or"
+                           " not FITS.", 'error')])
+        self.assertEqual(results[1][1], [])
+
+    def test_truncated_page_aligned(self):
+        """ Test that a file cut off right after a header that declares data
+        is flagged when the cut falls on a page boundary. """
+        # The second header ends at the first page boundary that is also on
+        # a FITS block boundary.
+        n_blocks = math.lcm(2880, mmap.PAGESIZE) // 2880
+        primary = fits.PrimaryHDU(numpy.zeros((n_blocks - 2) * 360))
+        contents = io.BytesIO()
+        fits.HDUList([primary, fits.ImageHDU(numpy.ones(10))]).writeto(
+            contents)
+        truncated = self.write("aligned.fits",
+                               contents.getvalue()[:n_blocks * 2880])
+        self.assertEqual(os.path.getsize(truncated) % mmap.PAGESIZE, 0)
+        self.assertEqual(verify_file(truncated),
+                         [("Could not verify checksums, file is truncated or"
+                           " not FITS.", 'error')])
+
+# --------------------
+
+
+class TestCheckDates(unittest.TestCase):
+    """
+    Test class for checking the dates of many files together.
+    """
+
+    def test_date_end(self):
+        """ Test that a DATE-END before DATE-OBS is flagged. """
+        flags = check_dates([
+            DateValues("a", "2018-04-16T12:00:00", None, None, None),
+            DateValues("b", "2018-04-16T12:00:00", None,
+                       "2018-04-16T13:00:00", None),
+            DateValues("c", "2018-04-16", "12:00:00", "2018-04-16",
+                       "11:00:00"),
+            DateValues("d", "2018-04-16", None, "2018-04-15", None),
+            ])
+        self.assertEqual(list(flags), [0, 0, DATE_END_EARLY, NO_TIME_OBS])
+
+    def test_mission_dates(self):
+        """ Test that dates outside the mission are flagged. """
+        date_values = [
+            DateValues("a", "2010-01-01T00:00:00", None,
+                       "2010-01-02T00:00:00", None),
+            DateValues("b", "2008-01-01T00:00:00", None,
+                       "2010-01-02T00:00:00", None),
+            DateValues("c", "2010-01-01T00:00:00", None,
+                       "2020-01-02T00:00:00", None),
+            ]
+        self.assertEqual(list(check_dates(date_values)), [0, 0, 0])
+        flags = check_dates(date_values, ('2009-03-07', '2018-11-15'))
+        self.assertEqual(list(flags), [0, DATE_OBS_OUTSIDE, DATE_END_OUTSIDE])
+        self.assertEqual(len(check_dates([])), 0)
+
+    def test_utc_offset(self):
+        """ Test that a value with a UTC offset among values without one is
+        compared in UTC, and only flags its own file. """
+        date_values = [
+            DateValues("a", "2020-01-01T12:00:00", None,
+                       "2020-01-01T13:00:00", None),
+            DateValues("b", "2020-01-01T12:00:00", None,
+                       "2020-01-01T15:00:00+05:00", None),
+            DateValues("c", "2020-01-01T12:00:00+05:00", None,
+                       "2020-01-01T13:00:00", None),
+            ]
+        flags = check_dates(date_values, ('2019-01-01', '2021-01-01'))
+        self.assertEqual(list(flags), [0, DATE_END_EARLY, TIME_FORMAT])
+        self.assertEqual(list(check_dates(date_values[1:2])),
+                         [DATE_END_EARLY])
+
+    def test_flag_messages(self):
+        """ Test that messages come back in order for each flag set. """
+        flags = check_dates([DateValues("a", "2018-04-32", None, None,
+                                        None)])
+        self.assertEqual(flags[0], DAY | NO_TIME_OBS)
+        self.assertEqual([logtype for _, logtype in flag_messages(flags[0])],
+                         ['error', 'error'])
+        self.assertTrue(flag_messages(flags[0])[0][0].startswith(
+            'third part of "DATE-OBS"'))
+
+# --------------------
+
+
 if __name__ == "__main__":
     unittest.main()
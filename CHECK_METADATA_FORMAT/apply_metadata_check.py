@@ -5,6 +5,8 @@
 ().. moduleauthor:: Scott W. Fleming <fleming@stsci.edu>
 """
 
+import concurrent.futures
+import itertools
 import logging
 import os
 from astropy.io import fits
@@ -12,10 +14,27 @@ import numpy
 import sys
 
 from get_filetypes_keys import get_filetypes_keys
+from compile_check_plan import CheckPlan, LogMessage
+from compile_check_plan import compile_check_plan, compile_check_plans
+from compile_check_plan import resolve_check_plan
+from read_fits_headers import parse_headers, prefetch_headers
+from read_fits_headers import read_fits_headers
+from raw_fits_header import RawHeader
+from validate_dates import check_dates, date_flags, date_obs_flags
+from validate_dates import flag_messages, get_date_values, time_flags
+from verify_checksums import verify_files
 
 sys.path.append("../")
+from lib.FileInventory import FileInventory
 from lib.FitsKeyword import FitsKeyword, FitsKeywordList
 
+# Results of this step are stored in the HLSP file manifest under this name.
+MANIFEST_STEP = "check_metadata_format"
+
+# By default, the headers of this many files are read ahead while other files
+# are being checked.
+PREFETCH_DEPTH = 8
+
 # --------------------
 
 
@@ -54,6 +73,31 @@ def write_log(fname, logstring, logtype, log_message_counts):
         raise ValueError("Type of log message not understood, passed a" +
                          " value of " + logtype + ".")
 
+    count_message(logstring, logtype, log_message_counts)
+
+# --------------------
+
+
+def count_message(logstring, logtype, log_message_counts):
+    """
+    Counts a message without logging it.  Files are checked without logging
+        anything, and their messages are logged later, in file order, with
+        replay_messages.
+
+    :param logstring: The string to count.
+
+    :type logstring: str
+
+    :param logtype: The type of message.
+
+    :type logtype: str
+
+    :param log_message_counts: Keeps track of the number of times a message is
+        logged.
+
+    :type log_message_counts: dict
+    """
+
     # Update log message counts.
     if logstring not in log_message_counts.keys():
         log_message_counts[logstring] = {'count': 1, 'type': logtype}
@@ -64,6 +108,33 @@ def write_log(fname, logstring, logtype, log_message_counts):
 # --------------------
 
 
+def replay_messages(fname, file_message_counts, log_message_counts):
+    """
+    Logs the messages stored from an earlier check of a file again, and adds
+    them to the running totals.
+
+    :param fname: The name of the file.
+
+    :type fname: str
+
+    :param file_message_counts: The messages logged for this file by an
+        earlier check, in the same format as log_message_counts.
+
+    :type file_message_counts: dict
+
+    :param log_message_counts: Keeps track of the number of times a message is
+        logged.
+
+    :type log_message_counts: dict
+    """
+
+    for logstring, info in file_message_counts.items():
+        for _ in range(info['count']):
+            write_log(fname, logstring, info['type'], log_message_counts)
+
+# --------------------
+
+
 def validate_date(datevals, this_file, log_message_counts):
     """
     Given an list of dates in [YYYY, MM, DD] order, checks to make sure they
@@ -83,19 +154,9 @@ def validate_date(datevals, this_file, log_message_counts):
     :type log_message_counts: dict
     """
 
-    if len(datevals[0]) != 4:
-        logstring = ('first part of "DATE-OBS" does not look like a 4-digit' +
-                     ' year.')
-        write_log(this_file, logstring, 'error', log_message_counts)
-
-    if len(datevals[1]) != 2 or int(datevals[1]) < 1 or int(datevals[1]) > 12:
-        logstring = ('second part of "DATE-OBS" does not look like a' +
-                     ' 2-digit month.')
-        write_log(this_file, logstring, 'error', log_message_counts)
-    if len(datevals[2]) != 2 or int(datevals[2]) < 1 or int(datevals[2]) > 31:
-        logstring = ('third part of "DATE-OBS" does not look like a 2-digit' +
-                     ' day.')
-        write_log(this_file, logstring, 'error', log_message_counts)
+    flags = date_flags(['-'.join(datevals)])[0]
+    for logstring, logtype in flag_messages(flags):
+        write_log(this_file, logstring, logtype, log_message_counts)
 
 # --------------------
 
@@ -119,29 +180,9 @@ def validate_time(timevals, this_file, log_message_counts):
     :type log_message_counts: dict
     """
 
-    if len(timevals) != 3:
-        logstring = 'keyword "TIME-OBS" is not in a "hh:mm:ss.ss" format.'
-        write_log(this_file, logstring, 'error', log_message_counts)
-    else:
-        if (len(timevals[0]) != 2 or int(timevals[0]) < 0 or
-                int(timevals[0]) > 24):
-            logstring = ('first part of "TIME-OBS" does not look like' +
-                         ' a 2-digit hour.')
-            write_log(this_file, logstring, 'error', log_message_counts)
-        if (len(timevals[1]) != 2 or int(timevals[1]) < 0 or
-                int(timevals[1]) > 60):
-            logstring = ('second part of "TIME-OBS" does not look like' +
-                         ' a 2-digit minute.')
-            write_log(this_file, logstring, 'error', log_message_counts)
-        # If there's a 'z' sticking around at the end of the string, strip it
-        # before comparing values.
-        seconds_val = timevals[2]
-        if timevals[2][-1].lower() == 'z':
-            seconds_val = timevals[2][0:-1]
-        if (float(seconds_val) < 0. or float(seconds_val) > 60.):
-            logstring = ('third part of "TIME-OBS" does not look like a valid' +
-                         ' seconds field.')
-            write_log(this_file, logstring, 'error', log_message_counts)
+    flags = time_flags([':'.join(timevals)])[0]
+    for logstring, logtype in flag_messages(flags):
+        write_log(this_file, logstring, logtype, log_message_counts)
 
 # --------------------
 
@@ -149,7 +190,9 @@ def validate_time(timevals, this_file, log_message_counts):
 def check_date_obs(header, this_file, log_message_counts):
     """
     Checks that the DATE-OBS keyword is in the correct format, or if not
-        that the TIME-OBS keyword is also supplied.
+        that the TIME-OBS keyword is also supplied.  When checking many
+        files, the values are collected and checked together with
+        validate_dates.check_dates instead.
 
     :param header: The header with the DATE-OBS string to check.
 
@@ -164,46 +207,36 @@ def check_date_obs(header, this_file, log_message_counts):
 
     :type log_message_counts: dict
     """
-    date_obs_str = header['DATE-OBS'].strip()
-
-    # Format should be YYYY-MM-DDThh:mm:ss.ss
-    # Check first if the DATE-OBS is only the date,
-    # (which would be YYYY-MM-DD).
-    if len(date_obs_str.split('-')) == 3 and 'T' not in date_obs_str:
-        # Then the first must be 4 digits, the next two 2 digits,
-        # and the TIME-OBS keyword must be present in hh:mm:ss.ss format.
-        dsplits = date_obs_str.split('-')
-        validate_date(dsplits, this_file, log_message_counts)
-        if 'TIME-OBS' not in header.keys():
-            logstring = ('header contains the' +
-                         ' "DATE-OBS" keyword with only the date information,' +
-                         ' but does not include the "TIME-OBS keyword" with' +
-                         'the time information.')
-            write_log(this_file, logstring, 'error', log_message_counts)
-        else:
-            # No 'z' or 'Z' for "zulu" time zone allowed.
-            if header['TIME-OBS'].strip()[-1].lower() == 'z':
-                logstring = ('"z" or "Z" for "zulu" is not allowed in' +
-                             ' time string.')
-                write_log(this_file, logstring, 'error', log_message_counts)
-            tsplits = header['TIME-OBS'].strip().split(':')
-            validate_time(tsplits, this_file, log_message_counts)
-    elif 'T' in date_obs_str and len(date_obs_str) >= 19:
-        # No 'z' or 'Z' for "zulu" time zone allowed.
-        if date_obs_str[-1].lower() == 'z':
-            logstring = ('"z" or "Z" for "zulu" is not allowed in' +
-                         ' "DATE-OBS" string.')
-            write_log(this_file, logstring, 'error', log_message_counts)
-        datetimesplits = date_obs_str.split('T')
-        datesplits = datetimesplits[0].split('-')
-        timesplits = datetimesplits[1].split(':')
-        validate_date(datesplits, this_file, log_message_counts)
-        validate_time(timesplits, this_file, log_message_counts)
-    else:
-        logstring = ('keyword "DATE-OBS" is in the header' +
-                     ' but is not in either a "YYYY-MM-DD" or' +
-                     ' "YYYY-MM-DDThh:mm:ss.ss" format.')
-        write_log(this_file, logstring, 'error', log_message_counts)
+
+    values = get_date_values(this_file, header)
+    flags = date_obs_flags([values.date_obs], [values.time_obs])[0]
+    for logstring, logtype in flag_messages(flags):
+        write_log(this_file, logstring, logtype, log_message_counts)
+
+# --------------------
+
+
+def get_header(hdulist, index):
+    """
+    Returns a single header, given either an HDUList or a list of headers
+        already read from a file.
+
+    :param hdulist: The HDUList or list of headers of the file to check.
+
+    :type hdulist: list
+
+    :param index: The index of the HDU.
+
+    :type index: int
+
+    :returns: astropy.io.fits.header.Header -- The header at that index,
+        or a raw_fits_header.RawHeader if one was read.
+    """
+
+    hdu = hdulist[index]
+    if isinstance(hdu, (fits.Header, RawHeader)):
+        return hdu
+    return hdu.header
 
 # --------------------
 
@@ -228,7 +261,151 @@ def find_standard_match(all_standards, file_type):
 # --------------------
 
 
-def apply_check(this_file, template_standard, hdulist, log_message_counts):
+def check_found_keyword(this_file, found, hdr, file_message_counts,
+                        dates=None):
+    """
+    Makes the sanity checks on the value of a keyword found in a header.
+
+    :param this_file: The file being checked.
+
+    :type this_file: str
+
+    :param found: The keyword found, from resolve_check_plan.
+
+    :type found: compile_check_plan.FoundKeyword
+
+    :param hdr: The header the keyword was found in.
+
+    :type hdr: astropy.io.fits.header.Header
+
+    :param file_message_counts: Counts the messages for this file, which are
+        not logged here.
+
+    :type file_message_counts: dict
+
+    :param dates: Optional list to collect the date keywords of the file in,
+        to be checked together with those of other files.  If not given,
+        DATE-OBS is checked here.
+
+    :type dates: list
+    """
+
+    candidate = found.candidate
+    if candidate.date_obs:
+        # Check DATE-OBS keyword is correct format, if not, try TIME-OBS.
+        values = get_date_values(this_file, hdr)
+        if dates is not None:
+            dates.append(values)
+        else:
+            flags = date_obs_flags([values.date_obs], [values.time_obs])[0]
+            for logstring, logtype in flag_messages(flags):
+                count_message(logstring, logtype, file_message_counts)
+    if candidate.multi:
+        # Check if this keyword is set to 'MULTI' properly.
+        kw_value_checked = hdr[candidate.name]
+        if kw_value_checked.lower() == "multi":
+            # Make sure there are other keywords of the format KW[0:6]nn.
+            # There should be at least two of them.
+            if not found.family_present:
+                count_message(candidate.multi.missing.logstring,
+                              candidate.multi.missing.logtype,
+                              file_message_counts)
+        elif kw_value_checked.lower() == "multiple":
+            count_message(candidate.multi.multiple.logstring,
+                          candidate.multi.multiple.logtype,
+                          file_message_counts)
+
+# --------------------
+
+
+def get_signature(header):
+    """
+    Returns the keys of a header in a form that can be used as a dict key.
+
+    :param header: The header.
+
+    :type header: astropy.io.fits.header.Header
+
+    :returns: tuple -- The keys of the header, or a bytes object of the keys
+        of a raw_fits_header.RawHeader.
+    """
+
+    if isinstance(header, RawHeader):
+        return header.signature()
+    return tuple(header.keys())
+
+# --------------------
+
+
+def check_headers(this_file, template_standard, hdulist, file_message_counts,
+                  signatures=None, dates=None):
+    """
+    Checks the headers of a file against a template, and counts the messages
+        for the file without logging them.
+
+    :param this_file: The file to run standard verification on.
+
+    :type this_file: str
+
+    :param template_standard: The standard template to use for this file, or
+        a plan already compiled from one by compile_check_plan.
+
+    :type standard: lib.FitsKeyword.FitsKeywordList
+
+    :param hdulist: The HDUList of the file to check, or a list of its
+        headers (as from read_fits_headers).
+
+    :type hdulist: astropy.io.fits.hdu.hdulist.HDUList
+
+    :param file_message_counts: Counts the messages for this file.
+
+    :type file_message_counts: dict
+
+    :param signatures: Optional cache of the plan resolved for each header
+        signature (the keys of each header needed), shared by every file
+        checked with the same plan.  Keyword presence is then only checked
+        once for each distinct signature.
+
+    :type signatures: dict
+
+    :param dates: Optional list to collect the date keywords of the file in.
+
+    :type dates: list
+    """
+
+    plan = template_standard
+    if not isinstance(plan, CheckPlan):
+        plan = compile_check_plan(template_standard)
+
+    headers = {}
+    for hdu, primaries in plan.primaries:
+        headers[hdu] = get_header(hdulist, hdu)
+    signature = tuple(get_signature(headers[hdu]) for hdu in headers)
+
+    steps = None
+    if signatures is not None:
+        steps = signatures.get(signature)
+    if steps is None:
+        keys = {hdu: frozenset(headers[hdu].keys()) for hdu in headers}
+        steps = resolve_check_plan(plan, keys)
+        if signatures is not None:
+            signatures[signature] = steps
+
+    # Only the checks on keyword values are left to run for each file.
+    for step in steps:
+        if isinstance(step, LogMessage):
+            count_message(step.logstring, step.logtype, file_message_counts)
+        else:
+            check_found_keyword(this_file, step,
+                                headers[step.candidate.hdu],
+                                file_message_counts,
+                                dates=dates)
+
+# --------------------
+
+
+def apply_check(this_file, template_standard, hdulist, log_message_counts,
+                signatures=None):
     """
     Conducts the standard verification on the given file.
 
@@ -236,11 +413,13 @@ def apply_check(this_file, template_standard, hdulist, log_message_counts):
 
     :type this_file: str
 
-    :param template_standard: The standard template to use for this file.
+    :param template_standard: The standard template to use for this file, or
+        a plan already compiled from one by compile_check_plan.
 
     :type standard: lib.FitsKeyword.FitsKeywordList
 
-    :param hdulist: The HDUList of the file to check.
+    :param hdulist: The HDUList of the file to check, or a list of its
+        headers (as from read_fits_headers).
 
     :type hdulist: astropy.io.fits.hdu.hdulist.HDUList
 
@@ -248,139 +427,308 @@ def apply_check(this_file, template_standard, hdulist, log_message_counts):
         logged.
 
     :type log_message_counts: dict
+
+    :param signatures: Optional cache of the plan resolved for each header
+        signature, see check_headers.
+
+    :type signatures: dict
     """
 
-    # Check each extension.
-    for kw in template_standard.keywords:
-        hdr = {}
-        if kw.header >= 0:
-            hdr = hdulist[kw.header].header
-            kw_checked = kw.fits_keyword
-            is_in_hdr = kw_checked.upper() in hdr.keys()
-            # If this keyword is missing from the header, try the alternate
-            # keyword(s) instead, if one exists.
-            # The alternates are stored as a comma-separated string.
-            if not is_in_hdr:
-                if kw.alternates:
-                    for kwa in kw.alternates:
-                        kw_checked = kwa
-                        is_in_hdr = kw_checked.upper() in hdr.keys()
-                        if is_in_hdr:
-                            break
+    file_message_counts = {}
+    check_headers(this_file, template_standard, hdulist, file_message_counts,
+                  signatures=signatures)
+    replay_messages(this_file, file_message_counts, log_message_counts)
+
+# --------------------
+
+
+def check_file(fitsfile, template_standard, max_hdu, file_message_counts,
+               prefetched=None, signatures=None, dates=None,
+               fast_headers=False, hdu_index=None, hdus=None):
+    """
+    Reads the headers of a single file and checks them against a template.
+        The messages for the file are counted, but not logged.
+
+    :param fitsfile: The file to check.
+
+    :type fitsfile: str
+
+    :param template_standard: The standard template to use for this file.
+
+    :type template_standard: compile_check_plan.CheckPlan
+
+    :param max_hdu: The highest HDU index the template needs.
+
+    :type max_hdu: int
+
+    :param file_message_counts: Counts the messages for this file.
+
+    :type file_message_counts: dict
+
+    :param prefetched: Optional future holding the raw headers of the file,
+        from prefetch_headers.  If not given, the file is read here.
+
+    :type prefetched: concurrent.futures.Future
+
+    :param signatures: Optional cache of the plan resolved for each header
+        signature, passed on to check_headers.
+
+    :type signatures: dict
+
+    :param dates: Optional list to collect the date keywords of the file in.
+
+    :type dates: list
+
+    :param fast_headers: If True, headers with only standard cards are read
+        as a raw_fits_header.RawHeader instead of an astropy Header.
+
+    :type fast_headers: bool
+
+    :param hdu_index: Optional list of the HDU offsets of the file, which is
+        used and extended as in read_fits_headers.read_raw_headers.
+
+    :type hdu_index: list
+
+    :param hdus: Optional HDU indexes of the headers the template needs.
+
+    :type hdus: set
+    """
+
+    try:
+        if prefetched is None:
+            headers = read_fits_headers(fitsfile, max_hdu, fast=fast_headers,
+                                        hdu_index=hdu_index, hdus=hdus)
         else:
-            # ---------------------------------
-            # If header is negative value need to make sure a default is
-            # specified here if CAOM is required/recommended ....
-            # ---------------------------------
-            # Define the is_in_hdr variable to 'None' since we haven't checked.
-            is_in_hdr = 'None'
-            kw_checked = kw.fits_keyword
-            if kw.default == 'None':
-                kw_checked = 'None'
-                if kw.caom_status == 'required':
-                    logstring = ("Missing CAOM required" +
-                                 " keyword: {0}".format(kw.fits_keyword) +
-                                 ', and no default value is' +
-                                 ' specififed.')
-                    write_log(this_file, logstring, 'error',
-                              log_message_counts)
-                elif kw.caom_status == 'recommended':
-                    logstring = ("Missing CAOM recommended" +
-                                 " keyword: {0}".format(kw.fits_keyword) +
-                                 ', and no default value is' +
-                                 ' specififed.')
-                    write_log(this_file, logstring, 'warning',
-                              log_message_counts)
-                # This scenario is an HLSP requirement error regardless, since
-                # even if a default is provided, it's not in the file headers.
-                if kw.hlsp_status == 'required':
-                    logstring = ("Missing HLSP required" +
-                                 " keyword: {0}".format(kw.fits_keyword) +
-                                 ', and no default value is' +
-                                 ' specififed.')
-                    write_log(this_file, logstring, 'error',
-                              log_message_counts)
-                elif kw.hlsp_status == 'recommended':
-                    logstring = ("Missing HLSP recommended" +
-                                 " keyword: {0}".format(kw.fits_keyword) +
-                                 ', and no default value is' +
-                                 ' specififed.')
-                    write_log(this_file, logstring, 'warning',
-                              log_message_counts)
-        if (not is_in_hdr and is_in_hdr != 'None') and kw_checked != 'None':
-            # Check required/recommended HLSP keywords.
-            if kw.hlsp_status == "required":
-                logstring = ("Missing HLSP required keyword: " +
-                             '"{0}".'.format(kw_checked))
-                write_log(this_file, logstring, 'error', log_message_counts)
-            elif kw.hlsp_status == "recommended":
-                logstring = ("Missing HLSP recommened keyword: " +
-                             '"{0}".'.format(kw_checked))
-                write_log(this_file, logstring, 'warning',
-                          log_message_counts)
-            # Check required/recommended CAOM keywords.
-            if kw.caom_status == "required":
-                logstring = ("Missing CAOM required keyword: " +
-                             '"{0}".'.format(kw_checked))
-                write_log(this_file, logstring, 'error', log_message_counts)
-                # If a required CAOM keyword is missing, but a default
-                # value is present, inform the user a fallback default
-                # is being used.
-                if kw.default != 'None':
-                    logstring = ("Using default" +
-                                 ' value of "{0}"'.format(str(kw.default)) +
-                                 " for CAOM required " +
-                                 'keyword "{0}".'.format(kw_checked))
-                    write_log(this_file, logstring, 'info',
-                              log_message_counts)
-            elif kw.caom_status == "recommended":
-                logstring = ("Missing CAOM recommended keyword: " +
-                             '"{0}".'.format(kw_checked))
-                write_log(this_file, logstring, 'warning',
-                          log_message_counts)
-                # If a recommended CAOM keyword is missing, but a default
-                # value is present, inform the user a fallback default
-                # is being used.
-                if kw.default != 'None':
-                    logstring = ('Using default value' +
-                                 ' of "{0}"'.format(str(kw.default)) +
-                                 ' for CAOM recommended ' +
-                                 'keyword "{0}".'.format(kw_checked))
-                    write_log(this_file, logstring, 'info',
-                              log_message_counts)
-        # Now do some sanity checking of keywords if present.
-        if is_in_hdr and kw_checked != 'None':
-            if kw_checked == "DATE-OBS":
-                # Check DATE-OBS keyword is correct format, if not,
-                # try TIME-OBS.
-                check_date_obs(hdr, this_file, log_message_counts)
-            if kw.multiple:
-                # Check if this keyword is set to 'MULTI' properly.
-                kw_value_checked = hdr[kw_checked]
-                if kw_value_checked.lower() == "multi":
-                    # Make sure there are other keywords of the format
-                    # KW[0:6]nn.  There should be at least two of them.
-                    if (kw_checked[0:6] + '01' not in
-                            hdr.keys() or
-                            kw_checked[0:6] + '02' not in
-                            hdr.keys()):
-                        logstring = ('Keyword "{0}"'.format(kw_checked) +
-                                     ' is set to "MULTI" but does not' +
-                                     ' have at least two of keyword' +
-                                     ' {0}nn.'.format(kw_checked[0:6]))
-                        write_log(this_file, logstring, 'error',
-                                  log_message_counts)
-                elif kw_value_checked.lower() == "multiple":
-                    logstring = ('Keyword "{0}"'.format(kw_checked) +
-                                 ' is set to "MULTIPLE" but should be' +
-                                 ' set to "MULTI".')
-                    write_log(this_file, logstring, 'error',
-                              log_message_counts)
+            headers = parse_headers(prefetched.result(), fast=fast_headers)
+        check_headers(fitsfile,
+                      template_standard,
+                      headers,
+                      file_message_counts,
+                      signatures=signatures,
+                      dates=dates
+                      )
+    except OSError:
+        logstring = "astropy.io could not open file."
+        count_message(logstring,
+                      'error',
+                      file_message_counts
+                      )
+
+# --------------------
+
+
+def iter_check_files(file_list, template_standard, max_hdu, prefetch=None,
+                     dates=None, fast_headers=False, hdu_indexes=None):
+    """
+    Checks files one at a time, reading the headers of upcoming files ahead
+        while each file is checked.  The messages for each file are yielded
+        rather than logged.
+
+    :param file_list: The files to check.
+
+    :type file_list: list
+
+    :param template_standard: The standard template to use for these files.
+
+    :type template_standard: compile_check_plan.CheckPlan
+
+    :param max_hdu: The highest HDU index the template needs.
+
+    :type max_hdu: int
+
+    :param prefetch: How many files to read ahead.  If 0 or None, each file
+        is only read when it is checked.
+
+    :type prefetch: int
+
+    :param dates: Optional list to collect the date keywords of each file in.
+        If not given, DATE-OBS is checked for each file on its own.
+
+    :type dates: list
+
+    :param fast_headers: If True, headers are read as a
+        raw_fits_header.RawHeader where possible.
+
+    :type fast_headers: bool
+
+    :param hdu_indexes: Optional dict of the HDU offsets of each file, from
+        an earlier read.  The offsets of each file read are added to it.
+
+    :type hdu_indexes: dict
+
+    :returns: generator -- Yields a (file, message counts) pair for each
+        file, in file order.
+    """
+
+    plan = template_standard
+    if not isinstance(plan, CheckPlan):
+        plan = compile_check_plan(template_standard)
+    if hdu_indexes is None:
+        hdu_indexes = {}
+
+    # Only the headers with keywords to check are read, and the rest are
+    # skipped where their offsets are known.
+    hdus = frozenset(hdu for hdu, primaries in plan.primaries)
+
+    if prefetch:
+        files = prefetch_headers(file_list, max_hdu, prefetch,
+                                 hdu_indexes=hdu_indexes, hdus=hdus)
+    else:
+        files = ((fitsfile, None) for fitsfile in file_list)
+
+    # Files with the same header keys share the same keyword presence checks.
+    signatures = {}
+    for fitsfile, prefetched in files:
+        file_message_counts = {}
+        check_file(fitsfile, plan, max_hdu, file_message_counts,
+                   prefetched=prefetched, signatures=signatures, dates=dates,
+                   fast_headers=fast_headers,
+                   hdu_index=hdu_indexes.setdefault(fitsfile, []),
+                   hdus=hdus)
+        yield fitsfile, file_message_counts
+
+# --------------------
+
+
+def check_files(file_list, template_standard, max_hdu, prefetch=None,
+                fast_headers=False, hdu_indexes=None):
+    """
+    Checks a chunk of files inside a worker process.  The messages and date
+        keywords of each file are returned, so the parent process can check
+        the dates of all files together and log every message in order.
+
+    :param file_list: The files to check.
+
+    :type file_list: list
+
+    :param template_standard: The standard template to use for these files.
+
+    :type template_standard: compile_check_plan.CheckPlan
+
+    :param max_hdu: The highest HDU index the template needs.
+
+    :type max_hdu: int
+
+    :param prefetch: How many files to read ahead.
+
+    :type prefetch: int
+
+    :param fast_headers: If True, headers are read as a
+        raw_fits_header.RawHeader where possible.
+
+    :type fast_headers: bool
+
+    :param hdu_indexes: Optional dict of the HDU offsets of each file, from
+        an earlier read.
+
+    :type hdu_indexes: dict
+
+    :returns: tuple -- A list of (file, message counts) pairs, a list of the
+        validate_dates.DateValues of each file with a DATE-OBS, and a dict of
+        the HDU offsets of each file.
+    """
+
+    dates = []
+    hdu_indexes = dict(hdu_indexes or {})
+    results = list(iter_check_files(file_list, template_standard, max_hdu,
+                                    prefetch=prefetch, dates=dates,
+                                    fast_headers=fast_headers,
+                                    hdu_indexes=hdu_indexes))
+    return results, dates, hdu_indexes
+
+# --------------------
+
+
+def init_worker():
+    """
+    Prepares a worker process.  Nothing is logged by the workers, since the
+        parent process logs all messages in order.  The astropy FITS header
+        parser is loaded here, before any files are handed out.
+    """
+
+    logger = logging.getLogger()
+    logger.handlers = [logging.NullHandler()]
+    fits.Header.fromstring("END".ljust(80))
+
+# --------------------
+
+
+def check_files_parallel(file_list, template_standard, max_hdu, workers,
+                         prefetch=None, fast_headers=False, hdu_indexes=None):
+    """
+    Checks files in a pool of worker processes.  Files are handed out in
+        chunks, and no messages are logged.
+
+    :param file_list: The files to check.
+
+    :type file_list: list
+
+    :param template_standard: The standard template to use for these files.
+
+    :type template_standard: compile_check_plan.CheckPlan
+
+    :param max_hdu: The highest HDU index the template needs.
+
+    :type max_hdu: int
+
+    :param workers: The number of worker processes to use.
+
+    :type workers: int
+
+    :param prefetch: How many files each worker reads ahead.
+
+    :type prefetch: int
+
+    :param fast_headers: If True, headers are read as a
+        raw_fits_header.RawHeader where possible.
+
+    :type fast_headers: bool
+
+    :param hdu_indexes: Optional dict of the HDU offsets of each file, from
+        an earlier read.
+
+    :type hdu_indexes: dict
+
+    :returns: tuple -- A dict of the message counts for each file, a list of
+        the validate_dates.DateValues of each file with a DATE-OBS, and a
+        dict of the HDU offsets of each file.
+    """
+
+    # Several chunks per worker keeps them all busy if some files are slower
+    # to read than others.
+    size = max(1, len(file_list) // (workers * 4))
+    chunks = [file_list[ii:ii+size] for ii in range(0, len(file_list), size)]
+    hdu_indexes = hdu_indexes or {}
+    index_chunks = [{fitsfile: hdu_indexes[fitsfile] for fitsfile in chunk
+                     if fitsfile in hdu_indexes} for chunk in chunks]
+
+    results = {}
+    dates = []
+    new_indexes = {}
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker) as pool:
+        for chunk_results, chunk_dates, chunk_indexes in pool.map(
+                check_files,
+                chunks,
+                itertools.repeat(template_standard),
+                itertools.repeat(max_hdu),
+                itertools.repeat(prefetch),
+                itertools.repeat(fast_headers),
+                index_chunks,
+                ):
+            results.update(chunk_results)
+            dates.extend(chunk_dates)
+            new_indexes.update(chunk_indexes)
+
+    return results, dates, new_indexes
 
 # --------------------
 
 
-def apply_metadata_check(file_base_dir, hlsp_obj, all_standards):
+def apply_metadata_check(file_base_dir, hlsp_obj, all_standards,
+                         incremental=True, workers=None,
+                         prefetch=PREFETCH_DEPTH, mission_dates=None,
+                         fast_headers=False, verify_checksums=False):
     """
     Main module that applies metadata standards to files.
 
@@ -396,6 +744,40 @@ def apply_metadata_check(file_base_dir, hlsp_obj, all_standards):
 
     :type all_standards: numpy.ndarray
 
+    :param incremental: If True, only files that were changed or added since
+        the last run are opened, and the messages stored in the HLSP file
+        manifest are reused for the rest.
+
+    :type incremental: bool
+
+    :param workers: If more than one, files are checked in a pool of this
+        many processes.  Messages are still logged in file order.
+
+    :type workers: int
+
+    :param prefetch: How many files to read ahead while other files are
+        checked.  If 0 or None, each file is only read when it is checked.
+
+    :type prefetch: int
+
+    :param mission_dates: Optional (start, end) dates of the mission, such as
+        ('2009-03-07', '2018-11-15').  Files with a DATE-OBS or DATE-END
+        outside these dates are flagged.
+
+    :type mission_dates: tuple
+
+    :param fast_headers: If True, headers with only standard cards are read
+        without building an astropy Header, and only the values the template
+        needs are parsed.  Other headers are still read by astropy.
+
+    :type fast_headers: bool
+
+    :param verify_checksums: If True, the CHECKSUM and DATASUM cards of each
+        file are also verified, reading every data unit.  Mismatches are
+        counted with the other messages of the file.
+
+    :type verify_checksums: bool
+
     :returns: dict -- A count of the messages being logged.
     """
 
@@ -405,50 +787,127 @@ def apply_metadata_check(file_base_dir, hlsp_obj, all_standards):
     hlsp_obj.fits_keywords().__display__()
     print("<<<>>>")
 
+    # Use the file inventory shared through the HLSPFile, rather than walking
+    # the file_base_dir again.
+    inventory = hlsp_obj.get_inventory()
+    if inventory.root != os.path.abspath(file_base_dir):
+        inventory = FileInventory(file_base_dir)
+    records = list(inventory.with_endings(all_endings_to_check))
+
+    # Look up the results of the last run in the manifest.  These are only
+    # reused if the file types and keywords being checked are unchanged.
+    cached = {}
+    hdu_indexes = {}
+    if incremental:
+        manifest = hlsp_obj.get_manifest()
+        settings = [[ft.as_dict() for ft in hlsp_obj.file_types],
+                    [kw.as_dict() for kw in hlsp_obj.fits_keywords().keywords],
+                    mission_dates,
+                    ]
+        # Results stored without verified checksums stay valid unless
+        # checksums are asked for.
+        if verify_checksums:
+            settings.append("verify_checksums")
+        signature = manifest.make_signature(settings)
+        to_check, cached, removed = manifest.split(records, MANIFEST_STEP,
+                                                   signature)
+        logging.info("Files changed or added since last check: " +
+                     str(len(to_check)))
+        logging.info("Files removed since last check: " + str(len(removed)))
+        # The HDU offsets of files unchanged since they were last read are
+        # kept even when the template has changed.
+        hdu_indexes = manifest.get_hdu_indexes(to_check)
+
+    # Compile the checks for each file ending once, rather than looking up
+    # the file type and keywords again for every file.
+    plan = compile_check_plan(hlsp_obj.fits_keywords())
+    plans = compile_check_plans(hlsp_obj, plan=plan)
+
+    # Files are only read as far as the last header the template needs, and
+    # data units are skipped without being read.  Headers are read straight
+    # from the offsets in the HDU index of a file where they are known.
+    max_hdu = plan.max_hdu
+
+    # The files that need to be opened on this run, in order.
+    pending = [rec.path for rec in records
+               if rec.path not in cached and rec.ending.lower() in plans]
+
+    # Check these files first, in a process pool if there is more than one
+    # worker.  Nothing is logged yet, and the date keywords of each file are
+    # collected.
+    if workers and workers > 1 and len(pending) > 1:
+        checked, dates, hdu_indexes = check_files_parallel(
+            pending,
+            plan,
+            max_hdu,
+            workers,
+            prefetch=prefetch,
+            fast_headers=fast_headers,
+            hdu_indexes=hdu_indexes,
+            )
+    else:
+        dates = []
+        checked = dict(iter_check_files(pending,
+                                        plan,
+                                        max_hdu,
+                                        prefetch=prefetch,
+                                        dates=dates,
+                                        fast_headers=fast_headers,
+                                        hdu_indexes=hdu_indexes,
+                                        ))
+
+    # Check the dates of all files together, and add any messages to those of
+    # each file.
+    for values, flags in zip(dates, check_dates(dates, mission_dates)):
+        for logstring, logtype in flag_messages(flags):
+            count_message(logstring, logtype, checked[values.fitsfile])
+
+    # Verify the checksums of each file in a pool of threads, and add any
+    # mismatches to the messages of that file.
+    if verify_checksums:
+        for fitsfile, messages in verify_files(pending, workers=workers):
+            for logstring, logtype in messages:
+                count_message(logstring, logtype, checked[fitsfile])
+
     # This dict will store all the messages logged, and count how many times
     # that message is logged.
     log_message_counts = {'files_checked': 0}
-    # Loop over each file in the file_base_dir.
-    for froot, _, file_list in os.walk(file_base_dir):
-        if file_list:
-            for this_file in file_list:
-                this_ending = this_file.split('_')[-1]
-                if this_ending in all_endings_to_check:
-                    log_message_counts['files_checked'] += 1
-                    if log_message_counts['files_checked'] == 1:
-                        print("Examining ...{0}".format(this_ending))
-                    # Idetify the index in the list to pass template, product
-                    # types to 'apply_check'.
-                    file_type = hlsp_obj.find_file_type(this_ending)
-                    if file_type:
-                        # Identify which standard template to pass.
-                        kw_list = hlsp_obj.fits_keywords()
-                        if kw_list:
-                            fitsfile = os.path.join(froot, this_file)
-                            # if hlsp_obj.keyword_updates:
-                            # kw_list.update_list(hlsp_obj.keyword_updates)
-                            try:
-                                with fits.open(fitsfile, mode="readonly") as hdulist:
-                                    apply_check(fitsfile,
-                                                kw_list,
-                                                hdulist,
-                                                log_message_counts
-                                                )
-                            except OSError:
-                                logstring = "astropy.io could not open file."
-                                write_log(fitsfile,
-                                          logstring,
-                                          'error',
-                                          log_message_counts
-                                          )
-                        else:
-                            raise ValueError("No template standard found "
-                                             "for this combination of product "
-                                             "type and standard: " + prodtype +
-                                             ", " + standard + ".")
-                    else:
-                        err = ("Could not find ''{0} in provided "
-                               "HLSPFile.".format(this_ending)
-                               )
-                        raise ValueError(err)
+    # Messages logged for each file checked on this run, to store in the
+    # manifest.
+    results = {}
+    # Loop over each file in the file_base_dir with an ending to check, and
+    # log its messages.
+    for record in records:
+        this_ending = record.ending
+        log_message_counts['files_checked'] += 1
+        if log_message_counts['files_checked'] == 1:
+            print("Examining ...{0}".format(this_ending))
+
+        # Files unchanged since the last run don't need to be opened again.
+        if record.path in cached:
+            replay_messages(record.path, cached[record.path],
+                            log_message_counts)
+            continue
+
+        # Identify the compiled checks for this file ending.
+        if this_ending.lower() in plans:
+            fitsfile = record.path
+            # if hlsp_obj.keyword_updates:
+            # kw_list.update_list(hlsp_obj.keyword_updates)
+            file_message_counts = checked[fitsfile]
+            replay_messages(fitsfile, file_message_counts,
+                            log_message_counts)
+            results[fitsfile] = file_message_counts
+        else:
+            err = ("Could not find ''{0} in provided "
+                   "HLSPFile.".format(this_ending)
+                   )
+            raise ValueError(err)
+
+    # Store the new results for the next run.
+    if incremental:
+        manifest.update(MANIFEST_STEP, to_check, results)
+        manifest.update_hdu_indexes(to_check, hdu_indexes)
+        manifest.close()
+
     return log_message_counts
@@ -16,9 +16,11 @@ import yaml
 
 sys.path.append("../")
 from bin.new_logger import new_logger
-from apply_metadata_check import apply_metadata_check
+from bin.read_yaml import YamlLoader
+from apply_metadata_check import PREFETCH_DEPTH, apply_metadata_check
 from lib.FitsKeyword import FitsKeyword, FitsKeywordList
 from lib.HLSPFile import HLSPFile
+from lib.TemplateRegistry import TemplateRegistry
 
 # --------------------
 
@@ -37,7 +39,7 @@ def _read_from_file(paramfile):
     # Read in the parameter file.
     if os.path.isfile(paramfile):
         with open(paramfile, 'r') as istream:
-            param_data = yaml.load(istream)
+            param_data = yaml.load(istream, Loader=YamlLoader)
     else:
         raise OSError('Input parameter file not found.  Looking for "' +
                       paramfile + '".')
@@ -47,7 +49,10 @@ def _read_from_file(paramfile):
 # --------------------
 
 
-def check_metadata_format(paramfile, is_file=True):
+def check_metadata_format(paramfile, is_file=True, incremental=True,
+                          workers=None, prefetch=PREFETCH_DEPTH,
+                          mission_dates=None, fast_headers=False,
+                          verify_checksums=False):
     """
     Checks HLSP files for compliance.  Logs errors and warnings to log file.
 
@@ -55,43 +60,60 @@ def check_metadata_format(paramfile, is_file=True):
         'select_data_templates'.
 
     :type paramfile: str
+
+    :param incremental: If True, only files that were changed or added since
+        the last run are checked, and the messages stored in the HLSP file
+        manifest are reused for the rest.
+
+    :type incremental: bool
+
+    :param workers: If more than one, files are checked in a pool of this
+        many processes.
+
+    :type workers: int
+
+    :param prefetch: How many files to read ahead while other files are
+        checked.  Set to 0 to read each file only when it is checked.
+
+    :type prefetch: int
+
+    :param mission_dates: Optional (start, end) dates of the mission.  Files
+        with a DATE-OBS or DATE-END outside these dates are flagged.
+
+    :type mission_dates: tuple
+
+    :param fast_headers: If True, standard headers are read without astropy,
+        parsing only the values the template needs.
+
+    :type fast_headers: bool
+
+    :param verify_checksums: If True, the CHECKSUM and DATASUM cards of each
+        file are also verified.
+
+    :type verify_checksums: bool
     """
 
-    # Read in all the YAML standard template files once to pass along.
-#    templates_to_read = ["TEMPLATES/timeseries_mast.yml",
-#                         "TEMPLATES/timeseries_k2.yml"]
-    templates_to_read = ["TEMPLATES/timeseries_k2.yml",
-                         "TEMPLATES/timeseries_tess.yml",
-                         # "TEMPLATES/image_hst.yml"
+    # Read in all the YAML standard template files once to pass along.  The
+    # shared registry only parses a template again if the file has changed.
+#    templates_to_read = ["timeseries_mast", "timeseries_k2"]
+    templates_to_read = ["timeseries_k2",
+                         "timeseries_tess",
+                         # "image_hst"
                          ]
 
     # Create FitsKeywordList object for each standard in all_standards array.
     # These are used to define the expected keywords for a given template
     # standard, but can have any part overwritten by the .hlsp file.
-    # all_standards = numpy.asarray([])
+    this_dir = os.path.dirname(os.path.realpath(__file__))
+    templates = TemplateRegistry.shared(os.path.join(this_dir, "TEMPLATES"))
     all_standards = []
 
     for ttr in templates_to_read:
-        this_file = os.path.realpath(__file__)
-        this_dir = "/".join(this_file.split("/")[:-1])
-        ttr = os.path.join(this_dir, ttr)
-        if os.path.isfile(ttr):
-            with open(ttr, 'r') as istream:
-                yaml_data = yaml.load(istream)
-                kw_list = FitsKeywordList(yaml_data['PRODUCT'],
-                                          yaml_data['STANDARD'],
-                                          yaml_data['KEYWORDS']
-                                          )
-                all_standards.append(kw_list)
-                """
-                all_standards = numpy.append(all_standards,
-                                             FitsKeywordList(
-                                                 yaml_data['PRODUCT'],
-                                                 yaml_data['STANDARD'],
-                                                 yaml_data['KEYWORDS']))
-                """
-        else:
-            raise IOError("Template file not found: " + ttr)
+        try:
+            all_standards.append(templates.keyword_list(ttr))
+        except FileNotFoundError:
+            raise IOError("Template file not found: " + os.path.join(
+                templates.templates_dir, ttr + ".yml"))
 
     # Start logging to an output file.
     log_file_name = "check_metadata_format.log"
@@ -142,7 +164,13 @@ def check_metadata_format(paramfile, is_file=True):
     # Apply the metadata correction on the requested file endings.
     log_message_counts = apply_metadata_check(file_base_dir,
                                               param_data,
-                                              all_standards
+                                              all_standards,
+                                              incremental=incremental,
+                                              workers=workers,
+                                              prefetch=prefetch,
+                                              mission_dates=mission_dates,
+                                              fast_headers=fast_headers,
+                                              verify_checksums=verify_checksums
                                               )
 
     c = int(log_message_counts['files_checked'])
@@ -184,6 +212,37 @@ def setup_args():
     parser.add_argument("paramfile", action="store", type=str, help="[Required]"
                         " Parameter file from 'select_data_templates'.")
 
+    parser.add_argument("--full", dest="incremental", action="store_false",
+                        help="If set, will check every file again instead of"
+                        " only files changed since the last run.",
+                        default=True)
+
+    parser.add_argument("--workers", dest="workers", action="store", type=int,
+                        help="Optional number of processes to check files"
+                        " with.  By default files are checked one at a time.",
+                        default=None)
+
+    parser.add_argument("--prefetch", dest="prefetch", action="store",
+                        type=int, help="Optional number of files to read"
+                        " ahead while other files are checked.  Set to 0 to"
+                        " turn off reading ahead.", default=PREFETCH_DEPTH)
+
+    parser.add_argument("--mission_dates", dest="mission_dates",
+                        action="store", nargs=2, metavar=("START", "END"),
+                        help="Optional first and last dates of the mission,"
+                        " as YYYY-MM-DD.  Files with a DATE-OBS or DATE-END"
+                        " outside these dates are flagged.", default=None)
+
+    parser.add_argument("--fast_headers", dest="fast_headers",
+                        action="store_true", help="If set, standard headers"
+                        " are read without astropy, and only the values the"
+                        " templates need are parsed.", default=False)
+
+    parser.add_argument("--verify_checksums", dest="verify_checksums",
+                        action="store_true", help="If set, the CHECKSUM and"
+                        " DATASUM cards of each file are also verified.",
+                        default=False)
+
     return parser
 
 # --------------------
@@ -195,6 +254,12 @@ if __name__ == "__main__":
     INPUT_ARGS = setup_args().parse_args()
 
     # Call main function.
-    check_metadata_format(INPUT_ARGS.paramfile)
+    check_metadata_format(INPUT_ARGS.paramfile,
+                          incremental=INPUT_ARGS.incremental,
+                          workers=INPUT_ARGS.workers,
+                          prefetch=INPUT_ARGS.prefetch,
+                          mission_dates=INPUT_ARGS.mission_dates,
+                          fast_headers=INPUT_ARGS.fast_headers,
+                          verify_checksums=INPUT_ARGS.verify_checksums)
 
 # --------------------
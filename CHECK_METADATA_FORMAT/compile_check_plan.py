@@ -0,0 +1,321 @@
+"""
+.. module:: compile_check_plan
+    :synopsis: Given a template of FITS keywords, compiles an immutable plan
+        of the checks apply_check makes on every file.  Keywords are grouped
+        by HDU, alternate keywords are resolved into lookup tuples, and every
+        message that does not depend on the file being checked is built once,
+        so checking a file only takes a few set operations.  A plan is
+        resolved against the keys in a file's headers once for each distinct
+        set of keys, leaving only the checks that depend on keyword values.
+"""
+
+import collections
+
+# A message to log, and the type of message.
+LogMessage = collections.namedtuple("LogMessage", ["logstring", "logtype"])
+
+# A keyword (primary or alternate) to look for in a header, and the sanity
+# checks to make if it is found.
+Candidate = collections.namedtuple("Candidate", ["hdu",
+                                                 "name",
+                                                 "key",
+                                                 "date_obs",
+                                                 "multi",
+                                                 ])
+
+# The checks for a keyword declared as "MULTI": the keys that must be present
+# with it, and the messages to log if the value is not used properly.
+MultiCheck = collections.namedtuple("MultiCheck", ["keys",
+                                                   "missing",
+                                                   "multiple",
+                                                   ])
+
+# A keyword from the template, its candidates in the order they are looked
+# for, and the messages to log if none of them are found.
+KeywordCheck = collections.namedtuple("KeywordCheck", ["candidates",
+                                                       "missing",
+                                                       ])
+
+# A keyword found in a header that still needs its value checked, and
+# whether both of its KW[0:6]nn keywords are in the header too.
+FoundKeyword = collections.namedtuple("FoundKeyword", ["candidate",
+                                                       "family_present",
+                                                       ])
+
+# The compiled plan for a template.  primaries holds the (hdu, frozenset) of
+# primary keys needed in each HDU.  steps are run in order for every file,
+# unless all primaries are present, in which case only present_steps are.
+CheckPlan = collections.namedtuple("CheckPlan", ["max_hdu",
+                                                 "primaries",
+                                                 "steps",
+                                                 "present_steps",
+                                                 ])
+
+# --------------------
+
+
+def _missing_default_messages(kw):
+    """
+    Builds the messages for a keyword that is not checked in any header
+        (header < 0) and has no default value.
+
+    :param kw: The keyword from the template.
+
+    :type kw: lib.FitsKeyword.FitsKeyword
+
+    :returns: list -- The LogMessage to log for every file.
+    """
+
+    messages = []
+    if kw.caom_status == 'required':
+        logstring = ("Missing CAOM required" +
+                     " keyword: {0}".format(kw.fits_keyword) +
+                     ', and no default value is' +
+                     ' specififed.')
+        messages.append(LogMessage(logstring, 'error'))
+    elif kw.caom_status == 'recommended':
+        logstring = ("Missing CAOM recommended" +
+                     " keyword: {0}".format(kw.fits_keyword) +
+                     ', and no default value is' +
+                     ' specififed.')
+        messages.append(LogMessage(logstring, 'warning'))
+    # This scenario is an HLSP requirement error regardless, since even if a
+    # default is provided, it's not in the file headers.
+    if kw.hlsp_status == 'required':
+        logstring = ("Missing HLSP required" +
+                     " keyword: {0}".format(kw.fits_keyword) +
+                     ', and no default value is' +
+                     ' specififed.')
+        messages.append(LogMessage(logstring, 'error'))
+    elif kw.hlsp_status == 'recommended':
+        logstring = ("Missing HLSP recommended" +
+                     " keyword: {0}".format(kw.fits_keyword) +
+                     ', and no default value is' +
+                     ' specififed.')
+        messages.append(LogMessage(logstring, 'warning'))
+
+    return messages
+
+# --------------------
+
+
+def _missing_keyword_messages(kw, kw_checked):
+    """
+    Builds the messages for a keyword that is not found in its header, under
+        either its own name or any alternate.
+
+    :param kw: The keyword from the template.
+
+    :type kw: lib.FitsKeyword.FitsKeyword
+
+    :param kw_checked: The last name the keyword was looked for under.
+
+    :type kw_checked: str
+
+    :returns: list -- The LogMessage to log for a file missing the keyword.
+    """
+
+    messages = []
+    # Check required/recommended HLSP keywords.
+    if kw.hlsp_status == "required":
+        logstring = ("Missing HLSP required keyword: " +
+                     '"{0}".'.format(kw_checked))
+        messages.append(LogMessage(logstring, 'error'))
+    elif kw.hlsp_status == "recommended":
+        logstring = ("Missing HLSP recommened keyword: " +
+                     '"{0}".'.format(kw_checked))
+        messages.append(LogMessage(logstring, 'warning'))
+    # Check required/recommended CAOM keywords.  If one is missing, but a
+    # default value is present, inform the user a fallback default is being
+    # used.
+    if kw.caom_status == "required":
+        logstring = ("Missing CAOM required keyword: " +
+                     '"{0}".'.format(kw_checked))
+        messages.append(LogMessage(logstring, 'error'))
+        if kw.default != 'None':
+            logstring = ("Using default" +
+                         ' value of "{0}"'.format(str(kw.default)) +
+                         " for CAOM required " +
+                         'keyword "{0}".'.format(kw_checked))
+            messages.append(LogMessage(logstring, 'info'))
+    elif kw.caom_status == "recommended":
+        logstring = ("Missing CAOM recommended keyword: " +
+                     '"{0}".'.format(kw_checked))
+        messages.append(LogMessage(logstring, 'warning'))
+        if kw.default != 'None':
+            logstring = ('Using default value' +
+                         ' of "{0}"'.format(str(kw.default)) +
+                         ' for CAOM recommended ' +
+                         'keyword "{0}".'.format(kw_checked))
+            messages.append(LogMessage(logstring, 'info'))
+
+    return messages
+
+# --------------------
+
+
+def _make_candidate(kw, name):
+    """
+    Builds the Candidate for one name a keyword may be found under.
+
+    :param kw: The keyword from the template.
+
+    :type kw: lib.FitsKeyword.FitsKeyword
+
+    :param name: The primary or alternate name of the keyword.
+
+    :type name: str
+
+    :returns: Candidate -- The lookup key and sanity checks for this name.
+    """
+
+    multi = None
+    if kw.multiple:
+        # A keyword set to "MULTI" needs at least two keywords of the format
+        # KW[0:6]nn.
+        prefix = name[0:6]
+        missing = LogMessage('Keyword "{0}"'.format(name) +
+                             ' is set to "MULTI" but does not' +
+                             ' have at least two of keyword' +
+                             ' {0}nn.'.format(prefix),
+                             'error')
+        multiple = LogMessage('Keyword "{0}"'.format(name) +
+                              ' is set to "MULTIPLE" but should be' +
+                              ' set to "MULTI".',
+                              'error')
+        multi = MultiCheck(((prefix + '01').upper(), (prefix + '02').upper()),
+                           missing,
+                           multiple)
+
+    return Candidate(kw.header, name, name.upper(), name == "DATE-OBS", multi)
+
+# --------------------
+
+
+def compile_check_plan(template_standard):
+    """
+    Compiles the checks for a template into a CheckPlan.
+
+    :param template_standard: The standard template to compile.
+
+    :type template_standard: lib.FitsKeyword.FitsKeywordList
+
+    :returns: CheckPlan -- The compiled checks.
+    """
+
+    primaries = collections.OrderedDict()
+    steps = []
+    present_steps = []
+    for kw in template_standard.keywords:
+        if kw.header < 0:
+            # Keywords not in any header can only log the same messages for
+            # every file, if no default value is specified.
+            if kw.default == 'None':
+                messages = _missing_default_messages(kw)
+                steps.extend(messages)
+                present_steps.extend(messages)
+            continue
+
+        candidates = tuple(_make_candidate(kw, name)
+                           for name in [kw.fits_keyword] + list(kw.alternates))
+        # If no candidate is found, the messages name the last one tried.
+        missing = tuple(_missing_keyword_messages(kw, candidates[-1].name))
+        steps.append(KeywordCheck(candidates, missing))
+
+        primary = candidates[0]
+        primaries.setdefault(kw.header, set()).add(primary.key)
+        if primary.date_obs or primary.multi:
+            present_steps.append(primary)
+
+    return CheckPlan(max([kw.header for kw in template_standard.keywords] +
+                         [-1]),
+                     tuple((hdu, frozenset(keys))
+                           for hdu, keys in sorted(primaries.items())),
+                     tuple(steps),
+                     tuple(present_steps),
+                     )
+
+# --------------------
+
+
+def compile_check_plans(hlsp_obj, plan=None):
+    """
+    Compiles a CheckPlan for each file ending to check in an HLSPFile.  All
+        file types of an HLSPFile share its FITS keywords, so they share the
+        same plan.
+
+    :param hlsp_obj: The HLSPFile with the file types and keywords to check.
+
+    :type hlsp_obj: lib.HLSPFile.HLSPFile
+
+    :param plan: Optional plan already compiled from the FITS keywords of
+        hlsp_obj.
+
+    :type plan: CheckPlan
+
+    :returns: dict -- The CheckPlan for each lowercase file ending.
+    """
+
+    if plan is None:
+        plan = compile_check_plan(hlsp_obj.fits_keywords())
+
+    # Keep the first file type for an ending, as HLSPFile.find_file_type does.
+    plans = {}
+    for ft in hlsp_obj.file_types:
+        plans.setdefault(ft.ftype.lower(), plan)
+
+    return plans
+
+# --------------------
+
+
+def resolve_check_plan(plan, keys):
+    """
+    Resolves which keywords of a plan are present or missing, given the keys
+        of each header of a file.  The result only depends on the keys, so
+        it can be shared by every file with the same keys.
+
+    :param plan: The compiled checks.
+
+    :type plan: CheckPlan
+
+    :param keys: The keys of each header in plan.primaries, by HDU index.
+
+    :type keys: dict
+
+    :returns: tuple -- The LogMessage to log, and the FoundKeyword to check the
+        value of, in template order.
+    """
+
+    # If every primary keyword is present, no alternates need to be looked
+    # for and nothing is missing.
+    if all(primaries <= keys[hdu] for hdu, primaries in plan.primaries):
+        steps = plan.present_steps
+    else:
+        steps = plan.steps
+
+    resolved = []
+    for step in steps:
+        if isinstance(step, LogMessage):
+            resolved.append(step)
+            continue
+        if isinstance(step, Candidate):
+            found = step
+        else:
+            # Try the primary keyword, then any alternates, in order.
+            found = None
+            for candidate in step.candidates:
+                if candidate.key in keys[candidate.hdu]:
+                    found = candidate
+                    break
+            if found is None:
+                resolved.extend(step.missing)
+                continue
+        if found.date_obs or found.multi:
+            family_present = (found.multi is not None and
+                              keys[found.hdu].issuperset(found.multi.keys))
+            resolved.append(FoundKeyword(found, family_present))
+
+    return tuple(resolved)
+
+# --------------------
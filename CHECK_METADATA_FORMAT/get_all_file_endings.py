@@ -6,12 +6,14 @@
 .. moduleauthor:: Scott W. Fleming <fleming@stsci.edu>
 """
 
-import os
 import sys
 
+sys.path.append("../")
+from bin.scan_files import scan_files
+
 #--------------------
 
-def get_all_file_endings(idir):
+def get_all_file_endings(idir, inventory=None):
     """
     Returns all file endings within the input directory, including
         sub-directories.
@@ -19,21 +21,19 @@ def get_all_file_endings(idir):
     :param idir: The directory containing HLSP files to check.
 
     :type idir: str
-    """
 
-    # Initialize list that will contain all file endings.
-    all_file_endings = []
+    :param inventory: Optional inventory of idir from an earlier step.  If
+        provided, the directory is not walked again.
+
+    :type inventory: lib.FileInventory.FileInventory
+    """
 
-    # Walk through all files, making sure there aren't so many that a list can't
-    # be created (based on 32- or 64-bit machine limits).
-    for _, _, file_list in os.walk(idir):
-        if len(all_file_endings) + len(file_list) < sys.maxsize:
-            all_file_endings.extend([x.split('_')[-1] for x in file_list])
-        else:
-            raise IndexError("There are too many files to store in a single "
-                             "array inside " + idir + ", run again on a subset "
-                             "of the directories.")
+    if inventory is not None:
+        return inventory.endings()
 
-    return set(all_file_endings)
+    # Collect the endings as the scan streams in, so the full list of file
+    # names is never held in memory.
+    return set(x.name.split('_')[-1]
+               for x in scan_files(idir, stat=False))
 
 #--------------------
@@ -23,7 +23,7 @@ from make_parameter_file import make_parameter_file
 # --------------------
 
 
-def precheck_data_format(idir, hlsp_name):
+def precheck_data_format(idir, hlsp_name, inventory=None):
     """
     Generates parameter file for check_metadata_format based on file endings.
 
@@ -34,6 +34,12 @@ def precheck_data_format(idir, hlsp_name):
     :param hlsp_name: The name of the HLSP.
 
     :type hlsp_name: str
+
+    :param inventory: Optional inventory of idir from an earlier step, such as
+        check_file_names.  If not provided, or if it is an inventory of
+        another directory, idir is walked once here.
+
+    :type inventory: lib.FileInventory.FileInventory
     """
 
     # Start logging to an output file.
@@ -45,8 +51,14 @@ def precheck_data_format(idir, hlsp_name):
     new_file = HLSPFile(name=hlsp_name)
     new_file.update_filepaths(input=os.path.realpath(idir))
 
-    # Get unique set of file endings.
-    all_file_endings = get_all_file_endings(idir)
+    # Get unique set of file endings, sharing the inventory with any later
+    # steps that use this HLSPFile.  An inventory of another directory would
+    # give the endings of the wrong files, so idir is walked instead.
+    if inventory is None or inventory.root != new_file.get_data_path():
+        inventory = new_file.get_inventory()
+    else:
+        new_file.set_inventory(inventory)
+    all_file_endings = get_all_file_endings(idir, inventory=inventory)
 
     # Sort these based on the extension type.
     file_endings = set([x.split('.')[-1] for x in all_file_endings])
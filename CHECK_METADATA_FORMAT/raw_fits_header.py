@@ -0,0 +1,241 @@
+"""
+.. module:: raw_fits_header
+    :synopsis: A lightweight view of a raw FITS header, for checks that only
+        need to know which keywords are present and the values of a few of
+        them.  The cards of a header are viewed as a numpy array, so the
+        keywords are found without making a Python object for each card, and
+        a value is only parsed when it is asked for.  Headers with cards this
+        view does not handle are parsed by astropy instead.
+"""
+
+import numpy
+import re
+from astropy.io import fits
+
+# Each header card is this many bytes, and the keyword is the first 8 bytes.
+CARD_SIZE = 80
+KEYWORD_SIZE = 8
+
+# The END card that closes a header.
+END_KEYWORD = b'END'.ljust(KEYWORD_SIZE)
+
+# Keywords that start cards this view does not handle.  A header holding
+# these anywhere is parsed by astropy.
+SPECIAL_KEYWORDS = [b'HIERARCH', b'CONTINUE']
+
+# Any byte that is not printable ASCII.
+NOT_PRINTABLE = re.compile(rb"[^\x20-\x7e]")
+
+# The keywords of every card, 8 bytes each: A-Z, 0-9, '-', and '_', followed
+# by spaces.
+KEYWORD_BLOCK = re.compile(rb"(?:" + rb"|".join(
+    rb"[A-Z0-9_-]{%d}" % ii + rb" " * (KEYWORD_SIZE - ii)
+    for ii in range(KEYWORD_SIZE, -1, -1)) + rb")*")
+
+# The value of a record-valued keyword card, which astropy reads as a
+# separate keyword for each record.
+RECORD_VALUE = re.compile(rb"= *'\s*[a-zA-Z_]\w*(\.\w+)*\s*:\s*"
+                          rb"[+-]?(\d+\.?\d*|\.\d+)([deDE][+-]?\d+)?\s*'")
+
+# Keywords whose cards hold text rather than a value.
+COMMENTARY_KEYWORDS = ['COMMENT', 'HISTORY', '']
+
+# Simple values, which are parsed here instead of by astropy.
+STRING_VALUE = re.compile(r" *'((?:[^']|'')*)' *(/.*)?$")
+OTHER_VALUE = re.compile(r" *([^ /]+) *(/.*)?$")
+INTEGER = re.compile(r"[+-]?\d+$")
+FLOAT = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([DE][+-]?\d+)?$")
+
+# --------------------
+
+
+def is_standard(raw_header, keyword_bytes):
+    """
+    Checks whether every card of a header can be handled by RawHeader.  The
+        check is conservative, so some headers RawHeader could handle are
+        still sent to astropy.
+
+    :param raw_header: The raw bytes of the header, up to the END card.
+
+    :type raw_header: bytes
+
+    :param keyword_bytes: The keywords of every card, 8 bytes each.
+
+    :type keyword_bytes: bytes
+
+    :returns: bool -- False if the header needs to be parsed by astropy.
+    """
+
+    if NOT_PRINTABLE.search(raw_header):
+        return False
+    if not KEYWORD_BLOCK.fullmatch(keyword_bytes):
+        return False
+    if any(key in raw_header for key in SPECIAL_KEYWORDS):
+        return False
+    if RECORD_VALUE.search(raw_header):
+        return False
+    return True
+
+# --------------------
+
+
+def parse_value(card):
+    """
+    Parses the value of a card.  Strings, logicals, integers and floats are
+        parsed here, and anything else by astropy.
+
+    :param card: The card.
+
+    :type card: str
+
+    :returns: object -- The value, as astropy would read it.
+    """
+
+    if (card[KEYWORD_SIZE:KEYWORD_SIZE+2] == "= " and
+            card[:KEYWORD_SIZE].rstrip() not in COMMENTARY_KEYWORDS):
+        value = card[KEYWORD_SIZE+2:]
+        match = STRING_VALUE.match(value)
+        if match:
+            return match.group(1).replace("''", "'").rstrip()
+        match = OTHER_VALUE.match(value)
+        if match:
+            token = match.group(1)
+            if token in ("T", "F"):
+                return token == "T"
+            if INTEGER.match(token):
+                return int(token)
+            if FLOAT.match(token):
+                return float(token.replace("D", "E"))
+
+    return fits.Card.fromstring(card).value
+
+# --------------------
+
+
+def parse_raw_header(raw_header):
+    """
+    Parses a raw header, as a RawHeader if it only has standard cards, or as
+        an astropy Header otherwise.
+
+    :param raw_header: The raw bytes of a header, including the END card.
+
+    :type raw_header: bytes
+
+    :returns: RawHeader or astropy.io.fits.header.Header -- The header.
+    """
+
+    # A strided view of the first 8 bytes of each card, without a copy.
+    n_cards = len(raw_header) // CARD_SIZE
+    keywords = numpy.ndarray((n_cards,), dtype='S' + str(KEYWORD_SIZE),
+                             buffer=raw_header, strides=(CARD_SIZE,))
+
+    end = numpy.flatnonzero(keywords == END_KEYWORD)
+    if len(end):
+        keyword_bytes = keywords[:end[0]].tobytes()
+        if is_standard(raw_header[:end[0]*CARD_SIZE], keyword_bytes):
+            return RawHeader(raw_header, keyword_bytes)
+
+    return fits.Header.fromstring(raw_header)
+
+# --------------------
+
+
+class RawHeader(object):
+    """
+    A read-only view of a raw FITS header with only standard cards.  Supports
+        the parts of the astropy Header interface used by the metadata
+        check: keys(), get(), "in", and looking up a value by keyword.  The
+        value of a keyword that appears more than once is the first one, as
+        in astropy.
+    """
+
+    def __init__(self, raw_header, keyword_bytes):
+        """
+        :param raw_header: The raw bytes of the header.
+
+        :type raw_header: bytes
+
+        :param keyword_bytes: The keywords of every card before the END card,
+            8 bytes each.
+
+        :type keyword_bytes: bytes
+        """
+
+        self._raw = raw_header
+        self._keyword_bytes = keyword_bytes
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index is None:
+            raise KeyError("Keyword '{0}' not found.".format(key))
+        card = self._raw[index*CARD_SIZE:(index+1)*CARD_SIZE]
+        value = parse_value(card.decode('ascii'))
+        # An astropy Header gives None for an undefined value.
+        if isinstance(value, fits.card.Undefined):
+            return None
+        return value
+
+    def _find(self, key):
+        """
+        Finds the first card with a keyword.
+
+        :param key: The keyword to find.
+
+        :type key: str
+
+        :returns: int -- The index of the card, or None if not found.
+        """
+
+        if len(key) > KEYWORD_SIZE:
+            return None
+        key = key.upper().encode('ascii').ljust(KEYWORD_SIZE)
+        start = self._keyword_bytes.find(key)
+        # Only a match at the start of a keyword counts.
+        while start > 0 and start % KEYWORD_SIZE:
+            start = self._keyword_bytes.find(key, start + 1)
+        if start < 0:
+            return None
+        return start // KEYWORD_SIZE
+
+    def get(self, key, default=None):
+        """
+        Returns the value of a keyword, or a default if it is not present.
+
+        :param key: The keyword to look up.
+
+        :type key: str
+
+        :param default: The value to return if the keyword is not present.
+
+        :type default: object
+        """
+
+        if key not in self:
+            return default
+        return self[key]
+
+    def keys(self):
+        """
+        Returns the keyword of each card, in order, as astropy does.
+
+        :returns: list -- The keywords.
+        """
+
+        keys = self._keyword_bytes.decode('ascii')
+        return [keys[ii:ii+KEYWORD_SIZE].rstrip()
+                for ii in range(0, len(keys), KEYWORD_SIZE)]
+
+    def signature(self):
+        """
+        Returns the keywords of every card as a single bytes object, which
+            identifies the keys of the header without decoding each one.
+
+        :returns: bytes -- The keywords, 8 bytes each.
+        """
+
+        return self._keyword_bytes
+
+# --------------------
@@ -0,0 +1,698 @@
+"""
+.. module:: read_fits_headers
+    :synopsis: Given a FITS file, reads only the headers needed for a metadata
+        check.  Each header is read up to its END card, and data units are
+        skipped over without being read.  Uncompressed files are memory
+        mapped, so headers are found and copied straight out of the page
+        cache without reading data into buffers.  Gzip-compressed files are
+        decompressed as a stream that stops at the END card of the last
+        header needed.  The byte offsets of each header and data unit found
+        are kept in an HDU index, so later reads of the same file can seek
+        straight to the headers they need.  The raw headers of upcoming files
+        can be prefetched by a pool of threads while other files are checked.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import itertools
+import mmap
+import os
+import zlib
+from astropy.io import fits
+
+from raw_fits_header import parse_raw_header
+
+# FITS files are written in blocks of this many bytes.
+BLOCK_SIZE = 2880
+
+# Each header card is this many bytes.
+CARD_SIZE = 80
+
+# The keywords (besides NAXISn) that describe the size of a data unit.
+SIZE_KEYWORDS = frozenset([b'BITPIX', b'NAXIS', b'GCOUNT', b'PCOUNT',
+                           b'GROUPS'])
+
+# The byte offsets of the header and data unit of an HDU.  For a
+# gzip-compressed file, these are offsets in the decompressed file.
+HduOffsets = collections.namedtuple("HduOffsets", ["header", "data"])
+
+# The END card that closes a header, as found in a memory-mapped file.
+END_CARD = b'END'.ljust(8)
+
+# The first bytes of a gzip-compressed file.
+GZIP_MAGIC = b'\x1f\x8b'
+
+# The most bytes of a gzip-compressed file to read or decompress at a time.
+GZIP_CHUNK_SIZE = 1 << 18
+
+# --------------------
+
+
+class GzipStream(object):
+    """
+    Reads a gzip-compressed file as a forward-only stream.  Only as much of
+        the file is decompressed as has been read or skipped over, and data
+        that is skipped over is decompressed in chunks and thrown away.  The
+        checksum at the end of the file is not checked, since the headers are
+        usually read long before the end is reached.
+    """
+
+    def __init__(self, ifile):
+        """
+        :param ifile: The open gzip-compressed file, in binary mode.
+
+        :type ifile: file
+        """
+
+        self._ifile = ifile
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._input = b''
+        self._new_member = True
+
+    def _decompress(self, size):
+        """
+        Decompresses up to size more bytes.
+
+        :param size: The most bytes to return.
+
+        :type size: int
+
+        :returns: bytes -- The bytes decompressed, empty at the end of file.
+        """
+
+        while True:
+            if self._decompressor.eof:
+                # A gzip file may hold several members one after another.  The
+                # input left over after a member is all in unused_data.
+                self._input = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                self._new_member = True
+            if not self._input:
+                self._input = self._ifile.read(GZIP_CHUNK_SIZE)
+                if not self._input:
+                    # A truncated file ends wherever its data runs out.
+                    return b''
+            if self._new_member:
+                # The last member may be followed by zeroes as padding.
+                self._input = self._input.lstrip(b'\x00')
+                if not self._input:
+                    continue
+                self._new_member = False
+            try:
+                data = self._decompressor.decompress(self._input, size)
+            except zlib.error as err:
+                raise OSError("Bad gzip data: " + str(err))
+            self._input = self._decompressor.unconsumed_tail
+            if data:
+                return data
+
+    def read(self, size):
+        """
+        Reads the next bytes of the decompressed file.
+
+        :param size: The number of bytes to read.
+
+        :type size: int
+
+        :returns: bytes -- The bytes read, fewer than size at the end of file.
+        """
+
+        chunks = []
+        while size > 0:
+            data = self._decompress(size)
+            if not data:
+                break
+            chunks.append(data)
+            size -= len(data)
+
+        return b''.join(chunks)
+
+    def seek(self, offset, whence=os.SEEK_CUR):
+        """
+        Skips forward over bytes of the decompressed file without keeping
+            them.
+
+        :param offset: The number of bytes to skip.
+
+        :type offset: int
+
+        :param whence: Only os.SEEK_CUR is supported.
+
+        :type whence: int
+        """
+
+        if whence != os.SEEK_CUR or offset < 0:
+            raise ValueError("GzipStream can only skip forward.")
+        while offset > 0:
+            data = self._decompress(min(offset, GZIP_CHUNK_SIZE))
+            if not data:
+                break
+            offset -= len(data)
+
+# --------------------
+
+
+class MappedFile(object):
+    """
+    Reads an uncompressed file through a read-only memory map.  Each header
+        is located by searching the map for its END card, then copied out
+        with a single slice.  Only the pages holding headers are touched, and
+        they are released as soon as the header has been copied.
+    """
+
+    def __init__(self, ifile):
+        """
+        :param ifile: The open file, in binary mode.  It must not be empty.
+
+        :type ifile: file
+        """
+
+        self._map = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+        self._position = 0
+        # Headers are small and far apart, so reading ahead would mostly
+        # pull in data units.
+        self._advise(getattr(mmap, 'MADV_RANDOM', None))
+
+    def _advise(self, option, start=0, length=None):
+        """
+        Gives the kernel advice on a range of the map, where supported.
+
+        :param option: The mmap.MADV_* option, or None if not supported.
+
+        :type option: int
+
+        :param start: The first byte of the range.
+
+        :type start: int
+
+        :param length: The number of bytes in the range, or None for the
+            rest of the map.
+
+        :type length: int
+        """
+
+        if option is None or not hasattr(self._map, 'madvise'):
+            return
+        # There is nothing to advise on past the end of the map, and madvise
+        # raises a ValueError for a range starting there.
+        if start >= len(self._map) or length == 0:
+            return
+        # The range has to start on a page boundary.
+        offset = start % mmap.PAGESIZE
+        if length is None:
+            self._map.madvise(option, start - offset)
+        else:
+            self._map.madvise(option, start - offset, length + offset)
+
+    def close(self):
+        """
+        Unmaps the file.
+        """
+
+        self._map.close()
+
+    def read(self, size):
+        """
+        Copies the next bytes out of the map.
+
+        :param size: The number of bytes to read.
+
+        :type size: int
+
+        :returns: bytes -- The bytes read, fewer than size at the end of file.
+        """
+
+        start = self._position
+        if start > len(self._map):
+            raise EOFError("Read past the end of file.")
+        data = self._map[start:start+size]
+        self._position = min(start + size, len(self._map))
+        self._advise(getattr(mmap, 'MADV_DONTNEED', None), start, len(data))
+        return data
+
+    def read_header(self):
+        """
+        Reads the next header, up to and including the block holding its END
+            card.
+
+        :returns: bytes -- The raw header, a whole number of FITS blocks long.
+        """
+
+        start = self._position
+        search = start
+        while True:
+            end = self._map.find(END_CARD, search)
+            if end < 0:
+                raise EOFError("Header missing END card.")
+            # Only an END card at the start of a card counts.
+            if (end - start) % CARD_SIZE == 0:
+                break
+            search = end + 1
+
+        size = ((end - start) // BLOCK_SIZE + 1) * BLOCK_SIZE
+        if start + size > len(self._map):
+            raise EOFError("Header missing END card.")
+        return self.read(size)
+
+    def view(self, size):
+        """
+        Returns the next bytes of the map without copying them.  The view
+            has to be released before the file is closed.
+
+        :param size: The number of bytes to view.
+
+        :type size: int
+
+        :returns: memoryview -- The bytes, fewer than size at the end of file.
+        """
+
+        start = self._position
+        self._position = min(start + size, len(self._map))
+        # The view is read through once, so start reading it in now.
+        self._advise(getattr(mmap, 'MADV_WILLNEED', None), start,
+                     self._position - start)
+        return memoryview(self._map)[start:self._position]
+
+    def release(self, start, length):
+        """
+        Drops pages of the map that are not needed again from memory.
+
+        :param start: The first byte no longer needed.
+
+        :type start: int
+
+        :param length: The number of bytes no longer needed.
+
+        :type length: int
+        """
+
+        self._advise(getattr(mmap, 'MADV_DONTNEED', None), start, length)
+
+    def tell(self):
+        """
+        :returns: int -- The current position in the file.
+        """
+
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_CUR):
+        """
+        Moves to another position in the file.
+
+        :param offset: The number of bytes to move.
+
+        :type offset: int
+
+        :param whence: Only os.SEEK_CUR is supported, as for GzipStream.
+
+        :type whence: int
+        """
+
+        if whence != os.SEEK_CUR:
+            raise ValueError("MappedFile can only seek from the current"
+                             " position.")
+        self._position = max(self._position + offset, 0)
+
+# --------------------
+
+
+def get_data_size(header):
+    """
+    Computes the size on disk of the data unit following a header, including
+        the padding to a full FITS block.
+
+    :param header: The header describing the data unit.  A dict of the
+        keywords from get_size_keywords also works.
+
+    :type header: astropy.io.fits.header.Header
+
+    :returns: int -- The number of bytes to skip to reach the next header.
+    """
+
+    naxis = header.get('NAXIS', 0)
+    if naxis == 0:
+        return 0
+
+    axes = [header.get('NAXIS' + str(i), 0) for i in range(1, naxis + 1)]
+
+    # Random groups data have NAXIS1 = 0, and it is not part of the size.
+    if header.get('GROUPS', False) and axes[0] == 0:
+        axes = axes[1:]
+
+    n_values = 1
+    for axis in axes:
+        n_values *= axis
+
+    bitpix = header.get('BITPIX')
+    if bitpix is None:
+        raise OSError("Header with data is missing BITPIX.")
+
+    size = (abs(bitpix) // 8 * header.get('GCOUNT', 1) *
+            (header.get('PCOUNT', 0) + n_values))
+
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+# --------------------
+
+
+def get_size_keywords(raw_header):
+    """
+    Pulls the keywords describing the size of the data unit out of a raw
+        header, without parsing the rest of the header.
+
+    :param raw_header: The raw bytes of a header.
+
+    :type raw_header: bytes
+
+    :returns: dict -- The value of each size keyword found.
+    """
+
+    values = {}
+    for ii in range(0, len(raw_header), CARD_SIZE):
+        keyword = raw_header[ii:ii+8].rstrip()
+        if not (keyword in SIZE_KEYWORDS or keyword.startswith(b'NAXIS')):
+            continue
+        if raw_header[ii+8:ii+10] != b'= ':
+            continue
+        value = raw_header[ii+10:ii+CARD_SIZE].split(b'/')[0].strip()
+        if keyword == b'GROUPS':
+            values['GROUPS'] = (value == b'T')
+        else:
+            try:
+                values[keyword.decode('ascii')] = int(float(value))
+            except ValueError:
+                raise OSError("Bad value for " + keyword.decode('latin-1') +
+                              ": " + value.decode('latin-1'))
+
+    return values
+
+# --------------------
+
+
+def read_raw_header(ifile):
+    """
+    Reads the raw bytes of the next header in an open FITS file, up to and
+        including the block holding its END card.
+
+    :param ifile: The open FITS file, positioned at the start of a header.
+
+    :type ifile: file
+
+    :returns: bytes -- The raw header, a whole number of FITS blocks long.
+    """
+
+    if isinstance(ifile, MappedFile):
+        return ifile.read_header()
+
+    blocks = []
+    while True:
+        block = ifile.read(BLOCK_SIZE)
+        if len(block) < BLOCK_SIZE:
+            raise EOFError("Header missing END card.")
+        blocks.append(block)
+        for ii in range(0, BLOCK_SIZE, CARD_SIZE):
+            if block[ii:ii+8].rstrip() == b'END':
+                return b''.join(blocks)
+
+# --------------------
+
+
+def read_hdus(ifile, fitsfile, max_hdu, hdu_index, hdus):
+    """
+    Reads the raw headers of an open FITS file, for read_raw_headers.
+
+    :param ifile: The open FITS file, positioned at its start.
+
+    :type ifile: file
+
+    :param fitsfile: The name of the file, for error messages.
+
+    :type fitsfile: str
+
+    :param max_hdu: The highest HDU index needed.
+
+    :type max_hdu: int
+
+    :param hdu_index: The HduOffsets known for the file, which is extended
+        with any HDUs found past its end.
+
+    :type hdu_index: list
+
+    :param hdus: The HDU indexes of the headers needed, or None for all.
+
+    :type hdus: set
+
+    :returns: list -- The raw bytes of each header, or None for headers that
+        are not needed.
+    """
+
+    raw_headers = []
+    # Headers are read in order, so each move through the file is a skip
+    # forward from the current position.
+    position = 0
+    raw_header = None
+    for hdu in range(max(max_hdu, 0) + 1):
+        if hdu < len(hdu_index):
+            header_offset, data_offset = hdu_index[hdu]
+            raw_header = None
+            if hdus is None or hdu in hdus:
+                ifile.seek(header_offset - position, os.SEEK_CUR)
+                try:
+                    raw_header = ifile.read(data_offset - header_offset)
+                except EOFError:
+                    raw_header = b''
+                if len(raw_header) < data_offset - header_offset:
+                    raise OSError("FITS file is shorter than its HDU"
+                                  " index: " + fitsfile)
+                position = data_offset
+        else:
+            # Walk on from the end of the data unit of the last HDU.
+            header_offset = 0
+            if hdu:
+                last_header, last_data = hdu_index[hdu-1]
+                if raw_header is None:
+                    ifile.seek(last_header - position, os.SEEK_CUR)
+                    try:
+                        raw_header = read_raw_header(ifile)
+                    except EOFError:
+                        raise OSError("FITS file is shorter than its HDU"
+                                      " index: " + fitsfile)
+                    position = last_data
+                header_offset = (last_data +
+                                 get_data_size(
+                                     get_size_keywords(raw_header)))
+            ifile.seek(header_offset - position, os.SEEK_CUR)
+            try:
+                raw_header = read_raw_header(ifile)
+            except EOFError:
+                if not hdu:
+                    raise OSError("Empty or truncated FITS file: " +
+                                  fitsfile)
+                break
+            data_offset = header_offset + len(raw_header)
+            hdu_index.append(HduOffsets(header_offset, data_offset))
+            position = data_offset
+        raw_headers.append(raw_header
+                           if hdus is None or hdu in hdus else None)
+
+    return raw_headers
+
+# --------------------
+
+
+@contextlib.contextmanager
+def open_fits(fitsfile):
+    """
+    Opens a FITS file for reading from its start.  A gzip-compressed file is
+        decompressed as it is read, so skipping a data unit still
+        decompresses it, but nothing is kept in memory.  Other files are
+        memory mapped.
+
+    :param fitsfile: The FITS file to open.
+
+    :type fitsfile: str
+
+    :returns: GzipStream, MappedFile or file -- The open file, which is
+        closed when the context ends.
+    """
+
+    with open(fitsfile, 'rb') as rawfile:
+        is_gzip = (rawfile.read(2) == GZIP_MAGIC)
+        rawfile.seek(0)
+        if is_gzip:
+            ifile = GzipStream(rawfile)
+        elif os.fstat(rawfile.fileno()).st_size:
+            ifile = MappedFile(rawfile)
+        else:
+            # An empty file can't be mapped, and has no header to read.
+            ifile = rawfile
+        try:
+            yield ifile
+        finally:
+            if isinstance(ifile, MappedFile):
+                ifile.close()
+
+# --------------------
+
+
+def read_raw_headers(fitsfile, max_hdu, hdu_index=None, hdus=None):
+    """
+    Reads the raw bytes of the headers of a FITS file up to and including a
+        given HDU index.  Headers after max_hdu and all data units are never
+        read.  Fewer headers are returned if the file has fewer HDUs.
+
+    :param fitsfile: The FITS file to read.
+
+    :type fitsfile: str
+
+    :param max_hdu: The highest HDU index needed.  The primary header is
+        always read.
+
+    :type max_hdu: int
+
+    :param hdu_index: Optional list of the HduOffsets (or (header, data)
+        pairs) of the first HDUs of the file, from an earlier read.  Headers
+        in it are read by seeking straight to them, and the offsets of any
+        HDUs found past its end are added to it.
+
+    :type hdu_index: list
+
+    :param hdus: Optional HDU indexes of the headers needed.  Others are
+        returned as None, and are only read if their offsets are not known.
+
+    :type hdus: set
+
+    :returns: list -- The raw bytes of each header read.
+    """
+
+    if hdu_index is None:
+        hdu_index = []
+
+    with open_fits(fitsfile) as ifile:
+        raw_headers = read_hdus(ifile, fitsfile, max_hdu, hdu_index, hdus)
+
+    return raw_headers
+
+# --------------------
+
+
+def parse_headers(raw_headers, fast=False):
+    """
+    Parses raw headers read by read_raw_headers.
+
+    :param raw_headers: The raw bytes of each header.
+
+    :type raw_headers: list
+
+    :param fast: If True, headers with only standard cards are parsed as a
+        raw_fits_header.RawHeader, which only parses the values asked for.
+
+    :type fast: bool
+
+    :returns: list -- The astropy.io.fits.header.Header of each HDU read,
+        or None for headers that were not read.
+    """
+
+    parse = (parse_raw_header if fast else fits.Header.fromstring)
+    try:
+        return [None if raw is None else parse(raw) for raw in raw_headers]
+    except ValueError as err:
+        raise OSError(str(err))
+
+# --------------------
+
+
+def read_fits_headers(fitsfile, max_hdu, fast=False, hdu_index=None,
+                      hdus=None):
+    """
+    Reads the headers of a FITS file up to and including a given HDU index.
+        Headers after max_hdu and all data units are never read.  Fewer
+        headers are returned if the file has fewer HDUs.
+
+    :param fitsfile: The FITS file to read.
+
+    :type fitsfile: str
+
+    :param max_hdu: The highest HDU index needed.  The primary header is
+        always read.
+
+    :type max_hdu: int
+
+    :param fast: If True, headers are parsed as a raw_fits_header.RawHeader
+        where possible, see parse_headers.
+
+    :type fast: bool
+
+    :param hdu_index: Optional list of HduOffsets for the file, which is used
+        and extended as in read_raw_headers.
+
+    :type hdu_index: list
+
+    :param hdus: Optional HDU indexes of the headers needed.  Others are
+        returned as None.
+
+    :type hdus: set
+
+    :returns: list -- The astropy.io.fits.header.Header of each HDU read.
+    """
+
+    return parse_headers(read_raw_headers(fitsfile, max_hdu,
+                                          hdu_index=hdu_index, hdus=hdus),
+                         fast=fast)
+
+# --------------------
+
+
+def prefetch_headers(file_list, max_hdu, depth, hdu_indexes=None,
+                     hdus=None):
+    """
+    Reads the raw headers of files ahead of time in a pool of threads, so
+        the reads of upcoming files overlap with checking the current one.
+        At most depth files are read ahead.
+
+    :param file_list: The FITS files to read, in the order they are needed.
+
+    :type file_list: list
+
+    :param max_hdu: The highest HDU index needed.
+
+    :type max_hdu: int
+
+    :param depth: How many files to read ahead.
+
+    :type depth: int
+
+    :param hdu_indexes: Optional dict of the HDU index of each file, which
+        are used and extended as in read_raw_headers.  Files not in it are
+        added.
+
+    :type hdu_indexes: dict
+
+    :param hdus: Optional HDU indexes of the headers needed.
+
+    :type hdus: set
+
+    :returns: generator -- Yields each file with a concurrent.futures.Future
+        holding the result of read_raw_headers for it, in file order.
+    """
+
+    def submit(fitsfile):
+        hdu_index = None
+        if hdu_indexes is not None:
+            hdu_index = hdu_indexes.setdefault(fitsfile, [])
+        return pool.submit(read_raw_headers, fitsfile, max_hdu, hdu_index,
+                           hdus)
+
+    files = iter(file_list)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=depth) as pool:
+        queue = collections.deque(
+            (fitsfile, submit(fitsfile))
+            for fitsfile in itertools.islice(files, depth))
+        while queue:
+            fitsfile, future = queue.popleft()
+            for next_file in itertools.islice(files, 1):
+                queue.append((next_file, submit(next_file)))
+            yield fitsfile, future
+
+# --------------------
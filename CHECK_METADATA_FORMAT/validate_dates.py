@@ -0,0 +1,342 @@
+"""
+.. module:: validate_dates
+    :synopsis: Validates the DATE-OBS and TIME-OBS values of many files at
+        once.  Values are collected from every file into arrays, and each file
+        is given a set of error flags in one pass.  With the values of all
+        files at hand, DATE-END is also checked against DATE-OBS, and both can
+        be checked against the dates of the mission.
+"""
+
+import collections
+import numpy
+import pandas as pd
+
+# The date keywords of a single file.
+DateValues = collections.namedtuple("DateValues", ["fitsfile",
+                                                   "date_obs",
+                                                   "time_obs",
+                                                   "date_end",
+                                                   "time_end",
+                                                   ])
+
+# Error flags, in the order their messages are logged.
+DATE_OBS_ZULU = 1 << 0
+YEAR = 1 << 1
+MONTH = 1 << 2
+DAY = 1 << 3
+NO_TIME_OBS = 1 << 4
+TIME_OBS_ZULU = 1 << 5
+TIME_FORMAT = 1 << 6
+HOUR = 1 << 7
+MINUTE = 1 << 8
+SECOND = 1 << 9
+DATE_OBS_FORMAT = 1 << 10
+DATE_END_EARLY = 1 << 11
+DATE_OBS_OUTSIDE = 1 << 12
+DATE_END_OUTSIDE = 1 << 13
+
+# The message logged for each error flag.
+FLAG_MESSAGES = [
+    (DATE_OBS_ZULU, '"z" or "Z" for "zulu" is not allowed in "DATE-OBS"'
+                    ' string.', 'error'),
+    (YEAR, 'first part of "DATE-OBS" does not look like a 4-digit year.',
+     'error'),
+    (MONTH, 'second part of "DATE-OBS" does not look like a 2-digit month.',
+     'error'),
+    (DAY, 'third part of "DATE-OBS" does not look like a 2-digit day.',
+     'error'),
+    (NO_TIME_OBS, 'header contains the "DATE-OBS" keyword with only the date'
+                  ' information, but does not include the "TIME-OBS keyword"'
+                  ' withthe time information.', 'error'),
+    (TIME_OBS_ZULU, '"z" or "Z" for "zulu" is not allowed in time string.',
+     'error'),
+    (TIME_FORMAT, 'keyword "TIME-OBS" is not in a "hh:mm:ss.ss" format.',
+     'error'),
+    (HOUR, 'first part of "TIME-OBS" does not look like a 2-digit hour.',
+     'error'),
+    (MINUTE, 'second part of "TIME-OBS" does not look like a 2-digit minute.',
+     'error'),
+    (SECOND, 'third part of "TIME-OBS" does not look like a valid seconds'
+             ' field.', 'error'),
+    (DATE_OBS_FORMAT, 'keyword "DATE-OBS" is in the header but is not in'
+                      ' either a "YYYY-MM-DD" or "YYYY-MM-DDThh:mm:ss.ss"'
+                      ' format.', 'error'),
+    (DATE_END_EARLY, 'keyword "DATE-END" is earlier than "DATE-OBS".',
+     'error'),
+    (DATE_OBS_OUTSIDE, 'keyword "DATE-OBS" is outside the mission dates.',
+     'warning'),
+    (DATE_END_OUTSIDE, 'keyword "DATE-END" is outside the mission dates.',
+     'warning'),
+    ]
+
+# --------------------
+
+
+def _part(parts, index):
+    """
+    Takes one part of each split value.
+
+    :param parts: The split values.
+
+    :type parts: pandas.Series
+
+    :param index: The index of the part to take.
+
+    :type index: int
+
+    :returns: pandas.Series -- The part of each value, or an empty string if a
+        value has too few parts.
+    """
+
+    return parts.str[index].fillna('').astype(object)
+
+# --------------------
+
+
+def _bad_number(values, width, low, high, integer=True):
+    """
+    Flags the values that are not a number of the given width and range.
+
+    :param values: The values to check.
+
+    :type values: pandas.Series
+
+    :param width: The number of characters expected, or None to not check.
+
+    :type width: int
+
+    :param low: The lowest valid number.
+
+    :type low: float
+
+    :param high: The highest valid number.
+
+    :type high: float
+
+    :param integer: If True, the numbers must be whole numbers.
+
+    :type integer: bool
+
+    :returns: numpy.ndarray -- True for each value that is not valid.
+    """
+
+    numbers = pd.to_numeric(values, errors='coerce')
+    good = numbers.between(low, high)
+    if integer:
+        good &= (numbers % 1 == 0)
+    if width is not None:
+        good &= (values.str.len() == width)
+    return ~good.to_numpy(dtype=bool)
+
+# --------------------
+
+
+def date_flags(dates):
+    """
+    Validates dates in YYYY-MM-DD format.
+
+    :param dates: The dates to check.
+
+    :type dates: list
+
+    :returns: numpy.ndarray -- The error flags of each date.
+    """
+
+    parts = pd.Series(dates, dtype=object).str.split('-')
+    years = _part(parts, 0)
+    flags = numpy.where(~(years.str.len() == 4).to_numpy(dtype=bool),
+                        YEAR, 0)
+    flags |= numpy.where(_bad_number(_part(parts, 1), 2, 1, 12), MONTH, 0)
+    flags |= numpy.where(_bad_number(_part(parts, 2), 2, 1, 31), DAY, 0)
+    return flags
+
+# --------------------
+
+
+def time_flags(times):
+    """
+    Validates times in hh:mm:ss.ss format.  A trailing "z" on the seconds is
+        ignored here.
+
+    :param times: The times to check.
+
+    :type times: list
+
+    :returns: numpy.ndarray -- The error flags of each time.
+    """
+
+    parts = pd.Series(times, dtype=object).str.split(':')
+    three = (parts.str.len() == 3).to_numpy(dtype=bool)
+    seconds = _part(parts, 2).str.replace(r'[zZ]$', '', regex=True)
+    flags = numpy.where(three, 0, TIME_FORMAT)
+    flags |= numpy.where(three & _bad_number(_part(parts, 0), 2, 0, 24),
+                         HOUR, 0)
+    flags |= numpy.where(three & _bad_number(_part(parts, 1), 2, 0, 60),
+                         MINUTE, 0)
+    flags |= numpy.where(three & _bad_number(seconds, None, 0., 60.,
+                                             integer=False),
+                         SECOND, 0)
+    return flags
+
+# --------------------
+
+
+def date_obs_flags(date_obs, time_obs):
+    """
+    Validates DATE-OBS values, which are either in YYYY-MM-DDThh:mm:ss.ss
+        format, or in YYYY-MM-DD format with the time in TIME-OBS.
+
+    :param date_obs: The DATE-OBS value of each file.
+
+    :type date_obs: list
+
+    :param time_obs: The TIME-OBS value of each file, or None if a file has
+        no TIME-OBS.
+
+    :type time_obs: list
+
+    :returns: numpy.ndarray -- The error flags of each file.
+    """
+
+    date_obs = pd.Series(date_obs, dtype=object).str.strip()
+    time_obs = pd.Series(time_obs, dtype=object).str.strip()
+
+    has_t = date_obs.str.contains('T', regex=False).to_numpy(dtype=bool)
+    date_only = (date_obs.str.count('-') == 2).to_numpy(dtype=bool) & ~has_t
+    full = ~date_only & has_t & (date_obs.str.len() >= 19).to_numpy(dtype=bool)
+    has_time_obs = time_obs.notna().to_numpy(dtype=bool)
+
+    # The date and time parts of each value, wherever they come from.
+    dates = date_obs.where(date_only, _part(date_obs.str.split('T'), 0))
+    times = time_obs.where(date_only, _part(date_obs.str.split('T'), 1))
+    zulu = times.where(date_only, date_obs).str[-1].str.lower() == 'z'
+    zulu = zulu.to_numpy(dtype=bool)
+    check_time = full | (date_only & has_time_obs)
+
+    flags = numpy.where(date_only | full, date_flags(dates), 0)
+    flags |= numpy.where(full & zulu, DATE_OBS_ZULU, 0)
+    flags |= numpy.where(date_only & ~has_time_obs, NO_TIME_OBS, 0)
+    flags |= numpy.where(date_only & has_time_obs & zulu, TIME_OBS_ZULU, 0)
+    flags |= numpy.where(check_time, time_flags(times.where(check_time, '')),
+                         0)
+    flags |= numpy.where(date_only | full, 0, DATE_OBS_FORMAT)
+    return flags
+
+# --------------------
+
+
+def to_datetimes(dates, times):
+    """
+    Combines dates, and optional separate times, into datetimes.  Values
+        that cannot be read become NaT.  Values with a UTC offset are
+        converted to UTC, and values without one are taken to be in UTC, so
+        all of them can be compared.
+
+    :param dates: The dates, either with or without a time.
+
+    :type dates: list
+
+    :param times: The times to add to dates without one, or None.
+
+    :type times: list
+
+    :returns: pandas.Series -- The datetime of each value.
+    """
+
+    dates = pd.Series(dates, dtype=object).str.strip()
+    times = pd.Series(times, dtype=object).str.strip()
+    combine = ~dates.str.contains('T', regex=False, na=True) & times.notna()
+    values = dates.where(~combine, dates + 'T' + times)
+    datetimes = pd.to_datetime(values.str.rstrip('zZ'), errors='coerce',
+                               format='ISO8601', utc=True)
+    return datetimes.dt.tz_convert(None)
+
+# --------------------
+
+
+def check_dates(date_values, mission_dates=None):
+    """
+    Validates the date keywords of many files at once.
+
+    :param date_values: The date keywords of each file.
+
+    :type date_values: list
+
+    :param mission_dates: Optional (start, end) dates of the mission.  Files
+        with a DATE-OBS or DATE-END outside these dates are flagged.
+
+    :type mission_dates: tuple
+
+    :returns: numpy.ndarray -- The error flags of each file.
+    """
+
+    if not date_values:
+        return numpy.zeros(0, dtype=int)
+
+    files, date_obs, time_obs, date_end, time_end = zip(*date_values)
+    flags = date_obs_flags(date_obs, time_obs)
+
+    # Dates are only compared for files with a valid DATE-OBS.
+    valid = (flags == 0)
+    start = to_datetimes(date_obs, time_obs).to_numpy()
+    end = to_datetimes(date_end, time_end).to_numpy()
+    has_start = valid & ~pd.isna(start)
+    has_end = ~pd.isna(end)
+
+    early = numpy.zeros(len(flags), dtype=bool)
+    both = has_start & has_end
+    early[both] = end[both] < start[both]
+    flags |= numpy.where(early, DATE_END_EARLY, 0)
+
+    if mission_dates:
+        first, last = pd.to_datetime(list(mission_dates), format='ISO8601')
+        for dates, has_date, flag in [(start, has_start, DATE_OBS_OUTSIDE),
+                                      (end, has_end, DATE_END_OUTSIDE)]:
+            outside = numpy.zeros(len(flags), dtype=bool)
+            outside[has_date] = ((dates[has_date] < first.to_datetime64()) |
+                                 (dates[has_date] > last.to_datetime64()))
+            flags |= numpy.where(outside, flag, 0)
+
+    return flags
+
+# --------------------
+
+
+def flag_messages(flags):
+    """
+    Returns the messages for the error flags of a single file, in order.
+
+    :param flags: The error flags.
+
+    :type flags: int
+
+    :returns: list -- The (logstring, logtype) of each error.
+    """
+
+    return [(logstring, logtype) for flag, logstring, logtype in FLAG_MESSAGES
+            if flags & flag]
+
+# --------------------
+
+
+def get_date_values(fitsfile, header):
+    """
+    Reads the date keywords from a header.
+
+    :param fitsfile: The file the header is from.
+
+    :type fitsfile: str
+
+    :param header: The header with the DATE-OBS keyword.
+
+    :type header: astropy.io.fits.header.Header
+
+    :returns: DateValues -- The date keywords of the file.
+    """
+
+    values = [header.get(key) for key in ['DATE-OBS', 'TIME-OBS', 'DATE-END',
+                                          'TIME-END']]
+    return DateValues(fitsfile,
+                      *[None if val is None else str(val) for val in values])
+
+# --------------------
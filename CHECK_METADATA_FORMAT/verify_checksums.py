@@ -0,0 +1,231 @@
+"""
+.. module:: verify_checksums
+    :synopsis: Verifies the CHECKSUM and DATASUM cards of FITS files.  The
+        32-bit ones' complement sums of each header and data unit are
+        computed with NumPy, straight from the memory map of an uncompressed
+        file or from the decompressed stream of a gzip-compressed file.
+        NumPy and zlib release the GIL while they sum or decompress a chunk
+        of data, so files are verified in a pool of threads.  Mismatches are
+        returned as (message, type) pairs, to be counted like the messages
+        of the metadata check.
+"""
+
+import concurrent.futures
+import numpy
+import os
+
+from raw_fits_header import parse_value
+from read_fits_headers import CARD_SIZE, MappedFile, get_data_size
+from read_fits_headers import get_size_keywords, open_fits, read_raw_header
+
+# The keywords holding the checksums of an HDU.
+CHECKSUM_KEYWORDS = frozenset([b'CHECKSUM', b'DATASUM'])
+
+# Data units are summed this many bytes at a time.  It must be a multiple of
+# 4, the size of the words that are summed.
+SUM_CHUNK_SIZE = 1 << 22
+
+# A 32-bit ones' complement sum of an HDU with a correct CHECKSUM is -0.
+NEGATIVE_ZERO = 0xFFFFFFFF
+
+# --------------------
+
+
+def ones_complement_sum(data, total=0):
+    """
+    Adds the 32-bit big-endian words of a buffer to a ones' complement sum.
+        The words are summed into a 64-bit integer and the carries are folded
+        back in at the end, which gives the same sum as adding the carry of
+        each word in turn.
+
+    :param data: The bytes to add.  The length must be a multiple of 4.
+
+    :type data: bytes
+
+    :param total: The sum of the bytes before these.
+
+    :type total: int
+
+    :returns: int -- The 32-bit ones' complement sum.
+    """
+
+    # A chunk of SUM_CHUNK_SIZE bytes can't overflow a 64-bit sum.
+    total += int(numpy.frombuffer(data, dtype='>u4').sum(dtype=numpy.uint64))
+    while total >> 32:
+        total = (total & NEGATIVE_ZERO) + (total >> 32)
+
+    return total
+
+# --------------------
+
+
+def sum_data(ifile, size):
+    """
+    Reads a data unit and returns its ones' complement sum, the value of
+        DATASUM.  Data in a memory-mapped file is summed without being
+        copied, and its pages are dropped once they have been summed.
+
+    :param ifile: The open FITS file, positioned at the start of the data
+        unit.
+
+    :type ifile: read_fits_headers.GzipStream or read_fits_headers.MappedFile
+
+    :param size: The size of the data unit, including padding.
+
+    :type size: int
+
+    :returns: int -- The 32-bit ones' complement sum of the data unit.
+    """
+
+    total = 0
+    while size > 0:
+        step = min(size, SUM_CHUNK_SIZE)
+        if isinstance(ifile, MappedFile):
+            start = ifile.tell()
+            with ifile.view(step) as data:
+                if len(data) < step:
+                    raise EOFError("Data unit is truncated.")
+                total = ones_complement_sum(data, total)
+            ifile.release(start, step)
+        else:
+            data = ifile.read(step)
+            if len(data) < step:
+                raise EOFError("Data unit is truncated.")
+            total = ones_complement_sum(data, total)
+        size -= step
+
+    return total
+
+# --------------------
+
+
+def get_checksum_cards(raw_header):
+    """
+    Pulls the values of the CHECKSUM and DATASUM cards out of a raw header.
+
+    :param raw_header: The raw bytes of a header.
+
+    :type raw_header: bytes
+
+    :returns: dict -- The value of each checksum keyword found.
+    """
+
+    values = {}
+    for ii in range(0, len(raw_header), CARD_SIZE):
+        keyword = raw_header[ii:ii+8].rstrip()
+        if keyword == b'END':
+            break
+        if keyword in CHECKSUM_KEYWORDS:
+            # Only the first card counts, as in astropy.
+            values.setdefault(keyword.decode('ascii'), parse_value(
+                raw_header[ii:ii+CARD_SIZE].decode('latin-1')))
+
+    return values
+
+# --------------------
+
+
+def check_hdu(hdu, raw_header, datasum):
+    """
+    Compares the checksum cards of an HDU to the sums of its header and data.
+
+    :param hdu: The index of the HDU, for messages.
+
+    :type hdu: int
+
+    :param raw_header: The raw bytes of the header.
+
+    :type raw_header: bytes
+
+    :param datasum: The ones' complement sum of the data unit.
+
+    :type datasum: int
+
+    :returns: list -- A (message, type) pair for each mismatch found.
+    """
+
+    messages = []
+    cards = get_checksum_cards(raw_header)
+
+    if 'DATASUM' in cards:
+        try:
+            matches = (int(cards['DATASUM']) == datasum)
+        except (TypeError, ValueError):
+            matches = False
+        if not matches:
+            messages.append(("DATASUM does not match the data of HDU"
+                             " {0}.".format(hdu), 'error'))
+
+    # The CHECKSUM card is chosen so the header and data add up to -0.
+    if 'CHECKSUM' in cards:
+        if ones_complement_sum(raw_header, datasum) != NEGATIVE_ZERO:
+            messages.append(("CHECKSUM does not match HDU {0}.".format(hdu),
+                             'error'))
+
+    return messages
+
+# --------------------
+
+
+def verify_file(fitsfile):
+    """
+    Verifies the CHECKSUM and DATASUM cards of every HDU of a FITS file.
+        HDUs without these cards are not checked.
+
+    :param fitsfile: The FITS file to verify.
+
+    :type fitsfile: str
+
+    :returns: list -- A (message, type) pair for each mismatch found.
+    """
+
+    messages = []
+    try:
+        with open_fits(fitsfile) as ifile:
+            hdu = 0
+            while True:
+                try:
+                    raw_header = read_raw_header(ifile)
+                except EOFError:
+                    if not hdu:
+                        raise
+                    break
+                size = get_data_size(get_size_keywords(raw_header))
+                datasum = sum_data(ifile, size)
+                messages.extend(check_hdu(hdu, raw_header, datasum))
+                hdu += 1
+    except (OSError, EOFError):
+        messages.append(("Could not verify checksums, file is truncated or"
+                         " not FITS.", 'error'))
+
+    return messages
+
+# --------------------
+
+
+def verify_files(file_list, workers=None):
+    """
+    Verifies the checksums of files in a pool of threads.
+
+    :param file_list: The files to verify.
+
+    :type file_list: list
+
+    :param workers: Number of threads verifying files.  Defaults to the
+        ThreadPoolExecutor default.
+
+    :type workers: int
+
+    :returns: generator -- Yields a (file, messages) pair for each file, in
+        file order, where messages is the list from verify_file.
+    """
+
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for fitsfile, messages in zip(file_list,
+                                      pool.map(verify_file, file_list)):
+            yield fitsfile, messages
+
+# --------------------
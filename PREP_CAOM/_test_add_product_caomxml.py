@@ -0,0 +1,121 @@
+"""
+.. module:: _test_add_product_caomxml.py
+
+   :synopsis: Test module for add_product_caomxml.  Run from the PREP_CAOM
+       directory.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from add_product_caomxml import _ending_matcher, add_product_caomxml
+
+from lib.CAOMxml import CAOMproduct, CAOMxmlList
+from util.load_hlsp_file import load_hlsp_file
+from util.scan_files import scan_files
+
+#--------------------
+
+class TestEndingMatcher(unittest.TestCase):
+    """ Main test class for matching file names to extensions. """
+
+    def test_longest_first(self):
+        """ Test that every matching extension is found, longest first. """
+        match = _ending_matcher(["lc.fits", "llc.fits", "fits"])
+        self.assertEqual(match("hlsp_a_k2_b_llc.fits"),
+                         ["llc.fits", "lc.fits", "fits"])
+        self.assertEqual(match("hlsp_a_k2_b_slc.fits"), ["lc.fits", "fits"])
+        self.assertEqual(match("hlsp_a_k2_b_lc.txt"), [])
+
+    def test_underscores(self):
+        """ Test extensions that hold more than one file name field. """
+        match = _ending_matcher(["llc.fits", "sc_lc.fits", "lc.fits"])
+        self.assertEqual(match("hlsp_a_k2_b_sc_lc.fits"),
+                         ["sc_lc.fits", "lc.fits"])
+        self.assertEqual(match("hlsp_a_k2_b_llc.fits"),
+                         ["llc.fits", "lc.fits"])
+
+    def test_case(self):
+        """ Test that file names are matched in lower case. """
+        match = _ending_matcher(["lc.fits"])
+        self.assertEqual(match("HLSP_A_K2_B_LC.FITS"), ["lc.fits"])
+
+#--------------------
+
+class TestAddProductCaomxml(unittest.TestCase):
+    """ Main test class for add_product_caomxml. """
+
+    def setUp(self):
+        """ Build a directory of files with overlapping extensions. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        os.makedirs(os.path.join(self.root, "sub"))
+        names = ["hlsp_proj_k2_a_v1_llc.fits",
+                 "hlsp_proj_k2_a_v1_sc_lc.fits",
+                 os.path.join("sub", "hlsp_proj_k2_b_v1_llc.fits"),
+                 os.path.join("sub", "hlsp_proj_k2_b_v1_sc_lc.fits"),
+                 os.path.join("sub", "hlsp_proj_k2_b_v1_lc.txt"),
+                 "zzz_other.txt",
+                 ]
+        for name in names:
+            open(os.path.join(self.root, name), 'w').close()
+        self.extensions = {"llc.fits": "SCIENCE", "sc_lc.fits": "PREVIEW"}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def add_products(self, **kwargs):
+        """ Return the products added and the warnings logged. """
+        with self.assertLogs(level="INFO") as logs:
+            caomlist = add_product_caomxml(CAOMxmlList(), self.root,
+                                           dict(self.extensions),
+                                           "timeseries", **kwargs)
+        products = sorted(str(entry) for entry in caomlist
+                          if isinstance(entry, CAOMproduct))
+        warnings = sorted(line for line in logs.output
+                          if line.startswith("WARNING"))
+        return products, warnings
+
+    def test_products(self):
+        """ Test that each extension gets one product, by its longest
+        match. """
+        products, warnings = self.add_products()
+        self.assertEqual(products,
+                         ["product: contentType=FITS, fileType=LLC, "
+                          "productType=SCIENCE",
+                          "product: contentType=FITS, fileType=SC_LC, "
+                          "productType=PREVIEW"])
+        self.assertEqual(len(warnings), 2)
+        self.assertTrue(all("extension not defined" in line
+                            for line in warnings))
+
+    def test_stop_early(self):
+        """ Test that stopping early on an inventory gives the same products
+        and warnings as a full scan. """
+        inventory = list(scan_files(self.root, stat=False))
+        expected = self.add_products(inventory=inventory)
+        self.assertEqual(self.add_products(inventory=inventory,
+                                           stop_early=True), expected)
+        self.assertEqual(self.add_products(), expected)
+
+    def test_stop_early_walk(self):
+        """ Test that stopping early on a walk still adds every product. """
+        products, warnings = self.add_products(stop_early=True)
+        self.assertEqual(products, self.add_products()[0])
+
+    def test_hlsp_file_inventory(self):
+        """ Test that the inventory of an HLSPFile loaded from PREP_CAOM
+        gives the same products and warnings as a walk. """
+        hlsp_file = load_hlsp_file()
+        hlsp_file.update_filepaths(input=self.root)
+        self.assertEqual(
+            self.add_products(inventory=hlsp_file.get_inventory()),
+            self.add_products())
+        # PREP_CAOM's own lib package is still the one imported.
+        self.assertIs(CAOMxmlList, sys.modules["lib.CAOMxml"].CAOMxmlList)
+
+#--------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,15 +7,39 @@
 
 import csv
 import logging
-import os
 
 from lib.CAOMxml import *
 
 import util.check_paths as cp
+from util.scan_files import scan_files
 
 #--------------------
 
-def add_product_caomxml(caomlist, filepath, extensions, data_type):
+def _ending_matcher(extensions):
+    """ Return a function that gives every extension a file name ends with,
+    longest first.  Only the name endings with the same lengths as the
+    extensions are looked up, so each name is checked in a single pass
+    however many extensions there are.
+
+    :param extensions:  The file type suffixes to match, in lower case.
+    :type extensions:  list
+    """
+
+    endings = set(extensions)
+    lengths = sorted(set(len(ext) for ext in endings), reverse=True)
+
+    def match(name):
+        name = name.lower()
+        size = len(name)
+        return [name[size - n:] for n in lengths
+                if n <= size and name[size - n:] in endings]
+
+    return match
+
+#--------------------
+
+def add_product_caomxml(caomlist, filepath, extensions, data_type,
+                        inventory=None, stop_early=False):
     """ Walk filepath and create product entries for files by matching them
     with entries in extensions.
 
@@ -28,13 +52,26 @@ def add_product_caomxml(caomlist, filepath, extensions, data_type):
     :type filepath:  str
 
     :param extensions:  A dictionary of file type suffixes with corresponding
-                        productType values.
+                        productType values.  If a file name ends with more
+                        than one suffix, the longest one is used.
     :type extensions:  dict
 
     :param data_type:  The dataProductType to apply to all products created.
     :type data_type:  str
-    """
 
+    :param inventory:  An existing inventory of the files in filepath, such as
+                       the FileInventory kept by an HLSPFile.  Any iterable of
+                       records with 'name' and 'path' attributes will do.  If
+                       not provided, filepath is walked here.
+    :type inventory:  iterable
+
+    :param stop_early:  If True, stop adding products once every suffix in
+                        extensions has one.  The rest of an inventory is only
+                        checked for files with no defined extension, which
+                        are logged as usual.  If filepath is walked here, the
+                        walk stops and the rest of the files are not checked.
+    :type stop_early:  bool
+    """
     # Make sure filepaths are full and valid
     filepath = cp.check_existing_dir(filepath)
     if filepath is None:
@@ -45,54 +82,65 @@ def add_product_caomxml(caomlist, filepath, extensions, data_type):
     # extensions.  If the extension matches, create a product subelement with
     # matching parameters.
     print("...scanning files from {0}...".format(filepath))
-    found_extensions = []
+    match = _ending_matcher(extensions.keys())
     projects = []
-    for path, subdirs, files in os.walk(filepath):
-        for name in files:
-
-            # Look for a match with an entry in extensions and create a
-            # CAOMproduct if found.  If the extension doesn't match one from
-            # the .csv file, generate a warning in the log and skip the file.
-            product = None
-            for ext in extensions.keys():
-                if name.lower().endswith(ext):
-                    product = CAOMproduct()
-                    product.dataProductType = data_type.upper()
-                    product.productType = extensions[ext]
-                    ext_split = ext.split(".")
-                    product.fileType = ext_split[0].upper()
-                    product.contentType = ".".join(ext_split[1:]).upper()
-                    if product.contentType == "FITS":
-                        product.fileStatus = "REQUIRED"
-                        product.statusAction = "ERROR"
-                    print("...adding {0}...".format(product))
-                    found_extensions.append(ext)
-                    caomlist.add(product)
-                    del extensions[ext]
-
-                    # Expect that the filename follows standard HLSP
-                    # formatting: "hlsp_project_..."
-                    spl = str.split(name, "_")
-                    if spl[0] == "hlsp" and spl[1] not in projects:
-                        projects.append(spl[1])
-                    break
-
-            # If the product is not found, check if it's because it's already
-            # been found.  Otherwise, enter a warning in the log.
-            if product is None:
-                found = False
-                for e in found_extensions:
-                    if name.lower().endswith(e):
-                        found = True
-                        break
-                if not found:
+    walked = inventory is None
+    if walked:
+        inventory = scan_files(filepath, stat=False)
+    records = iter(inventory)
+    for scanned in records:
+        name = scanned.name
+
+        # Look for the longest match with an entry in extensions that has no
+        # product yet.  If the extension doesn't match one from the .csv
+        # file, and isn't one already entered, generate a warning in the log
+        # and skip the file.
+        matches = match(name)
+        ext = next((m for m in matches if m in extensions), None)
+        if ext is None:
+            if not matches:
+                logging.warning("Skipped {0}, extension not defined."
+                                .format(scanned.path))
+            continue
+
+        # Create a CAOMproduct for the matching extension.
+        product = CAOMproduct()
+        product.dataProductType = data_type.upper()
+        product.productType = extensions[ext]
+        ext_split = ext.split(".")
+        product.fileType = ext_split[0].upper()
+        product.contentType = ".".join(ext_split[1:]).upper()
+        if product.contentType == "FITS":
+            product.fileStatus = "REQUIRED"
+            product.statusAction = "ERROR"
+        print("...adding {0}...".format(product))
+        caomlist.add(product)
+        del extensions[ext]
+
+        # Expect that the filename follows standard HLSP
+        # formatting: "hlsp_project_..."
+        spl = str.split(name, "_")
+        if spl[0] == "hlsp" and spl[1] not in projects:
+            projects.append(spl[1])
+
+        if len(extensions) == 0:
+            if stop_early:
+                print("...all defined extensions entered, stopping scan...")
+                break
+            print("...all defined extensions entered, still scanning...")
+
+    # If the scan stopped early, the files of an inventory that were not
+    # reached are still checked for undefined extensions.  A walk is not
+    # carried on just to check them.
+    if stop_early and len(extensions) == 0:
+        if walked:
+            logging.info("Stopped scanning {0} once all extensions were "
+                         "found.".format(filepath))
+        else:
+            for record in records:
+                if not match(record.name):
                     logging.warning("Skipped {0}, extension not defined."
-                                    .format(os.path.join(path, name)))
-                continue
-
-            remaining = list(extensions.keys())
-            if len(remaining) == 0:
-                print("...all defined extensions entered, still scanning...")
+                                    .format(record.path))
 
     # If only one project name is found, set the "name" CAOM parameter to this
     # value.
@@ -47,7 +47,7 @@ def adjust_defaults(caomlist, header_type, keyword_updates):
 
         # If the listed keyword already exists, update the parameters
         if isinstance(entry, CAOMheader):
-            entry.label = values["caom"]
+            caomlist.relabel(entry, values["caom"])
             entry.headerDefaultValue = values["headerDefaultValue"]
             entry.headerName = values["headerName"]
             entry.parent = values["section"]
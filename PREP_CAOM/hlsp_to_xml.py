@@ -59,13 +59,49 @@ STATICS = "resources/hlsp_caom_staticvalues.yaml"
 
 #--------------------
 
-def hlsp_to_xml(config):
+def _can_stream_products(caomlist):
+    """ Products can be written after the rest of the tree only if no other
+    entry would be placed inside or between them.
+
+    :param caomlist: The CAOMxml objects to be written.
+    :type caomlist: CAOMxmlList
+    """
+
+    product_tags = set(CAOMproduct().attributes_dict())
+    product_tags.update([CAOMproduct.label, CAOMproduct.parent])
+    for entry in caomlist:
+        if isinstance(entry, CAOMproduct):
+            if entry.parent != CAOMproduct.parent:
+                return False
+        elif (entry.parent in product_tags or
+              entry.label == CAOMproduct.label):
+            return False
+
+    return True
+
+#--------------------
+
+def hlsp_to_xml(config, hlsp_file=None, stop_early=None):
     """ Executes all necessary steps to generate an XML template file for CAOM
     ingestion of files associated with an HLSP.
 
     :param config: The file path to the user-provided .yaml file containing
                    necessary information specific to the HLSP being processed.
     :type config: str
+
+    :param hlsp_file: Optional HLSPFile for the same HLSP, such as the one
+                      loaded in launch_gui (see util.load_hlsp_file).  If
+                      its data path is hlsppath, the file inventory it
+                      shares with the other ingestion steps (from
+                      get_inventory) is used instead of walking hlsppath
+                      again.
+    :type hlsp_file: HLSPFile
+
+    :param stop_early: If True, stop scanning files for products once every
+                       file type has one.  If None, the optional 'stop_early'
+                       setting of the config file is used, which defaults to
+                       False.
+    :type stop_early: bool
     """
 
     # Check the user-provided config file path.
@@ -103,6 +139,8 @@ def hlsp_to_xml(config):
     data_type = parameters["data_type"]
     keyword_updates = parameters["keyword_updates"]
     uniques = parameters["unique_parameters"]
+    if stop_early is None:
+        stop_early = parameters.get("stop_early", False)
 
     # Set up logging
     outdir = os.path.dirname(output)
@@ -132,11 +170,7 @@ def hlsp_to_xml(config):
         return
 
     # Begin the lxml tree and add the main subelements
-    composite = etree.Element("CompositeObservation")
-    xmltree = etree.ElementTree(composite)
-    metadata = etree.SubElement(composite, "metadataList")
-    provenance = etree.SubElement(composite, "provenance")
-    products = etree.SubElement(composite, "productList")
+    builder = CAOMxmlBuilder()
 
     # Create the CAOMxmlList we will save CAOMxml objects into
     caomlist = CAOMxmlList()
@@ -176,9 +210,24 @@ def hlsp_to_xml(config):
         caomlist = add_value_caomxml(caomlist, uniques)
     print("...done!")
 
+    # Reuse the inventory shared by the other ingestion steps, if it covers
+    # the same directory.  The data path is checked first, so the HLSPFile
+    # never walks a directory that is not used here.
+    inventory = None
+    if hlsp_file is not None and hlsppath:
+        data_path = hlsp_file.get_data_path()
+        if (data_path and
+                os.path.realpath(data_path) == os.path.realpath(hlsppath)):
+            inventory = hlsp_file.get_inventory()
+        else:
+            logging.warning("HLSPFile data path {0} does not match {1}, "
+                            "walking {1} instead.".format(data_path,
+                                                          hlsppath))
+
     # Add product entries to the list of CAOMxml objects
     print("Generating the productList...")
-    caomlist = add_product_caomxml(caomlist, hlsppath, extensions, data_type)
+    caomlist = add_product_caomxml(caomlist, hlsppath, extensions, data_type,
+                                   inventory=inventory, stop_early=stop_early)
     print("...done!")
 
     # Make final tweaks to caomlist
@@ -192,21 +241,25 @@ def hlsp_to_xml(config):
     head_strings.append("")
     head = "\n".join(head_strings)
 
-    # Add CAOMxml elements to xmltree
+    # Add CAOMxml elements to xmltree.  Products are usually most of the
+    # template, so when nothing else is placed among them they are written
+    # straight to the file instead of being added to the tree first.
     print("Writing everything to XML...")
+    products = [entry for entry in caomlist if isinstance(entry, CAOMproduct)]
+    if not _can_stream_products(caomlist):
+        products = []
+    streamed = set(map(id, products))
     for entry in sorted(caomlist):
 
+        if id(entry) in streamed:
+            continue
+
         # Skip extra top-level entries caused by recursion in add_value_caomxml
-        if xmltree.find(entry.label) is None:
-            entry.send_to_lxml(xmltree)
+        if builder.find(entry.label) is None:
+            builder.add(entry)
 
     # Write the xml tree to the OUTPUT file
-    # (doctype not a valid argument for python 2.x)
-    xmltree.write(output,
-                  encoding="utf-8",
-                  xml_declaration=True,
-                  #doctype=head,
-                  pretty_print=True)
+    builder.write(output, streams={CAOMproduct.parent: products})
     print("...XML file generated!")
 
     # Print out log stats before finishing
@@ -224,5 +277,8 @@ if __name__ == "__main__":
                                      file to prep for CAOM ingest.""")
     parser.add_argument('config', help="""The user must provide a filepath to
                         a .yaml config file.""")
+    parser.add_argument('--stop_early', action='store_true', default=None,
+                        help="""Stop scanning files for products once every
+                        file type has one, overriding the config file.""")
     line_input = parser.parse_args()
-    hlsp_to_xml(line_input.config)
+    hlsp_to_xml(line_input.config, stop_early=line_input.stop_early)
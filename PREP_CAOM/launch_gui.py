@@ -27,6 +27,7 @@ from lib.MyError import MyError
 from gui.config_generator import *
 from gui.select_files import *
 
+from util.load_hlsp_file import load_hlsp_file
 from util.read_yaml import read_yaml
 
 try:
@@ -115,6 +116,10 @@ class HLSPIngest(QTabWidget):
         # Initialize the file_types variable to None
         self.file_types = None
 
+        # The HLSPFile of the last .hlsp file loaded, which keeps one file
+        # inventory for every run of hlsp_to_xml.
+        self.hlsp_file = None
+
         # Use the GUIbuttons classes to make all necessary buttons, then
         # create a space label to separate buttons on the right and left sides.
         # Make a Layout for the buttons along the top row.
@@ -235,6 +240,7 @@ class HLSPIngest(QTabWidget):
         except TypeError as err:
             self.badMessage(err)
             return
+        self.hlsp_file = load_hlsp_file(filename)
 
         try:
             file_paths = self.hlsp_yaml["FilePaths"]
@@ -350,6 +356,7 @@ class HLSPIngest(QTabWidget):
         # Execute reset modules for both tabs if confirmed
         self.tab1.clearClicked(confirm=False)
         self.tab2.resetClicked()
+        self.hlsp_file = None
         self.resize(1100,500)
         self.neutralMessage("Forms reset")
 
@@ -415,7 +422,7 @@ class HLSPIngest(QTabWidget):
             self.goodMessage("Saved {0}".format(inputs))
             self.goodMessage("Launching hlsp_to_xml...")
             self.goodMessage("...see terminal for output...")
-            hlsp_to_xml(inputs)
+            hlsp_to_xml(inputs, hlsp_file=self.hlsp_file)
 
     def quitClicked(self):
         self.close()
@@ -10,10 +10,25 @@
     ready-made list of labels contained in the list, modules for returning list
     members based on various search parameters, and a way to sort the list for
     final writing to file.
+
+..class::  CAOMxmlBuilder
+    :synopsis:  This class builds a CAOM XML template tree from CAOMxml
+    objects.  It keeps an index of elements by tag, so the parent of each new
+    entry is found without searching the whole tree.
+
+..module::  write_caom_xml
+    :synopsis:  Write a CAOM XML template file section by section, from
+    entries that are made as they are written.  The output matches a
+    pretty-printed tree, without the tree being held in memory.
 """
 
+import bisect
+import itertools
 from lxml import etree
 
+# Each level of a pretty-printed XML file is indented by this much.
+INDENT = "  "
+
 # --------------------
 
 
@@ -53,7 +68,8 @@ class CAOMxml(object):
         """
         Create a new subelement within xmltree for a given CAOMxml object.
         Multiple parameters read from the CAOMxml object are used to organize,
-        label, and otherwise fill out the XML entry.
+        label, and otherwise fill out the XML entry.  This searches the whole
+        tree for the parent, so use CAOMxmlBuilder.add() to add many entries.
 
         :param xmltree:  This is an lxml tree where CAOMxml objects are
                          described in order to ingest files into CAOM.
@@ -204,39 +220,329 @@ class CAOMproduct(CAOMxml):
 class CAOMxmlList(list):
     """
     A CAOMxmlList object maintains a list of CAOMxml (and subtypes)
-    objects, and provides modules to manipulate the list.
+    objects, and provides modules to manipulate the list.  Members are
+    indexed by label, and CAOMheader members by headerKeyword, so they can be
+    found without searching the list.  Use add() and relabel() to keep the
+    indexes current.
     """
 
     def __init__(self):
-        super().__init__
-        self.labels = []
+        super().__init__()
+
+        # Each index holds a sorted list of (position, member) for every key,
+        # so the first member in the list with that key comes first.
+        self._label_index = {}
+        self._header_index = {}
+
+    @property
+    def labels(self):
+        return [member.label for member in self]
+
+    @staticmethod
+    def _index(index, key, position, caom_obj):
+        bisect.insort(index.setdefault(key, []), (position, caom_obj))
+
+    @staticmethod
+    def _unindex(index, key, caom_obj):
+        bucket = index.get(key, [])
+        for n, (position, member) in enumerate(bucket):
+            if member is caom_obj:
+                del bucket[n]
+                if not bucket:
+                    del index[key]
+                return position
+
+        err = "{0} is not a member of this CAOMxmlList!".format(caom_obj)
+        raise ValueError(err)
 
     def add(self, caom_obj):
         if isinstance(caom_obj, CAOMxml):
+            position = len(self)
             self.append(caom_obj)
-            self.labels.append(caom_obj.label)
+            self._index(self._label_index, caom_obj.label, position, caom_obj)
+            if isinstance(caom_obj, CAOMheader):
+                self._index(self._header_index, caom_obj.headerKeyword,
+                            position, caom_obj)
         else:
             err = "CAOMxmlList cannot accept members other than CAOMxml!"
             raise TypeError(err)
 
     def findlabel(self, target):
-        target = str(target)
-        if target in self.labels:
-            for member in self:
-                if member.label == target:
-                    return member
+        bucket = self._label_index.get(str(target))
+        if bucket:
+            return bucket[0][1]
         else:
             return None
 
     def findheader(self, target):
-        target = str(target)
-        for member in self:
-            if isinstance(member, CAOMheader):
-                if member.headerKeyword == target:
-                    return member
+        bucket = self._header_index.get(str(target))
+        if bucket:
+            return bucket[0][1]
         else:
             return None
 
+    def relabel(self, caom_obj, label):
+        """
+        Change the label of a member, keeping the label index current.
+
+        :param caom_obj:  The member to relabel.
+        :type caom_obj:  CAOMxml
+
+        :param label:  The new label.
+        :type label:  str
+        """
+
+        position = self._unindex(self._label_index, caom_obj.label, caom_obj)
+        caom_obj.label = label
+        self._index(self._label_index, caom_obj.label, position, caom_obj)
+
+# --------------------
+
+
+class CAOMxmlBuilder(object):
+    """
+    A CAOMxmlBuilder creates a 'CompositeObservation' tree with the
+    metadataList, provenance and productList sections, and adds CAOMxml
+    objects to it the same way CAOMxml.send_to_lxml() does.  Every element
+    created by the builder is indexed by tag, so finding the parent of a new
+    entry does not search the tree.  Elements added to self.tree by other
+    means are not indexed.
+    """
+
+    root_tag = "CompositeObservation"
+    sections = ["metadataList", "provenance", "productList"]
+
+    def __init__(self):
+        self.root = etree.Element(self.root_tag)
+        self.tree = etree.ElementTree(self.root)
+
+        # The first element in document order for each tag, and the first
+        # child of the root for each tag.
+        self._first = {self.root_tag: self.root}
+        self._top = {}
+
+        for section in self.sections:
+            self.subelement(self.root, section)
+
+    @staticmethod
+    def _precedes(new, existing):
+        """
+        Return whether a new element, which has just been appended to its
+        parent, comes before an existing element in document order.
+
+        :param new:  The element just created.
+        :type new:  lxml.etree.Element
+
+        :param existing:  An element already in the tree.
+        :type existing:  lxml.etree.Element
+        """
+
+        new_path = [new] + list(new.iterancestors())
+        existing_path = [existing] + list(existing.iterancestors())
+        new_path.reverse()
+        existing_path.reverse()
+
+        # Walk down from the root to where the two paths split.
+        for new_branch, existing_branch in zip(new_path, existing_path):
+            if new_branch is existing_branch:
+                continue
+
+            # New elements are usually added at the end of their parent, so
+            # check for a last child before looking up positions.
+            if new_branch.getnext() is None:
+                return False
+            if existing_branch.getnext() is None:
+                return True
+            parent = new_branch.getparent()
+            return parent.index(new_branch) < parent.index(existing_branch)
+
+        # One element is an ancestor of the other.  The new element has no
+        # children, so it must be the descendant.
+        return False
+
+    def add(self, caom_obj):
+        """
+        Create a new entry for a CAOMxml object under the first element with
+        the tag given by its 'parent', creating that parent under the root
+        if there is none.
+
+        :param caom_obj:  The CAOMxml object to add.
+        :type caom_obj:  CAOMxml
+        """
+
+        parent = self._first.get(caom_obj.parent)
+        if parent is None:
+            parent = self.subelement(self.root, caom_obj.parent)
+
+        entry = self.subelement(parent, caom_obj.label)
+        for attr, val in caom_obj.attributes_dict().items():
+            self.subelement(entry, attr, val)
+
+        return entry
+
+    @staticmethod
+    def entry(caom_obj):
+        """
+        Return a new element for a CAOMxml object, outside of any tree and
+        without indexing it.  This is the element add() would create.
+
+        :param caom_obj:  The CAOMxml object to make an element for.
+        :type caom_obj:  CAOMxml
+        """
+
+        entry = etree.Element(caom_obj.label)
+        for attr, val in caom_obj.attributes_dict().items():
+            sub = etree.SubElement(entry, attr)
+            if val is not None:
+                sub.text = val
+
+        return entry
+
+    def find(self, tag):
+        """
+        Return the first child of the root with a given tag, or None.  This
+        matches self.tree.find(tag).
+
+        :param tag:  The tag to look for.
+        :type tag:  str
+        """
+
+        return self._top.get(tag)
+
+    def subelement(self, parent, tag, text=None):
+        """
+        Create and index a new element at the end of a parent element.
+
+        :param parent:  The element to add the new element to.
+        :type parent:  lxml.etree.Element
+
+        :param tag:  The tag of the new element.
+        :type tag:  str
+
+        :param text:  The text of the new element.
+        :type text:  str
+        """
+
+        element = etree.SubElement(parent, tag)
+        if text is not None:
+            element.text = text
+
+        existing = self._first.get(tag)
+        if existing is None or self._precedes(element, existing):
+            self._first[tag] = element
+        if parent is self.root:
+            self._top.setdefault(tag, element)
+
+        return element
+
+    def write(self, output, streams=None):
+        """
+        Write the tree to a file as pretty-printed XML.  Entries in streams
+        are written at the end of their section as if they had been added
+        last, but their elements are only made as they are written.
+
+        :param output:  The file path to write to.
+        :type output:  str
+
+        :param streams:  CAOMxml objects to write at the end of each root
+                         section, by section tag.  None of their tags may be
+                         the parent of another entry.
+        :type streams:  dict
+        """
+
+        if not streams:
+            self.tree.write(output,
+                            encoding="utf-8",
+                            xml_declaration=True,
+                            pretty_print=True,
+                            )
+            return
+
+        sections = []
+        for section in self.root:
+            entries = iter(section)
+            if section.tag in streams:
+                entries = itertools.chain(
+                    entries, map(self.entry, streams[section.tag]))
+            sections.append((section.tag, entries))
+
+        write_caom_xml(output, sections, root_tag=self.root.tag)
+
+# --------------------
+
+
+def _write_element(xmlfile, element, level):
+    """
+    Write an element to an lxml xmlfile, indented as a pretty-printed tree
+    would be.  As in libxml2, the inside of an element is only indented if
+    the element holds nothing but other elements.
+
+    :param xmlfile:  The open xmlfile to write to.
+    :type xmlfile:  lxml.etree.xmlfile
+
+    :param element:  The element to write.  Its tail is not written.
+    :type element:  lxml.etree.Element
+
+    :param level:  The nesting depth of the element.
+    :type level:  int
+    """
+
+    children = list(element)
+    if (not children or element.text is not None or
+            any(child.tail is not None for child in children)):
+        xmlfile.write(element, with_tail=False)
+        return
+
+    with xmlfile.element(element.tag, element.attrib):
+        for child in children:
+            xmlfile.write("\n" + INDENT * (level + 1))
+            _write_element(xmlfile, child, level + 1)
+        xmlfile.write("\n" + INDENT * level)
+
+
+def write_caom_xml(output, sections, root_tag="CompositeObservation"):
+    """
+    Write a CAOM XML template file one section at a time.  Each entry is
+    written as soon as it is produced, so sections can come from generators
+    and the whole tree is never held in memory.  The file is the same as a
+    pretty-printed tree with these sections and entries.
+
+    :param output:  The file path, or binary file object, to write to.
+    :type output:  str
+
+    :param sections:  (tag, entries) for each child of the root, in order,
+                      where entries is an iterable of lxml elements to write
+                      in that section.
+    :type sections:  list
+
+    :param root_tag:  The tag of the root element.
+    :type root_tag:  str
+    """
+
+    if not hasattr(output, "write"):
+        with open(output, "wb") as ofile:
+            return write_caom_xml(ofile, sections, root_tag=root_tag)
+
+    with etree.xmlfile(output, encoding="UTF-8") as xmlfile:
+        xmlfile.write_declaration()
+        with xmlfile.element(root_tag):
+            for tag, entries in sections:
+                entries = iter(entries)
+                first = next(entries, None)
+                xmlfile.write("\n" + INDENT)
+                if first is None:
+                    xmlfile.write(etree.Element(tag))
+                    continue
+                with xmlfile.element(tag):
+                    for entry in itertools.chain([first], entries):
+                        xmlfile.write("\n" + INDENT * 2)
+                        _write_element(xmlfile, entry, 2)
+                    xmlfile.write("\n" + INDENT)
+            xmlfile.write("\n")
+
+    # A pretty-printed file ends with a newline after the root element.
+    output.write(b"\n")
+
 # --------------------
 
 
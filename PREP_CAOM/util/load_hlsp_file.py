@@ -0,0 +1,49 @@
+"""
+..module::  load_hlsp_file
+    :synopsis:  Loads an .hlsp file as an HLSPFile object from the MAST_HLSP
+    lib package, so PREP_CAOM can share its file inventory with the other
+    ingestion steps.  PREP_CAOM has its own lib package, which hides the
+    MAST_HLSP one, so the MAST_HLSP lib and bin packages are imported with
+    the parent directory first on the path and then set aside again.
+"""
+
+import os
+import sys
+
+# The MAST_HLSP directory, which holds the shared lib and bin packages.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+#--------------------
+
+def _shadowed_modules():
+    """ List the loaded modules of the lib and bin packages.
+    """
+
+    return [name for name in sys.modules
+            if name.split(".")[0] in ("lib", "bin")]
+
+#--------------------
+
+def load_hlsp_file(filename=None):
+    """ Load an .hlsp file into a new HLSPFile.  Any lib or bin modules
+    already loaded from PREP_CAOM are put back afterwards.
+
+    :param filename: The .hlsp file to load.  If None, an empty HLSPFile is
+                     returned.
+    :type filename: str
+    """
+
+    saved = {name: sys.modules.pop(name) for name in _shadowed_modules()}
+    sys.path.insert(0, BASE_DIR)
+    try:
+        from lib.HLSPFile import HLSPFile
+    finally:
+        sys.path.remove(BASE_DIR)
+        for name in _shadowed_modules():
+            del sys.modules[name]
+        sys.modules.update(saved)
+
+    return HLSPFile(path=filename)
+
+#--------------------
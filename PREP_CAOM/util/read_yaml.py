@@ -7,6 +7,12 @@
 import os
 import yaml
 
+# Use the libyaml loader if PyYAML was built with libyaml.
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 #--------------------
 
 def read_yaml(path, output=True):
@@ -29,7 +35,7 @@ def read_yaml(path, output=True):
 
     # Use yaml.load to read the contents into a dictionary.
     try:
-        contents = yaml.load(stream)
+        contents = yaml.load(stream, Loader=YamlLoader)
     except yaml.YAMLError:
         err = "{0} is not a YAML formatted file!".format(path)
         raise TypeError(err)
@@ -0,0 +1,198 @@
+"""
+..module:: scan_files
+    :synopsis: Stream every file found below a directory.  Directories are
+    listed with os.scandir in a pool of threads, and the results of each
+    directory are yielded as soon as it and the directories queued before it
+    have been read, instead of being collected into one large list.  The
+    type and symbolic link information cached on each DirEntry is reused,
+    and inodes are tracked to catch symbolic link loops and hard-linked
+    duplicates.
+"""
+
+import collections
+import concurrent.futures
+import logging
+import os
+
+# Each file found is described by one of these records.  'duplicate_of' holds
+# the path of the first file found that shares the same inode (a hard link),
+# or None.
+ScannedFile = collections.namedtuple("ScannedFile", ["path",
+                                                     "dirpath",
+                                                     "name",
+                                                     "size",
+                                                     "mtime",
+                                                     "inode",
+                                                     "is_link",
+                                                     "duplicate_of",
+                                                     ])
+
+# --------------------
+
+
+def _list_directory(dirpath, skip_sym, follow_links, stat):
+    """
+    Read a single directory and sort its entries into files and
+    sub-directories, each in name order.  This runs inside the worker
+    threads, so any stat calls needed are made here in parallel.
+
+    :param dirpath: The directory to list.
+    :type dirpath: str
+
+    :param skip_sym: If True, symbolic links to files are ignored.
+    :type skip_sym: bool
+
+    :param follow_links: If True, symbolic links to directories are returned
+                         as sub-directories to descend into.
+    :type follow_links: bool
+
+    :param stat: If True, stat each file for its size and modification time.
+    :type stat: bool
+    """
+
+    files = []
+    subdirs = []
+
+    try:
+        entries = os.scandir(dirpath)
+    except OSError as err:
+        logging.warning("Could not read directory {0}: {1}".format(dirpath,
+                                                                   err))
+        return files, subdirs
+
+    with entries:
+        for entry in entries:
+
+            # DirEntry caches the file type from the directory listing, so
+            # these only cost a system call for symbolic links.
+            try:
+                is_link = entry.is_symlink()
+                is_dir = entry.is_dir()
+            except OSError:
+                is_link = False
+                is_dir = False
+
+            if is_dir:
+                if follow_links or not is_link:
+                    subdirs.append(entry)
+                continue
+
+            if skip_sym and is_link:
+                continue
+
+            size = mtime = device = nlink = None
+            inode = entry.inode()
+            if stat:
+                try:
+                    info = entry.stat()
+                except OSError:
+                    # A broken symbolic link is still reported as a file,
+                    # describe the link itself.  If that fails too, the file
+                    # was removed after the directory was listed.
+                    try:
+                        info = entry.stat(follow_symlinks=False)
+                    except OSError as err:
+                        logging.warning("Could not read file {0}: {1}".format(
+                            entry.path, err))
+                        continue
+                size = info.st_size
+                mtime = info.st_mtime
+                inode = info.st_ino
+                device = info.st_dev
+                nlink = info.st_nlink
+
+            files.append((entry.path, dirpath, entry.name, size, mtime,
+                          inode, is_link, device, nlink))
+
+    # Directory listings come back in no particular order.
+    files.sort(key=lambda info: info[2])
+    subdirs.sort(key=lambda entry: entry.name)
+
+    return files, subdirs
+
+# --------------------
+
+
+def scan_files(idir, skip_sym=False, follow_links=False, stat=True,
+               workers=None):
+    """
+    Yield a ScannedFile record for every file within the input directory,
+    including sub-directories.  Directories are visited breadth first, and
+    the files of each directory are yielded in name order, so the same tree
+    always gives the same order however the reads are scheduled.
+
+    :param idir: The directory to scan.
+    :type idir: str
+
+    :param skip_sym: If True, will ignore symbolic links to files.
+    :type skip_sym: bool
+
+    :param follow_links: If True, descend into symbolic links to directories.
+                         Directories already visited (by inode) are skipped
+                         to protect against link loops.
+    :type follow_links: bool
+
+    :param stat: If True (default), fill in size, modification time and
+                 hard link information for each file.  Set False when only
+                 the file names are needed.
+    :type stat: bool
+
+    :param workers: Number of threads used to list directories.  Defaults to
+                    the ThreadPoolExecutor default.
+    :type workers: int
+    """
+
+    root = os.path.abspath(idir)
+
+    # Track directories by (device, inode) so a followed link that points
+    # back up the tree is only read once.
+    root_info = os.stat(root)
+    visited_dirs = {(root_info.st_dev, root_info.st_ino)}
+
+    # Track files with more than one hard link, to flag later copies.
+    linked_files = {}
+
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        # Directories are read in parallel, but their results are taken in
+        # the order they were queued.
+        pending = collections.deque([pool.submit(_list_directory, root,
+                                                 skip_sym, follow_links,
+                                                 stat)])
+
+        while pending:
+            files, subdirs = pending.popleft().result()
+
+            # Queue up sub-directories before handing back any files, so
+            # the pool stays busy while the caller works.
+            for sub in subdirs:
+                if follow_links:
+                    # Real directories are tracked too, so a link found
+                    # later that points at one is not read twice.
+                    try:
+                        info = sub.stat()
+                    except OSError:
+                        continue
+                    key = (info.st_dev, info.st_ino)
+                    if key in visited_dirs:
+                        logging.warning("Symbolic link loop skipped: "
+                                        "{0}".format(sub.path))
+                        continue
+                    visited_dirs.add(key)
+                pending.append(pool.submit(_list_directory, sub.path,
+                                           skip_sym, follow_links, stat))
+
+            for (path, dirpath, name, size, mtime, inode, is_link, device,
+                 nlink) in files:
+                duplicate_of = None
+                if nlink and nlink > 1:
+                    key = (device, inode)
+                    duplicate_of = linked_files.setdefault(key, path)
+                    if duplicate_of == path:
+                        duplicate_of = None
+                yield ScannedFile(path, dirpath, name, size, mtime, inode,
+                                  is_link, duplicate_of)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# --------------------
@@ -1,5 +1,6 @@
 __all__ = ["check_log",
            "check_paths",
            "new_logger",
-           "read_yaml"
+           "read_yaml",
+           "scan_files"
            ]
@@ -0,0 +1,127 @@
+"""
+..module:: benchmark_hlsp_io
+    :synopsis: Time loading and saving a large .hlsp file, with the
+    pure-Python YAML loader and dumper, with the libyaml ones used by
+    read_yaml and write_yaml, and with the binary sidecar.
+
+    Run from the MAST_HLSP directory:  python -m bin.benchmark_hlsp_io
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+import yaml
+
+from bin.read_yaml import (YamlDumper, YamlLoader, read_sidecar, read_yaml,
+                           write_sidecar, write_yaml)
+
+# --------------------
+
+
+def make_hlsp_dict(n_keywords, n_parameters):
+    """ Build the contents of an .hlsp file with large KeywordUpdates and
+    UniqueParameters sections.
+
+    :param n_keywords: The number of entries in KeywordUpdates.
+    :type n_keywords: int
+
+    :param n_parameters: The number of entries in each UniqueParameters
+        section.
+    :type n_parameters: int
+    """
+
+    keyword_updates = []
+    for ii in range(n_keywords):
+        keyword_updates.append({"KEY{0:05d}".format(ii): {
+            "alternates": ["ALT{0:05d}".format(ii)],
+            "caom_keyword": "caom_{0}".format(ii),
+            "caom_status": "recommended",
+            "default": "None",
+            "header": ii % 3,
+            "hlsp_status": "required",
+            "multiple": False,
+            "xml_parent": "metadataList",
+            }})
+
+    unique_parameters = {}
+    for parent in ["metadataList", "provenance", "productList"]:
+        unique_parameters[parent] = {"{0}_{1:05d}".format(parent, ii):
+                                     "value {0}".format(ii)
+                                     for ii in range(n_parameters)}
+
+    return {"HlspName": "benchmark",
+            "FileTypes": [{"_lc.fits": {"FileType": "FITS"}}],
+            "KeywordUpdates": keyword_updates,
+            "UniqueParameters": unique_parameters,
+            }
+
+# --------------------
+
+
+def benchmark(n_keywords, n_parameters, repeat):
+    """ Print the best time of each way to save and load an .hlsp file.
+
+    :param n_keywords: The number of entries in KeywordUpdates.
+    :type n_keywords: int
+
+    :param n_parameters: The number of entries in each UniqueParameters
+        section.
+    :type n_parameters: int
+
+    :param repeat: The number of times to repeat each measurement.
+    :type repeat: int
+    """
+
+    contents = make_hlsp_dict(n_keywords, n_parameters)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "benchmark.hlsp")
+
+        def save_python():
+            with open(path, 'w') as stream:
+                yaml.dump(contents, stream, Dumper=yaml.SafeDumper,
+                          default_flow_style=False)
+
+        def load_python():
+            with open(path, 'r') as stream:
+                return yaml.load(stream, Loader=yaml.SafeLoader)
+
+        def save_sidecar():
+            write_yaml(contents, path)
+            write_sidecar(contents, path)
+
+        tests = [("save, pure-Python dumper", save_python),
+                 ("save, {0}".format(YamlDumper.__base__.__name__),
+                  lambda: write_yaml(contents, path)),
+                 ("save, {0} + sidecar".format(YamlDumper.__base__.__name__),
+                  save_sidecar),
+                 ("load, pure-Python loader", load_python),
+                 ("load, {0}".format(YamlLoader.__name__),
+                  lambda: read_yaml(path, output=False)),
+                 ("load, sidecar", lambda: read_sidecar(path)),
+                 ]
+
+        print("{0} KeywordUpdates, {1} UniqueParameters per section".format(
+            n_keywords, n_parameters))
+        for name, func in tests:
+            best = min(timeit.repeat(func, number=1, repeat=repeat))
+            print("  {0:<35} {1:9.4f} s".format(name, best))
+
+        # The sidecar must hold what the YAML file does.
+        assert read_sidecar(path) == read_yaml(path, output=False)
+
+# --------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time loading and saving a large .hlsp file.")
+    parser.add_argument("--keywords", type=int, default=5000,
+                        help="Number of KeywordUpdates entries.")
+    parser.add_argument("--parameters", type=int, default=5000,
+                        help="Number of entries per UniqueParameters section.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of times to repeat each measurement.")
+    args = parser.parse_args()
+    benchmark(args.keywords, args.parameters, args.repeat)
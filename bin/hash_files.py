@@ -0,0 +1,120 @@
+"""
+..module:: hash_files
+    :synopsis: Compute the checksums of many files at once.  Each file is read
+    in large blocks into a buffer that is reused for the whole file, and
+    files are hashed in a pool of threads.  hashlib releases the GIL while it
+    digests a block, so the reads and hashing of different files overlap and
+    a large delivery is limited by disk bandwidth rather than by hashing one
+    file at a time.
+"""
+
+import concurrent.futures
+import hashlib
+import logging
+import os
+
+# The digests computed for each file, in the order they are returned.
+ALGORITHMS = ("md5", "sha256")
+
+# Files are read this many bytes at a time.
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# --------------------
+
+
+def hash_file(path, algorithms=ALGORITHMS, block_size=BLOCK_SIZE):
+    """ Return a tuple of the hex digests of a single file, one for each of
+    the hashlib algorithms requested.  The file is read only once, however
+    many digests are computed.
+
+    :param path: The file to hash.
+    :type path: str
+
+    :param algorithms: The names of the hashlib algorithms to use.
+    :type algorithms: tuple
+
+    :param block_size: The number of bytes to read at a time.
+    :type block_size: int
+    """
+
+    hashes = [hashlib.new(name) for name in algorithms]
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+
+    # Read straight into the buffer, without Python's own buffering, since
+    # each read is already large.
+    with open(path, 'rb', buffering=0) as stream:
+        while True:
+            size = stream.readinto(buffer)
+            if not size:
+                break
+            block = view[:size]
+            for hsh in hashes:
+                hsh.update(block)
+
+    return tuple(hsh.hexdigest() for hsh in hashes)
+
+# --------------------
+
+
+def _hash_or_warn(path, algorithms, block_size):
+    """ Hash a file inside a worker thread, returning (path, digests).  If the
+    file cannot be read, log a warning and return (path, None).
+    """
+
+    try:
+        return path, hash_file(path, algorithms, block_size)
+    except OSError as err:
+        logging.warning("Could not compute checksums of {0}: {1}"
+                        .format(path, err))
+        return path, None
+
+# --------------------
+
+
+def hash_files(paths, algorithms=ALGORITHMS, block_size=BLOCK_SIZE,
+               workers=None):
+    """ Yield (path, digests) for every file in paths, as soon as each one
+    has been hashed, so results do not arrive in the order given.  digests is
+    the tuple returned by hash_file, or None if the file could not be read.
+
+    :param paths: The files to hash.  This may be a generator; only a few
+                  files per thread are queued at a time.
+    :type paths: iterable
+
+    :param algorithms: The names of the hashlib algorithms to use.
+    :type algorithms: tuple
+
+    :param block_size: The number of bytes to read at a time.
+    :type block_size: int
+
+    :param workers: Number of threads hashing files.  Defaults to the
+                    ThreadPoolExecutor default.
+    :type workers: int
+    """
+
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+
+    # Keep enough files queued that no thread waits for work, without
+    # holding a future for every file of a very large delivery.
+    queue_size = workers * 4
+
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        for path in paths:
+            pending.add(pool.submit(_hash_or_warn, path, algorithms,
+                                    block_size))
+            if len(pending) >= queue_size:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# --------------------
@@ -1,12 +1,33 @@
 """
 ..module:: read_yaml
     :synopsis: Open a provided file path and load the yaml-formatted contents
-    into a dictionary.
+    into a dictionary.  Also provides the matching write_yaml, and a binary
+    sidecar file that can be read back faster than the YAML it was saved
+    with.
 """
 
 import os
+import pickle
 import yaml
 
+# Use the libyaml loader and dumper if PyYAML was built with libyaml, since
+# they are much faster than the pure-Python versions.
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as _SafeDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as _SafeDumper
+
+
+class YamlDumper(_SafeDumper):
+    """ A safe YAML dumper that writes tuples as plain lists. """
+
+
+YamlDumper.add_representer(tuple, YamlDumper.represent_list)
+
+# A sidecar is written next to the YAML file with this extension appended.
+SIDECAR_EXT = ".pickle"
+SIDECAR_PROTOCOL = 5
+
 # --------------------
 
 
@@ -32,12 +53,12 @@ def read_yaml(path, output=True):
 
     # Use yaml.load to read the contents into a dictionary.
     try:
-        contents = yaml.load(stream)
+        contents = yaml.load(stream, Loader=YamlLoader)
     except yaml.YAMLError:
         err = "{0} is not a YAML formatted file!".format(path)
         raise TypeError(err)
-
-    stream.close()
+    finally:
+        stream.close()
 
     if isinstance(contents, dict):
         return contents
@@ -48,6 +69,81 @@ def read_yaml(path, output=True):
 # --------------------
 
 
+def write_yaml(contents, path):
+    """ Write a dictionary to a provided file path in YAML format.
+
+    :param contents: The dictionary to write.
+    :type contents: dict
+
+    :param path: File path of the .yaml file to write.
+    :type path: string
+    """
+
+    with open(path, 'w') as stream:
+        yaml.dump(contents, stream, Dumper=YamlDumper,
+                  default_flow_style=False)
+
+# --------------------
+
+
+def read_sidecar(path):
+    """ Load the contents of a YAML file from its binary sidecar.  The
+    sidecar is only used if it is newer than the YAML file and was written
+    from this version of it, so editing the YAML file by hand makes the
+    sidecar stale.  Return None if there is no usable sidecar.
+
+    :param path: File path of the .yaml file the sidecar was written for.
+    :type path: string
+    """
+
+    sidecar = "".join([path, SIDECAR_EXT])
+    try:
+        yaml_stat = os.stat(path)
+        if os.stat(sidecar).st_mtime_ns < yaml_stat.st_mtime_ns:
+            return None
+        with open(sidecar, 'rb') as stream:
+            written_from, contents = pickle.load(stream)
+    except (OSError, EOFError, ValueError, TypeError,
+            pickle.UnpicklingError):
+        return None
+
+    if written_from != (yaml_stat.st_mtime_ns, yaml_stat.st_size):
+        return None
+
+    return contents
+
+# --------------------
+
+
+def write_sidecar(contents, path):
+    """ Write the contents of a YAML file to a binary sidecar next to it.
+    The sidecar is only an optimization, so a failure to write it is
+    ignored.  Return the sidecar path, or None if it was not written.
+
+    :param contents: The dictionary that was written to the YAML file.
+    :type contents: dict
+
+    :param path: File path of the .yaml file just written.
+    :type path: string
+    """
+
+    sidecar = "".join([path, SIDECAR_EXT])
+    temp_file = ".".join([sidecar, str(os.getpid())])
+    try:
+        yaml_stat = os.stat(path)
+        written_from = (yaml_stat.st_mtime_ns, yaml_stat.st_size)
+        with open(temp_file, 'wb') as stream:
+            pickle.dump((written_from, contents), stream,
+                        protocol=SIDECAR_PROTOCOL)
+        os.replace(temp_file, sidecar)
+    except OSError:
+        return None
+
+    return sidecar
+
+# --------------------
+
+
 if __name__ == "__main__":
     f = "../fake/k2sff_test.hlsp"
     d = read_yaml(f)
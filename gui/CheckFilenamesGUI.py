@@ -112,6 +112,12 @@ class CheckFilenamesGUI(QWidget):
                 self.log_display.clear()
             self.log_display.append(line[:-1])
 
+    def _finish_run(self, script):
+
+        # The file count comes from the inventory taken by the check itself.
+        self.master.files_found = script.count
+        self._display_log(script.log)
+
     def _update_button_state(self):
         """
         Update the approve_button status and appearance based on the
@@ -176,10 +182,9 @@ class CheckFilenamesGUI(QWidget):
 
         # Launch the check_file_names module.
         self.master.progress.setValue(0)
-        script = ScriptThread(current_path, current_name)
-        script.finished.connect(lambda: self._display_log(script.log))
+        script = ScriptThread(current_path, current_name, self.master.hlsp)
+        script.finished.connect(lambda: self._finish_run(script))
         self.master.running.emit()
-        self.master.files_found = script.count
         script.start()
         self.master.progress.setValue(100)
 
@@ -231,26 +236,34 @@ class CheckFilenamesGUI(QWidget):
 
 class ScriptThread(QThread):
 
-    def __init__(self, path, name):
+    def __init__(self, path, name, hlsp=None):
 
         super().__init__()
         self._path = path
         self._name = name
+        self._hlsp = hlsp
         self.log = None
         self.count = None
-        # self._count_files()
-
-    def _count_files(self):
 
-        temp = []
-        for _p, _d, files in os.walk(self._path):
-            temp.extend(files)
+    def _count_files(self, inventory):
 
-        self.count = len(temp)
+        # Count from the shared inventory rather than walking the path again.
+        self.count = len(inventory)
 
     def run(self):
 
-        self.log = check_file_names.check_file_names(self._path, self._name)
+        # Take a fresh inventory for the parent HLSPFile, so later steps in
+        # the GUI can reuse it.
+        inventory = None
+        if self._hlsp is not None:
+            self._hlsp.update_filepaths(input=self._path)
+            inventory = self._hlsp.get_inventory(refresh=True)
+            self._count_files(inventory)
+
+        self.log = check_file_names.check_file_names(self._path,
+                                                     self._name,
+                                                     inventory=inventory,
+                                                     )
 
 
 # --------------------
@@ -544,7 +544,7 @@ def read_parameter_file(ifile):
     # Read in parameter file.
     if os.path.isfile(ifile):
         with open(ifile, 'r') as istream:
-            yaml_data = yaml.load(istream)
+            yaml_data = yaml.load(istream, Loader=yaml.SafeLoader)
         return yaml_data
     else:
         raise OSError('Input parameter file not found.  Looking for "' +
@@ -2,12 +2,12 @@ import gui.GUIbuttons as gb
 import os
 import sys
 
-from bin.read_yaml import read_yaml
 from CHECK_METADATA_FORMAT.check_metadata_format import check_metadata_format
 from CHECK_METADATA_FORMAT.precheck_data_format import precheck_data_format
 from lib.CAOMKeywordBox import CAOMKeywordBox
 from lib.FileType import FileType
 from lib.FitsKeyword import FitsKeyword
+from lib.TemplateRegistry import TemplateRegistry
 
 try:
     from PyQt5.QtCore import *
@@ -295,7 +295,8 @@ class UpdateKeywordsGUI(QWidget):
             return
 
         # Read the template file and access the keywords information.
-        template = read_yaml(self.standard_template)
+        templates = TemplateRegistry.shared(self.templates_dir)
+        template = templates.read(self.standard_template)
         keywords = template["KEYWORDS"]
 
         # Use the template file information to create FitsKeyword objects and
@@ -155,8 +155,17 @@ class CheckMetadataGUI(QWidget):
         self.metacheck_button = gb.GreenButton(meta_msg, 70)
         self.metacheck_button.clicked.connect(self.metacheck_clicked)
         self.metacheck_button.setEnabled(False)
+        workers_label = QLabel("Worker Processes:")
+        self.workers_box = QSpinBox()
+        self.workers_box.setRange(1, os.cpu_count() or 1)
+        self.workers_box.setValue(1)
+        self.workers_box.setToolTip("Check files in a pool of this many"
+                                    " processes.  With 1, files are checked"
+                                    " one at a time.")
         self.check_grid = QGridLayout()
         self.check_grid.addWidget(self.metacheck_button, 0, 0)
+        self.check_grid.addWidget(workers_label, 0, 1)
+        self.check_grid.addWidget(self.workers_box, 0, 2)
 
         # Construct the overall layout.
         self.type_count_label = QLabel()
@@ -513,7 +522,8 @@ class CheckMetadataGUI(QWidget):
         # Launch check_metadata_format with the current contents of the parent
         # HLSPFile as a dict.
         self.master.running.emit()
-        thr = CheckThread(self.master.hlsp)
+        thr = CheckThread(self.master.hlsp,
+                          workers=self.workers_box.value())
         print("metacheck_clicked made a CheckThread")
         thr.finished.connect(lambda: self._finish_metacheck(thr))
         print("metacheck_clicked connected the CheckThread")
@@ -529,7 +539,7 @@ class CheckMetadataGUI(QWidget):
 
         # Launch the precheck_data_format script.
         self.master.running.emit()
-        thr = PrecheckThread(hlsp_dir, hlsp_name)
+        thr = PrecheckThread(hlsp_dir, hlsp_name, self.master.hlsp)
         thr.finished.connect(lambda: self._finish_precheck(thr))
         thr.start()
 
@@ -554,16 +564,18 @@ class CheckMetadataGUI(QWidget):
 
 class CheckThread(QThread):
 
-    def __init__(self, hlsp_dict):
+    def __init__(self, hlsp_dict, workers=None):
 
         super().__init__()
         self._hlsp = hlsp_dict
+        self._workers = workers
         print("CheckThread() initiated")
 
     def run(self):
 
         print("Beginning check_metadata_format")
-        check_metadata_format(self._hlsp, is_file=False)
+        check_metadata_format(self._hlsp, is_file=False,
+                              workers=self._workers)
         print("check_metadata_format is done")
 
 # --------------------
@@ -571,15 +583,31 @@ class CheckThread(QThread):
 
 class PrecheckThread(QThread):
 
-    def __init__(self, path, name):
+    def __init__(self, path, name, hlsp=None):
 
         super().__init__()
         self._path = path
         self._name = name
+        self._hlsp = hlsp
 
     def run(self):
 
-        self.results = precheck_data_format(self._path, self._name)
+        # Reuse the file inventory of the HLSPFile, but only if its data
+        # directory is the one being prechecked.  Otherwise precheck walks
+        # the directory itself.
+        inventory = None
+        if self._hlsp is not None:
+            try:
+                data_path = self._hlsp.get_data_path()
+            except AttributeError:
+                data_path = None
+            if (data_path and os.path.realpath(data_path) ==
+                    os.path.realpath(self._path)):
+                inventory = self._hlsp.get_inventory()
+        self.results = precheck_data_format(self._path,
+                                            self._name,
+                                            inventory=inventory,
+                                            )
 
 
 # --------------------
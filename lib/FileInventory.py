@@ -0,0 +1,223 @@
+"""
+..class::  FileInventory
+    :synopsis:  This class walks an HLSP data directory a single time and
+    keeps a record of every file found (path, file name fields, file ending,
+    size, modification time and inode).  One inventory is attached to an
+    HLSPFile and shared by each ingestion step, so the data directory does
+    not need to be walked again by every stage.
+
+    Paths are stored compactly: each directory is stored once in a directory
+    table, and each file only keeps a directory index and its base name.
+    Sizes, modification times and inodes are kept in typed arrays.  Full
+    paths and InventoryRecord tuples are only built as they are needed.
+
+..class::  InventoryRecord
+    :synopsis:  A named tuple describing a single file in a FileInventory.
+"""
+
+import array
+import collections
+import os
+
+from bin.scan_files import scan_files
+
+InventoryRecord = collections.namedtuple("InventoryRecord", ["path",
+                                                             "dirpath",
+                                                             "name",
+                                                             "fields",
+                                                             "ending",
+                                                             "size",
+                                                             "mtime",
+                                                             "inode",
+                                                             ])
+
+# --------------------
+
+
+class FileInventory(object):
+    """
+    Walk an HLSP data directory once and provide the results to any
+    ingestion step that needs them.
+
+    ..module::  _record
+    ..synopsis::  Build the InventoryRecord for a single file.
+
+    ..module::  directories
+    ..synopsis::  Return the unique directories containing files.
+
+    ..module::  endings
+    ..synopsis::  Return the set of unique file endings found.
+
+    ..module::  names
+    ..synopsis::  Return the base names of all files found.
+
+    ..module::  path
+    ..synopsis::  Return the full path of a single file.
+
+    ..module::  paths
+    ..synopsis::  Return a list of the full paths of all files found.
+
+    ..module::  scan
+    ..synopsis::  Walk the root directory and (re)build the inventory.
+
+    ..module::  with_endings
+    ..synopsis::  Yield the records whose file ending is in a given
+                  collection.
+    """
+
+    def __init__(self, root, skip_sym=False, workers=None):
+        """
+        Initialize a new FileInventory and scan the root directory.
+
+        :param root:  The HLSP data directory to take an inventory of.
+        :type root:  str
+
+        :param skip_sym:  If True, symbolic links to files are ignored.
+        :type skip_sym:  bool
+
+        :param workers:  Number of threads used to list directories.
+        :type workers:  int
+        """
+
+        self.root = os.path.abspath(root)
+        self.skip_sym = skip_sym
+        self._workers = workers
+
+        # The directory table, and the per-file columns.
+        self._dirs = []
+        self._dir_ids = array.array("L")
+        self._names = []
+        self._sizes = array.array("q")
+        self._mtimes = array.array("d")
+        self._inodes = array.array("Q")
+
+        self.scan()
+
+    def __iter__(self):
+        for ii in range(len(self._names)):
+            yield self._record(ii)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return "<FileInventory ({0}): {1} files>".format(self.root, len(self))
+
+    def _record(self, ii):
+        """
+        Build the InventoryRecord for a single file.
+
+        :param ii:  The index of the file in the inventory.
+        :type ii:  int
+        """
+
+        dirpath = self._dirs[self._dir_ids[ii]]
+        name = self._names[ii]
+        fields = tuple(name.split("_"))
+
+        return InventoryRecord(os.path.join(dirpath, name),
+                               dirpath,
+                               name,
+                               fields,
+                               fields[-1],
+                               self._sizes[ii],
+                               self._mtimes[ii],
+                               self._inodes[ii],
+                               )
+
+    def directories(self):
+        """
+        Return the unique directories containing files.  Each directory is
+        only listed once, so checks on directory paths can be made once per
+        directory rather than once per file.
+        """
+
+        return list(self._dirs)
+
+    def endings(self):
+        """
+        Return the set of unique file endings found.  The ending is the final
+        underscore-separated field of a file name, such as 'lc.fits'.
+        """
+
+        return set(name.rpartition("_")[2] for name in self._names)
+
+    def names(self):
+        """
+        Return the base names of all files found, in inventory order.  This
+        is the inventory's own list rather than a copy, so it must not be
+        changed.
+        """
+
+        return self._names
+
+    def path(self, ii):
+        """
+        Return the full path of a single file.
+
+        :param ii:  The index of the file in the inventory.
+        :type ii:  int
+        """
+
+        return os.path.join(self._dirs[self._dir_ids[ii]], self._names[ii])
+
+    def paths(self):
+        """
+        Return a list of the full paths of all files found.
+        """
+
+        dirs = self._dirs
+        return [os.path.join(dirs[d], name)
+                for d, name in zip(self._dir_ids, self._names)]
+
+    def scan(self):
+        """
+        Walk the root directory and (re)build the inventory.
+        """
+
+        dirs = []
+        dir_index = {}
+        dir_ids = array.array("L")
+        names = []
+        sizes = array.array("q")
+        mtimes = array.array("d")
+        inodes = array.array("Q")
+
+        for scanned in scan_files(self.root,
+                                  skip_sym=self.skip_sym,
+                                  workers=self._workers,
+                                  ):
+
+            # Add each directory to the table the first time it is seen.
+            dir_id = dir_index.get(scanned.dirpath)
+            if dir_id is None:
+                dir_id = dir_index[scanned.dirpath] = len(dirs)
+                dirs.append(scanned.dirpath)
+
+            dir_ids.append(dir_id)
+            names.append(scanned.name)
+            sizes.append(scanned.size)
+            mtimes.append(scanned.mtime)
+            inodes.append(scanned.inode)
+
+        self._dirs = dirs
+        self._dir_ids = dir_ids
+        self._names = names
+        self._sizes = sizes
+        self._mtimes = mtimes
+        self._inodes = inodes
+
+    def with_endings(self, endings):
+        """
+        Yield the records whose file ending is in a given collection.
+
+        :param endings:  The file endings to select, such as ['lc.fits'].
+        :type endings:  list
+        """
+
+        endings = set(endings)
+        for ii, name in enumerate(self._names):
+            if name.rpartition("_")[2] in endings:
+                yield self._record(ii)
+
+# --------------------
@@ -0,0 +1,342 @@
+"""
+..class::  FileManifest
+    :synopsis:  This class keeps a small SQLite database next to an .hlsp
+    file.  For every file in the HLSP data directory it records the size,
+    modification time and inode, along with the messages produced by the
+    last run of each ingestion check.  A re-run of a check can then compare
+    a fresh FileInventory against the manifest, examine only the files that
+    were changed or added, and reuse the stored results for the rest.  The
+    byte offsets of the HDUs of each FITS file read are also kept, so later
+    reads of an unchanged file can seek straight to the headers they need,
+    as are the checksums of each file, so unchanged files are not hashed
+    again.
+"""
+
+import hashlib
+import json
+import sqlite3
+
+# --------------------
+
+
+class FileManifest(object):
+    """
+    Record file states and per-file check results in an on-disk SQLite
+    database, so that ingestion checks can be run incrementally.
+
+    ..module::  close
+    ..synopsis::  Commit any pending changes and close the database.
+
+    ..module::  get_checksums
+    ..synopsis::  Return the stored checksums of unchanged files.
+
+    ..module::  get_hdu_indexes
+    ..synopsis::  Return the stored HDU offsets of unchanged files.
+
+    ..module::  get_results
+    ..synopsis::  Return the stored check results for a given step.
+
+    ..module::  make_signature
+    ..synopsis::  Hash a collection of check settings into a signature
+                  string.
+
+    ..module::  remove
+    ..synopsis::  Remove the stored results of files from the manifest.
+
+    ..module::  split
+    ..synopsis::  Sort inventory records into files that need checking,
+                  files with reusable results, and files that have been
+                  removed.
+
+    ..module::  update
+    ..synopsis::  Store new check results for a step.
+
+    ..module::  update_checksums
+    ..synopsis::  Store the checksums of files.
+
+    ..module::  update_hdu_indexes
+    ..synopsis::  Store the HDU offsets of files.
+    """
+
+    _file_ext = ".manifest"
+
+    _schema = ["CREATE TABLE IF NOT EXISTS steps ("
+               " step TEXT PRIMARY KEY,"
+               " signature TEXT)",
+               "CREATE TABLE IF NOT EXISTS results ("
+               " path TEXT,"
+               " step TEXT,"
+               " size INTEGER,"
+               " mtime REAL,"
+               " inode INTEGER,"
+               " messages TEXT,"
+               " PRIMARY KEY (path, step))",
+               "CREATE TABLE IF NOT EXISTS hdu_indexes ("
+               " path TEXT PRIMARY KEY,"
+               " size INTEGER,"
+               " mtime REAL,"
+               " inode INTEGER,"
+               " offsets TEXT)",
+               "CREATE TABLE IF NOT EXISTS checksums ("
+               " path TEXT PRIMARY KEY,"
+               " size INTEGER,"
+               " mtime REAL,"
+               " inode INTEGER,"
+               " md5 TEXT,"
+               " sha256 TEXT)",
+               ]
+
+    def __init__(self, filename):
+        """
+        Open (or create) a manifest database.
+
+        :param filename:  The file path of the manifest.  If this does not
+                          end with the manifest extension it will be added.
+        :type filename:  str
+        """
+
+        if not filename.endswith(self._file_ext):
+            filename = "".join([filename, self._file_ext])
+
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        for statement in self._schema:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "<FileManifest ({0})>".format(self.filename)
+
+    @staticmethod
+    def _state(record):
+        """
+        Return the (size, mtime, inode) state of an inventory record.
+
+        :param record:  A record from a FileInventory.
+        :type record:  InventoryRecord
+        """
+
+        return (record.size, record.mtime, record.inode)
+
+    def close(self):
+        """
+        Commit any pending changes and close the database.
+        """
+
+        if self._db:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def get_checksums(self, records):
+        """
+        Return the stored checksums of files that are unchanged since they
+        were stored, as a dictionary of {path: (md5, sha256)}.
+
+        :param records:  The inventory records of the files.
+        :type records:  iterable
+        """
+
+        states = {rec.path: self._state(rec) for rec in records
+                  if rec.mtime is not None}
+        rows = self._db.execute("SELECT path, size, mtime, inode, md5, sha256 "
+                                "FROM checksums")
+
+        return {path: (md5, sha256)
+                for path, size, mtime, inode, md5, sha256 in rows
+                if states.get(path) == (size, mtime, inode)}
+
+    def get_hdu_indexes(self, records):
+        """
+        Return the stored HDU offsets of files that are unchanged since they
+        were stored, as a dictionary of {path: [(header, data), ...]} with
+        the byte offsets of the header and data unit of each HDU.
+
+        :param records:  The inventory records of the files.
+        :type records:  iterable
+        """
+
+        states = {rec.path: self._state(rec) for rec in records
+                  if rec.mtime is not None}
+        rows = self._db.execute("SELECT path, size, mtime, inode, offsets "
+                                "FROM hdu_indexes")
+
+        return {path: [tuple(hdu) for hdu in json.loads(offsets)]
+                for path, size, mtime, inode, offsets in rows
+                if states.get(path) == (size, mtime, inode)}
+
+    def get_results(self, step):
+        """
+        Return the stored check results for a given step, as a dictionary of
+        {path: ((size, mtime, inode), messages)}.
+
+        :param step:  The name of the ingestion step.
+        :type step:  str
+        """
+
+        rows = self._db.execute("SELECT path, size, mtime, inode, messages "
+                                "FROM results WHERE step = ?", (step,))
+
+        return {path: ((size, mtime, inode), json.loads(messages))
+                for path, size, mtime, inode, messages in rows}
+
+    @staticmethod
+    def make_signature(settings):
+        """
+        Hash a collection of check settings into a signature string.  Stored
+        results are only reused while the signature of a step is unchanged.
+
+        :param settings:  Anything that can be written to JSON, such as a
+                          list of known values or template keywords.
+        :type settings:  obj
+        """
+
+        as_text = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.md5(as_text.encode("utf-8")).hexdigest()
+
+    def remove(self, paths, step=None):
+        """
+        Remove the stored results of files from the manifest.
+
+        :param paths:  The file paths to remove.
+        :type paths:  list
+
+        :param step:  Only remove results of this ingestion step (optional).
+        :type step:  str
+        """
+
+        if step:
+            self._db.executemany("DELETE FROM results "
+                                 "WHERE path = ? AND step = ?",
+                                 [(p, step) for p in paths])
+        else:
+            self._db.executemany("DELETE FROM results WHERE path = ?",
+                                 [(p,) for p in paths])
+            self._db.executemany("DELETE FROM hdu_indexes WHERE path = ?",
+                                 [(p,) for p in paths])
+            self._db.executemany("DELETE FROM checksums WHERE path = ?",
+                                 [(p,) for p in paths])
+        self._db.commit()
+
+    def split(self, records, step, signature=None):
+        """
+        Sort inventory records into files that need checking for a given
+        step, files with results that can be reused, and files checked last
+        time that are no longer present.  Results for removed files are
+        dropped from the manifest.
+
+        Returns a tuple of (records to check, {path: cached messages},
+        list of removed paths).
+
+        :param records:  The current records to check, such as a whole
+                         FileInventory or the records with certain endings.
+        :type records:  iterable
+
+        :param step:  The name of the ingestion step.
+        :type step:  str
+
+        :param signature:  A signature of the settings used by the check.  If
+                           this differs from the last run, no stored results
+                           are reused.
+        :type signature:  str
+        """
+
+        # Stored results are only valid for the settings that made them.
+        row = self._db.execute("SELECT signature FROM steps WHERE step = ?",
+                               (step,)).fetchone()
+        if row is None or row[0] != signature:
+            self._db.execute("DELETE FROM results WHERE step = ?", (step,))
+            self._db.execute("INSERT OR REPLACE INTO steps VALUES (?, ?)",
+                             (step, signature))
+            stored = {}
+        else:
+            stored = self.get_results(step)
+
+        to_check = []
+        cached = {}
+        current = set()
+        for rec in records:
+            current.add(rec.path)
+            state, messages = stored.get(rec.path, (None, None))
+            # A record made without stat information can't be compared.
+            if rec.mtime is not None and state == self._state(rec):
+                cached[rec.path] = messages
+            else:
+                to_check.append(rec)
+
+        removed = sorted(set(stored) - current)
+        self.remove(removed, step=step)
+
+        return to_check, cached, removed
+
+    def update(self, step, records, results):
+        """
+        Store new check results for a step.
+
+        :param step:  The name of the ingestion step.
+        :type step:  str
+
+        :param records:  The inventory records that were checked.
+        :type records:  list
+
+        :param results:  The messages produced for each file, keyed by path.
+                         Files missing from results are stored with no
+                         messages.
+        :type results:  dict
+        """
+
+        rows = [(rec.path, step) + self._state(rec)
+                + (json.dumps(results.get(rec.path, [])),)
+                for rec in records]
+        self._db.executemany("INSERT OR REPLACE INTO results "
+                             "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._db.commit()
+
+    def update_checksums(self, records, checksums):
+        """
+        Store the checksums of files.
+
+        :param records:  The inventory records of the files.
+        :type records:  list
+
+        :param checksums:  The (md5, sha256) hex digests of each file, keyed
+                           by path.  Files missing from checksums are not
+                           stored.
+        :type checksums:  dict
+        """
+
+        rows = [(rec.path,) + self._state(rec) + tuple(checksums[rec.path])
+                for rec in records
+                if rec.mtime is not None and checksums.get(rec.path)]
+        self._db.executemany("INSERT OR REPLACE INTO checksums "
+                             "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._db.commit()
+
+    def update_hdu_indexes(self, records, hdu_indexes):
+        """
+        Store the HDU offsets of files.
+
+        :param records:  The inventory records of the files.
+        :type records:  list
+
+        :param hdu_indexes:  The (header, data) byte offsets of each HDU,
+                             keyed by path.  Files missing from hdu_indexes,
+                             or with no offsets, are not stored.
+        :type hdu_indexes:  dict
+        """
+
+        rows = [(rec.path,) + self._state(rec)
+                + (json.dumps([list(hdu) for hdu in hdu_indexes[rec.path]]),)
+                for rec in records
+                if rec.mtime is not None and hdu_indexes.get(rec.path)]
+        self._db.executemany("INSERT OR REPLACE INTO hdu_indexes "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+        self._db.commit()
+
+# --------------------
@@ -39,6 +39,9 @@ class FileType(object):
     ..method::  as_dict
     ..synopsis::  Return certain attributes of self in a dictionary.
 
+    ..method::  as_xml_element
+    ..synopsis::  Return a CAOM template 'product' element for self.
+
     ..property::  caom_product_type
     ..synopsis::  This property checks a list of acceptable values.
 
@@ -235,27 +238,10 @@ class FileType(object):
         :type xmltree:  lxml.etree.ElementTree
         """
 
-        # Prepare the needed information in a dictionary.
-        xml_dict = self._get_xml_dict()
-
-        # Update 'fileStatus' and 'statusAction' depending on whether self is
-        # a FITS file.
-        if self.ext.upper() == "FITS":
-            xml_dict["fileStatus"] = "REQUIRED"
-            xml_dict["statusAction"] = "ERROR"
-        else:
-            xml_dict["fileStatus"] = "OPTIONAL"
-            xml_dict["statusAction"] = "WARNING"
-
         # All FileType objects will be added to the 'productList' section of
         # the XML tree.
         pl = xmltree.find("productList")
-        product = etree.SubElement(pl, "product")
-
-        # Add the information to the new subelement.
-        for key in sorted(xml_dict.keys()):
-            parameter = etree.SubElement(product, key)
-            parameter.text = str(xml_dict[key])
+        pl.append(self.as_xml_element())
 
         return xmltree
 
@@ -279,6 +265,33 @@ class FileType(object):
 
         return {key: params}
 
+    def as_xml_element(self):
+        """
+        Return a new 'product' element describing self, as it appears in the
+        'productList' section of a CAOM template file.
+        """
+
+        # Prepare the needed information in a dictionary.
+        xml_dict = self._get_xml_dict()
+
+        # Update 'fileStatus' and 'statusAction' depending on whether self is
+        # a FITS file.
+        if self.ext.upper() == "FITS":
+            xml_dict["fileStatus"] = "REQUIRED"
+            xml_dict["statusAction"] = "ERROR"
+        else:
+            xml_dict["fileStatus"] = "OPTIONAL"
+            xml_dict["statusAction"] = "WARNING"
+
+        product = etree.Element("product")
+
+        # Add the information to the new element.
+        for key in sorted(xml_dict.keys()):
+            parameter = etree.SubElement(product, key)
+            parameter.text = str(xml_dict[key])
+
+        return product
+
     @classmethod
     def from_list_item(cls, dict_from_list):
         """
@@ -9,11 +9,19 @@ neatly-packaged objects.
 ..class:: FitsKeywordList
     :synopsis: This list subclass assembles a group of FitsKeyword objects,
     keeps a running list of the included keywords, and provides custom methods
-    to add a new object, find an object, or sort the list.
+    to add a new object, find an object, or sort the list.  Members are
+    indexed by FITS keyword and by CAOM keyword, so finding, adding and
+    removing a keyword does not search the whole list.
+
+A FitsKeywordList can also be converted to and from a pandas DataFrame with
+one row per keyword, or a Parquet file.  The functions diff_frames,
+filter_frame and fill_column work on these frames directly, so keyword sets
+from many HLSPs can be compared at once.
 """
 
 from copy import deepcopy
 from lxml import etree
+import json
 import pandas as pd
 
 # --------------------
@@ -26,6 +34,25 @@ class FitsKeyword(object):
 
     _status_choices = ["omitted", "recommended", "required"]
 
+    # Standard attributes are kept in slots, in the order they are set in
+    # __init__.  Any other attribute (from a template or an update) goes in
+    # the instance dictionary, which is only created when one is set.
+    _attribute_slots = ("_fits_keyword",
+                        "_alternates",
+                        "_caom_keyword",
+                        "_caom_status",
+                        "_default",
+                        "_header",
+                        "_hlsp_status",
+                        "_multiple",
+                        "prefix",
+                        "required",
+                        "suffix",
+                        "updated",
+                        "_xml_parent",
+                        )
+    __slots__ = _attribute_slots + ("__dict__",)
+
     def __init__(self, kw, parameters=None):
         self.fits_keyword = kw
         self.alternates = []
@@ -41,7 +68,8 @@ class FitsKeyword(object):
         self.updated = False
         self.xml_parent = "metadataList"
         if parameters:
-            [setattr(self, key, val) for key, val in parameters.items()]
+            for key, val in parameters.items():
+                setattr(self, key, val)
 
     def __lt__(self, another):
         try:
@@ -154,6 +182,17 @@ class FitsKeyword(object):
     def xml_parent(self, parent):
         self._xml_parent = parent
 
+    def _attributes(self):
+        """
+        Return (name, value) pairs for every attribute set on self, as they
+        are stored, with the standard attributes first.
+        """
+
+        attributes = [(key, getattr(self, key))
+                      for key in self._attribute_slots]
+        attributes.extend(self.__dict__.items())
+        return attributes
+
     def _get_xml_dict(self):
         """
         Format a dictionary with information from self to be used in a CAOM XML
@@ -184,18 +223,9 @@ class FitsKeyword(object):
         :type xmltree:  lxml.etree
         """
 
-        # Prepare the formatted dictionary containing current information from
-        # self.
-        xml_dict = self._get_xml_dict()
-
-        # Find the designated XML parent and create a new subelement under it.
+        # Find the designated XML parent and add a new entry under it.
         parent = xmltree.find(self.xml_parent)
-        new_entry = etree.SubElement(parent, self.caom_keyword)
-
-        # Add each item in the formatted dictionary to the subelement.
-        for key, val in xml_dict.items():
-            parameter = etree.SubElement(new_entry, key)
-            parameter.text = str(val)
+        parent.append(self.as_xml_element())
 
         return xmltree
 
@@ -206,7 +236,7 @@ class FitsKeyword(object):
         """
 
         file_formatted_dict = {}
-        for key, val in self.__dict__.items():
+        for key, val in self._attributes():
 
             # Remove any prepending underscores.  These are left over from the
             # setter functions.
@@ -223,6 +253,24 @@ class FitsKeyword(object):
 
         return {self.fits_keyword: file_formatted_dict}
 
+    def as_xml_element(self):
+        """
+        Return a new element describing self, as it appears under its
+        xml_parent in a CAOM XML template file.
+        """
+
+        # Prepare the formatted dictionary containing current information from
+        # self.
+        xml_dict = self._get_xml_dict()
+        new_entry = etree.Element(self.caom_keyword)
+
+        # Add each item in the formatted dictionary to the new element.
+        for key, val in xml_dict.items():
+            parameter = etree.SubElement(new_entry, key)
+            parameter.text = str(val)
+
+        return new_entry
+
     def compare(self, another):
         """
         Compares the attributes of two FitsKeyword objects, but the intended
@@ -250,8 +298,8 @@ class FitsKeyword(object):
         name = str(self.fits_keyword)
         new_dict = {}
 
-        for key, val in self.__dict__.items():
-            if key == "fits_keyword":
+        for key, val in self._attributes():
+            if key == "_fits_keyword":
                 continue
             else:
                 new_dict[key] = deepcopy(val)
@@ -328,6 +376,16 @@ class FitsKeyword(object):
         self.updated = updated
         return updated
 
+# The columns of a DataFrame made by FitsKeywordList.to_dataframe(), before
+# any extra attributes.
+_FRAME_COLUMNS = ["fits_keyword"] + [key.lstrip("_") for key in
+                                     FitsKeyword._attribute_slots[1:]
+                                     if key != "updated"]
+
+# Columns holding a single value of a known type.  Other columns, such as
+# 'alternates' and 'default', are stored as JSON text in Parquet files.
+_SCALAR_COLUMNS = set(_FRAME_COLUMNS) - {"alternates", "default"}
+
 # --------------------
 
 
@@ -335,6 +393,12 @@ class FitsKeywordList(object):
     """
     Create a list of FitsKeyword objects and provide methods for list
     manipulation.
+
+    Members are stored in a dictionary keyed by FITS keyword, which keeps
+    them in the order they were added, and the 'keywords' list is built from
+    it.  A second index groups the members by CAOM keyword, in the same
+    order.  Changing the caom_keyword of a member directly is not tracked,
+    so use update_keyword() or update_list() to change existing members.
     """
 
     def __init__(self, product_type, standard_type, keywords_dict):
@@ -352,12 +416,73 @@ class FitsKeywordList(object):
         print(".keywords: ")
         [print(member) for member in self.keywords]
 
+    def __iter__(self):
+        return iter(self._fits_index.values())
+
+    def __len__(self):
+        return len(self._fits_index)
+
     def __str__(self):
         return ("<FitsKeywordList>: product_type={0.product_type}, "
                 "standard_type={0.standard_type}, "
-                "num_keywords={1}".format(self, len(self.keywords))
+                "num_keywords={1}".format(self, len(self))
                 )
 
+    @property
+    def keywords(self):
+        return list(self._fits_index.values())
+
+    @keywords.setter
+    def keywords(self, kw_objs):
+        self._fits_index = {}
+        self._caom_index = {}
+        for hk in kw_objs:
+            self.add(hk)
+
+    def _index_caom(self, hk):
+        """
+        Add a member to the end of the CAOM keyword index.
+
+        :param hk:  The FitsKeyword object to index.
+        :type hk:  FitsKeyword
+        """
+
+        bucket = self._caom_index.setdefault(hk.caom_keyword, {})
+        bucket[hk.fits_keyword] = hk
+
+    def _reindex_caom(self, caom_keyword):
+        """
+        Rebuild the CAOM keyword index entry for one CAOM keyword, in the
+        order of self.keywords.
+
+        :param caom_keyword:  The CAOM keyword to index again.
+        :type caom_keyword:  str
+        """
+
+        bucket = {member.fits_keyword: member for member in self
+                  if member.caom_keyword == caom_keyword}
+        if bucket:
+            self._caom_index[caom_keyword] = bucket
+        else:
+            self._caom_index.pop(caom_keyword, None)
+
+    def _unindex_caom(self, hk, caom_keyword):
+        """
+        Remove a member from the CAOM keyword index.
+
+        :param hk:  The FitsKeyword object being removed or changed.
+        :type hk:  FitsKeyword
+
+        :param caom_keyword:  The CAOM keyword hk was indexed with.
+        :type caom_keyword:  str
+        """
+
+        bucket = self._caom_index.get(caom_keyword)
+        if bucket is not None:
+            bucket.pop(hk.fits_keyword, None)
+            if not bucket:
+                del self._caom_index[caom_keyword]
+
     def add(self, hk):
         """
         Add a FitsKeyword object to the self.keywords list.  If the list
@@ -376,11 +501,12 @@ class FitsKeywordList(object):
             raise TypeError(err)
 
         # Look for an existing FitsKeyword and remove it.
-        existing = self.find_fits(key)
+        existing = self._fits_index.pop(key, None)
         if existing:
-            self.keywords.remove(existing)
+            self._unindex_caom(existing, existing.caom_keyword)
 
-        self.keywords.append(hk)
+        self._fits_index[key] = hk
+        self._index_caom(hk)
 
     def diff(self, another_list):
         """
@@ -396,7 +522,7 @@ class FitsKeywordList(object):
 
         # Iterate through self.keywords and compare to another_list.  If it
         # does not match content from another_list, add it to the new_list.
-        for kw in self.keywords:
+        for kw in self:
             existing = another_list.find_fits(kw.fits_keyword)
             if existing:
                 if kw.as_dict() != existing.as_dict():
@@ -427,9 +553,9 @@ class FitsKeywordList(object):
         :type target_keyword:  str
         """
 
-        for member in self.keywords:
-            if member.caom_keyword == target_keyword:
-                return member
+        bucket = self._caom_index.get(target_keyword)
+        if bucket:
+            return next(iter(bucket.values()))
         return None
 
     def find_fits(self, target_keyword):
@@ -441,10 +567,7 @@ class FitsKeywordList(object):
         :type target_keyword:  str
         """
 
-        for member in self.keywords:
-            if member.fits_keyword == target_keyword:
-                return member
-        return None
+        return self._fits_index.get(target_keyword)
 
     def fill_from_list(self, list_of_kw):
         """
@@ -467,12 +590,74 @@ class FitsKeywordList(object):
             if as_obj:
                 self.add(as_obj)
 
+    @classmethod
+    def from_dataframe(cls, pdframe, product_type=None, standard_type=None):
+        """
+        Create a new FitsKeywordList from a DataFrame made by to_dataframe().
+        Extra attributes are only set on the keywords that have a value,
+        which may be None.  NaN marks a keyword without the attribute.
+
+        :param pdframe:  One row per keyword, with the FITS keyword in the
+                         'fits_keyword' column.
+        :type pdframe:  pandas.DataFrame
+
+        :param product_type:  The product type of the new list.  Defaults to
+                              the one recorded by to_dataframe().
+        :type product_type:  str
+
+        :param standard_type:  The standard type of the new list.  Defaults
+                               to the one recorded by to_dataframe().
+        :type standard_type:  str
+        """
+
+        if product_type is None:
+            product_type = pdframe.attrs.get("product_type")
+        if standard_type is None:
+            standard_type = pdframe.attrs.get("standard_type")
+
+        keywords_dict = {}
+        for record in pdframe.to_dict("records"):
+            kw = record.pop("fits_keyword")
+            keywords_dict[kw] = {key: val for key, val in record.items()
+                                 if key in _FRAME_COLUMNS or val is None
+                                 or not _is_missing(val)}
+
+        return cls(product_type, standard_type, keywords_dict)
+
+    @classmethod
+    def from_parquet(cls, path, product_type=None, standard_type=None):
+        """
+        Create a new FitsKeywordList from a Parquet file made by
+        to_parquet().  This needs pyarrow or fastparquet to be installed.
+
+        :param path:  The Parquet file to read.
+        :type path:  str
+
+        :param product_type:  The product type of the new list.
+        :type product_type:  str
+
+        :param standard_type:  The standard type of the new list.
+        :type standard_type:  str
+        """
+
+        pdframe = pd.read_parquet(path)
+        # The decoded values are kept as objects, so None and integers are
+        # not turned into NaN and floats.
+        for col in pdframe.columns:
+            if col not in _SCALAR_COLUMNS:
+                pdframe[col] = pd.Series([_from_json(val)
+                                          for val in pdframe[col]],
+                                         index=pdframe.index, dtype=object)
+
+        return cls.from_dataframe(pdframe, product_type=product_type,
+                                  standard_type=standard_type)
+
     def is_empty(self):
         """
         Return a boolean checking the length of the self.keywords list.
         """
 
-        if len(self.keywords) == 0:
+        if len(self) == 0:
             return True
         else:
             return False
@@ -486,29 +671,83 @@ class FitsKeywordList(object):
         :type fits_kw:  str
         """
 
-        # find_fits will return the FitsKeyword object if a match is found.
-        existing = self.find_fits(kw_obj.fits_keyword)
+        # Remove the FitsKeyword object with the same FITS keyword, if any.
+        existing = self._fits_index.pop(kw_obj.fits_keyword, None)
 
         if existing:
-            self.keywords.remove(existing)
+            self._unindex_caom(existing, existing.caom_keyword)
 
     def to_dataframe(self):
         """
-        Return a Pandas DataFrame containing the current contents of self.
+        Return a Pandas DataFrame containing the current contents of self,
+        with one row per keyword and one column per attribute.  The FITS
+        keyword is in the 'fits_keyword' column.
+        """
+
+        records = []
+        for member in self:
+            record = {"fits_keyword": member.fits_keyword}
+            record.update(member.as_dict()[member.fits_keyword])
+            records.append(record)
+
+        if records:
+            pdframe = pd.DataFrame(records)
+            # Keywords without an extra attribute get NaN in its column.  The
+            # column is rebuilt as objects, so a value of None is kept apart
+            # from an attribute that is not set.
+            for col in pdframe.columns.difference(_FRAME_COLUMNS):
+                pdframe[col] = pd.Series([rec.get(col, float("nan"))
+                                          for rec in records],
+                                         index=pdframe.index, dtype=object)
+        else:
+            pdframe = pd.DataFrame(columns=_FRAME_COLUMNS)
+        pdframe.attrs = {"product_type": self.product_type,
+                         "standard_type": self.standard_type,
+                         }
+
+        return pdframe
+
+    def to_parquet(self, path):
         """
+        Write the contents of self to a Parquet file.  This needs pyarrow or
+        fastparquet to be installed.
 
-        # Collect individual DataFrames for each keyword.
-        row_list = []
-        for member in self.keywords:
-            keys = member.as_dict().keys()
-            vals = member.as_dict().values()
-            row = pd.DataFrame(data=[vals], columns=keys)
-            row_list.append(row)
+        :param path:  The Parquet file to write.
+        :type path:  str
+        """
 
-        # Concat all individual DataFrames into one large frame.
-        pdframe = pd.concat(row_list)
+        pdframe = self.to_dataframe()
 
-        return pdframe
+        # Columns without a single type are stored as JSON text.
+        for col in pdframe.columns:
+            if col not in _SCALAR_COLUMNS:
+                pdframe[col] = pdframe[col].map(_to_json)
+
+        pdframe.to_parquet(path, index=False)
+
+    def update_keyword(self, hk):
+        """
+        Update the member with the same FITS keyword as a FitsKeyword object,
+        or add the object if there is no such member.  Returns whether any
+        changes were made to an existing member.
+
+        :param hk:  The new or updated FitsKeyword object.
+        :type hk:  FitsKeyword
+        """
+
+        existing = self.find_fits(hk.fits_keyword)
+        if not existing:
+            self.add(hk)
+            return False
+
+        # Keep the CAOM keyword index current if the update changes it.
+        caom_keyword = existing.caom_keyword
+        updated = existing.update(hk.as_dict()[hk.fits_keyword])
+        if existing.caom_keyword != caom_keyword:
+            self._unindex_caom(existing, caom_keyword)
+            self._reindex_caom(existing.caom_keyword)
+
+        return updated
 
     def update_list(self, another_list):
         """
@@ -536,13 +775,158 @@ class FitsKeywordList(object):
         # Look for each keyword in self.  If found, update the current
         # FitsKeyword with the new one.  If not found, add the new
         # FitsKeyword to self.
-        for kw in another_list.keywords:
-            existing = self.find_fits(kw.fits_keyword)
-            if existing:
-                new_params = kw.as_dict()[kw.fits_keyword]
-                existing.update(new_params)
-            else:
-                self.add(kw)
+        for kw in x:
+            self.update_keyword(kw)
+
+# --------------------
+
+
+def _is_missing(val):
+    """
+    Return whether a DataFrame value is missing (None or NaN).
+
+    :param val:  A single value from a DataFrame.
+    :type val:  obj
+    """
+
+    return pd.api.types.is_scalar(val) and pd.isna(val)
+
+
+def _to_json(val):
+    """
+    Encode a DataFrame value as JSON text to store in a Parquet file.  A
+    value of None is stored as 'null', and NaN as a missing value.
+
+    :param val:  A single value from a DataFrame.
+    :type val:  obj
+    """
+
+    if val is not None and _is_missing(val):
+        return None
+    return json.dumps(val, default=str)
+
+
+def _from_json(val):
+    """
+    Decode a DataFrame value stored as JSON text by _to_json().  Missing
+    values are returned as NaN.
+
+    :param val:  The JSON text, or a missing value.
+    :type val:  str
+    """
+
+    if _is_missing(val):
+        return float("nan")
+    return json.loads(val)
+
+# --------------------
+
+
+def _comparable(column, keep_none=False):
+    """
+    Return a column in a form that compares equal only when the original
+    values are equal, including type, and with missing values as None.
+
+    :param column:  A DataFrame column.
+    :type column:  pandas.Series
+
+    :param keep_none:  If True, only NaN counts as missing, and a value of
+                       None is compared like any other value.
+    :type keep_none:  bool
+    """
+
+    column = column.astype(object)
+    missing = column.map(_is_missing)
+    if keep_none:
+        missing &= column.map(lambda val: val is not None)
+    return column.map(repr).where(missing.eq(False), None)
+
+
+def diff_frames(pdframe, standard):
+    """
+    Return the rows of a FitsKeywordList DataFrame that differ from, or are
+    not in, another one.  This matches FitsKeywordList.diff(), but compares
+    whole columns at once.  In the extra attribute columns, a value of None
+    differs from a keyword without the attribute (NaN), as it does in the
+    as_dict() results compared by diff().
+
+    :param pdframe:  The keywords to compare, from to_dataframe().
+    :type pdframe:  pandas.DataFrame
+
+    :param standard:  The keywords to compare against, from to_dataframe().
+    :type standard:  pandas.DataFrame
+    """
+
+    # Line up the standard with pdframe, with empty rows for any keyword
+    # missing from the standard.  Columns are compared as objects, so the
+    # empty rows do not change the type of the others.
+    matched = standard.drop_duplicates("fits_keyword", keep="last")
+    matched = matched.astype(object).set_index("fits_keyword").reindex(
+        pdframe["fits_keyword"])
+    matched.index = pdframe.index
+
+    differs = ~pdframe["fits_keyword"].isin(standard["fits_keyword"])
+    for col in pdframe.columns.union(matched.columns):
+        if col == "fits_keyword":
+            continue
+        left = pdframe[col] if col in pdframe else pd.Series(
+            float("nan"), index=pdframe.index, dtype=object)
+        right = matched[col] if col in matched else pd.Series(
+            float("nan"), index=pdframe.index, dtype=object)
+        extra = col not in _FRAME_COLUMNS
+        left = _comparable(left, keep_none=extra)
+        right = _comparable(right, keep_none=extra)
+        differs |= ~((left == right) | (left.isna() & right.isna()))
+
+    return pdframe[differs.to_numpy(dtype=bool)]
+
+
+def fill_column(pdframe, column, value):
+    """
+    Return a copy of a FitsKeywordList DataFrame with every missing value in
+    a column set to a new value.  A 'default' of "None" counts as missing.
+
+    :param pdframe:  The keywords, from to_dataframe().
+    :type pdframe:  pandas.DataFrame
+
+    :param column:  The column to fill.
+    :type column:  str
+
+    :param value:  The value to fill in.
+    :type value:  obj
+    """
+
+    pdframe = pdframe.copy()
+    if column not in pdframe:
+        pdframe[column] = None
+    missing = pdframe[column].isna()
+    if column == "default":
+        missing |= (pdframe[column].astype(object) == "None")
+    pdframe[column] = pdframe[column].astype(object).where(~missing, value)
+
+    return pdframe
+
+
+def filter_frame(pdframe, **criteria):
+    """
+    Return the rows of a FitsKeywordList DataFrame matching every given
+    column value, such as filter_frame(pdframe, caom_status="required").  A
+    list of values matches any of them.
+
+    :param pdframe:  The keywords, from to_dataframe().
+    :type pdframe:  pandas.DataFrame
+
+    :param criteria:  The value, or list of values, wanted in each column.
+    :type criteria:  dict
+    """
+
+    keep = pd.Series(True, index=pdframe.index)
+    for col, values in criteria.items():
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        keep &= pdframe[col].isin(values)
+
+    return pdframe[keep.to_numpy(dtype=bool)]
 
 # --------------------
 
@@ -563,11 +947,11 @@ def __test__():
 
     kw1 = FitsKeyword("here", parameters=dict1)
     print("--- kw1 ---")
-    [print("{0}: {1}".format(key, val)) for key, val in kw1.__dict__.items()]
+    [print("{0}: {1}".format(key, val)) for key, val in kw1._attributes()]
 
     kw2 = FitsKeyword("there", parameters=dict2)
     print("--- kw2 ---")
-    [print("{0}: {1}".format(key, val)) for key, val in kw2.__dict__.items()]
+    [print("{0}: {1}".format(key, val)) for key, val in kw2._attributes()]
 
     print(kw1.as_dict())
 
@@ -16,13 +16,16 @@ information, update existing parameters, and file input and output.
 """
 
 import bin.check_paths as cp
-from bin.read_yaml import read_yaml
+from bin.read_yaml import read_sidecar, read_yaml, write_sidecar, write_yaml
+from lib.CAOMXML import CAOMxmlBuilder, write_caom_xml
+from lib.FileInventory import FileInventory
+from lib.FileManifest import FileManifest
 from lib.FileType import FileType
 from lib.FitsKeyword import FitsKeyword, FitsKeywordList
+from lib.TemplateRegistry import TemplateRegistry
 from lxml import etree
 import os
 import re
-import yaml
 
 # --------------------
 
@@ -77,6 +80,10 @@ class HLSPFile(object):
     ..synopsis::  Construct file paths for resulting files from various stages
                   of HLSP ingestion.
 
+    ..module::  _xml_value_pairs
+    ..synopsis::  Yield an lxml element for each keyword / value pair in a
+                  dictionary.
+
     ..module::  add_filetype
     ..synopsis::  Add a FileType object to the file_types list.
 
@@ -111,6 +118,14 @@ class HLSPFile(object):
                   any keyword updates and return a list of all FitsKeyword
                   objects used by this HLSPFile.
 
+    ..module::  get_inventory
+    ..synopsis::  Return the FileInventory of the HLSP data directory,
+                  walking the directory only if no inventory exists yet.
+
+    ..module::  get_manifest
+    ..synopsis::  Open the FileManifest stored next to the default .hlsp
+                  file, used to re-run ingestion checks incrementally.
+
     ..module::  get_output_filepath
     ..synopsis::  Get an output file path for saving an HLSPFile to disk.
                   Either base the file path on the calling file or return the
@@ -139,6 +154,9 @@ class HLSPFile(object):
                   completed ingestion step.  Toggles the boolean value by
                   default or can be given a state to enforce.
 
+    ..module::  set_inventory
+    ..synopsis::  Attach an existing FileInventory to self.
+
     ..module::  save
     ..synopsis::  Write the current contents of self to a YAML-formatted .hlsp
                   file.
@@ -200,6 +218,7 @@ class HLSPFile(object):
 
         # Set private internal-use attributes.
         self._fits_keywords = FitsKeywordList.empty_list()
+        self._inventory = None
         self._standard_keywords = FitsKeywordList.empty_list()
         self._updated = False
 
@@ -240,24 +259,10 @@ class HLSPFile(object):
             err = "HLSPFile expected a <FitsKeyword> type object"
             raise TypeError(err)
 
-        # Assume the given FitsKeyword is already in self._fits_keywords.
-        found = False
-        updated = False
-
-        # Search for the given FitsKeyword in self._fits_keywords.
-        for kw in self._fits_keywords:
-
-            # If found, try updating the existing FitsKeyword object with
-            # values from the target object.
-            if kw.fits_keyword == keyword_obj.fits_keyword:
-                found = True
-                new_vals = keyword_obj.as_dict()
-                updated = kw.update(new_vals[keyword_obj.fits_keyword])
-
-        # If keyword_obj updates an existing FitsKeyword or is a new
-        # FitsKeyword, add it to self._fits_keywords.
-        if not found:
-            self._fits_keywords.append(keyword_obj)
+        # If the given FitsKeyword is already in self._fits_keywords, try
+        # updating the existing FitsKeyword object with values from the
+        # target object.  Otherwise add it to self._fits_keywords.
+        self._fits_keywords.update_keyword(keyword_obj)
 
     def _add_xml_value_pairs(self, parent, parameters):
         """
@@ -267,17 +272,7 @@ class HLSPFile(object):
         :type parameters:  dict
         """
 
-        # Iterate through all key / val pairs in parameters.
-        for key, val in parameters.items():
-            new_entry = etree.SubElement(parent, key)
-
-            # Format the dictionary to go in a CAOM template XML file.
-            value_dict = self._make_value_xml_dict(val)
-
-            # Add the formatted dictionary to the lxml etree.
-            for line, txt in value_dict.items():
-                new_line = etree.SubElement(new_entry, line)
-                new_line.text = txt
+        parent.extend(self._xml_value_pairs(parameters))
 
         return parent
 
@@ -351,15 +346,17 @@ class HLSPFile(object):
 
         # Iterate through all the standards if any are found.
         if all_standards:
+
+            # Templates are parsed once and shared by all HLSPFile objects.
+            templates = TemplateRegistry.shared(
+                os.path.join(self._root, self._fits_templates_dir))
+            static_vals = templates.read(
+                os.path.join(self._root, self._static_values_yaml))
+
             for std in all_standards:
 
-                # Look up the FITS template file for the current standard.
-                filename = ".".join([std, "yml"])
-                filename = os.path.join(self._root,
-                                        self._fits_templates_dir,
-                                        filename,
-                                        )
-                standard_fits = read_yaml(filename)["KEYWORDS"]
+                # Look up the FITS template for the current standard.
+                standard_fits = templates.template(std)["KEYWORDS"]
 
                 # Create a FitsKeyword for each entry in the template and try
                 # to add it to self._fits_keywords.
@@ -367,7 +364,6 @@ class HLSPFile(object):
                     kw_obj = FitsKeyword(kw, parameters=info)
                     self.add_fits_keyword(kw_obj, standard=True)
 
-                static_vals = read_yaml(self._static_values_yaml)
                 data_type, inst = std.split("_")
                 self._bulk_add_static_values(static_vals["hlsp"])
                 try:
@@ -481,6 +477,29 @@ class HLSPFile(object):
                                       cmd_name,
                                       )
 
+    def _xml_value_pairs(self, parameters):
+        """
+        Yield a new lxml element for each keyword / value pair in a
+        dictionary, formatted for a CAOM template XML file.
+
+        :param parameters:  A dictionary of keyword / value pairs.
+        :type parameters:  dict
+        """
+
+        # Iterate through all key / val pairs in parameters.
+        for key, val in parameters.items():
+            new_entry = etree.Element(key)
+
+            # Format the dictionary to go in a CAOM template XML file.
+            value_dict = self._make_value_xml_dict(val)
+
+            # Add the formatted dictionary to the new element.
+            for line, txt in value_dict.items():
+                new_line = etree.SubElement(new_entry, line)
+                new_line.text = txt
+
+            yield new_entry
+
     def add_filetype(self, new_filetype):
         """
         Add a FileType object to the file_types list.
@@ -543,24 +562,10 @@ class HLSPFile(object):
         except AttributeError:
             raise TypeError("Only FitsKeyword objects should be added.")
 
-        # If self.keyword_updates is empty, just add the new entry.
-        if len(self.keyword_updates) == 0:
-            self.keyword_updates.append(keyword)
-            return
-
-        # Check if keyword is already in self.keyword_updates.
-        for existing_update in self.keyword_updates:
-
-            # If found, try to update the existing FitsKeyword with values
-            # from the new one.
-            if existing_update.fits_keyword == k:
-                updated_parameters = keyword.as_dict()[k]
-                existing_update.update(updated_parameters)
-                return
-
-        # If not found, add the new FitsKeyword.
-        else:
-            self.keyword_updates.append(keyword)
+        # If keyword is already in self.keyword_updates, try to update the
+        # existing FitsKeyword with values from the new one.  If not found,
+        # add the new FitsKeyword.
+        self.keyword_updates.update_keyword(keyword)
 
     def add_unique_parameter(self, caom, parent, value):
         """
@@ -722,6 +727,47 @@ class HLSPFile(object):
 
         return path
 
+    def get_inventory(self, skip_sym=False, refresh=False):
+        """
+        Return the FileInventory of the HLSP data directory.  The directory is
+        only walked if no matching inventory has been made yet, so every
+        ingestion step can share the results of a single walk.
+
+        :param skip_sym:  If True, symbolic links to files are ignored.
+        :type skip_sym:  bool
+
+        :param refresh:  If True, walk the data directory again even if an
+                         inventory already exists.
+        :type refresh:  bool
+        """
+
+        path = os.path.abspath(self.get_data_path())
+
+        # Build a new inventory if there is none, it no longer matches the
+        # current settings, or a fresh walk was requested.
+        inv = self._inventory
+        if (refresh or inv is None or inv.root != path
+                or inv.skip_sym != skip_sym):
+            self._inventory = FileInventory(path, skip_sym=skip_sym)
+
+        return self._inventory
+
+    def get_manifest(self):
+        """
+        Open the FileManifest stored next to the default .hlsp file.  The
+        manifest records the state of each data file and the results of the
+        last filename and metadata checks, so these can be re-run only on
+        files that have changed.
+        """
+
+        self._update_stage_paths()
+
+        # The manifest shares the default .hlsp file name, with its own
+        # extension.
+        path = os.path.splitext(self._default_path)[0]
+
+        return FileManifest(path)
+
     def get_output_filepath(self, call_file=None):
         """
         Get an output file path for saving an HLSPFile to disk.  Either base
@@ -826,7 +872,8 @@ class HLSPFile(object):
     def load_hlsp(self, filename):
         """
         Read information from a YAML-formatted .hlsp file and load those
-        contents into self.
+        contents into self.  If save() wrote a binary sidecar for this
+        version of the file, it is read instead of parsing the YAML.
 
         :param filename:  Should be a filepath to a properly-formatted .hlsp
                           file written in YAML.
@@ -834,7 +881,9 @@ class HLSPFile(object):
         """
 
         # Access the given file.
-        from_dict = read_yaml(filename)
+        from_dict = read_sidecar(filename)
+        if from_dict is None:
+            from_dict = read_yaml(filename)
 
         # Read the contents of the resulting dictionary.
         self.load_dict(from_dict)
@@ -901,7 +950,7 @@ class HLSPFile(object):
         self._standard_keywords = FitsKeywordList.empty_list()
         self._get_standard_fits_keywords()
 
-    def save(self, caller=None, filename=None):
+    def save(self, caller=None, filename=None, sidecar=False):
         """
         Write the current contents of self to a YAML-formatted .hlsp file.
 
@@ -910,6 +959,11 @@ class HLSPFile(object):
 
         :param filename:  Designate a filename to use for saving (optional).
         :type filename:  str
+
+        :param sidecar:  If True, also write a binary copy of the contents
+                         next to the .hlsp file, which load_hlsp() reads
+                         faster than the YAML.
+        :type sidecar:  bool
         """
 
         self._update_stage_paths()
@@ -934,12 +988,32 @@ class HLSPFile(object):
             savename = self.get_output_filepath()
 
         # Format self as a dictionary and write it to YAML.
-        with open(savename, 'w+') as yamlfile:
-            yaml.dump(self.as_dict(), yamlfile, default_flow_style=False)
-            print("...saving {0}...".format(savename))
+        contents = self.as_dict()
+        write_yaml(contents, savename)
+        print("...saving {0}...".format(savename))
+        if sidecar:
+            write_sidecar(contents, savename)
 
         return savename
 
+    def set_inventory(self, inventory):
+        """
+        Attach an existing FileInventory to self, so it can be reused by later
+        ingestion steps.
+
+        :param inventory:  The inventory of the HLSP data directory.
+        :type inventory:  FileInventory
+        """
+
+        # Check inventory for a FileInventory attribute.
+        try:
+            root = inventory.root
+        except AttributeError:
+            err = "HLSPFile expected a <FileInventory> type object"
+            raise TypeError(err)
+
+        self._inventory = inventory
+
     def toggle_ingest(self, step_num, state=None):
         """
         Update a value in the self.ingest dictionary to indicate a completed
@@ -1011,36 +1085,39 @@ class HLSPFile(object):
         # Check that output is a valid file path & name.
         output = cp.check_new_file(output)
 
-        # Create a 'CompositeObservation' XML tree and add the three primary
-        # subtrees.
-        composite = etree.Element("CompositeObservation")
-        xmltree = etree.ElementTree(composite)
-        metadata = etree.SubElement(composite, "metadataList")
-        provenance = etree.SubElement(composite, "provenance")
-        products = etree.SubElement(composite, "productList")
-
-        # Add all file types to the XML tree using the FileType class method.
-        for ft in sorted(self.file_types):
-            xmltree = ft.add_to_xml(xmltree)
-
-        # Add all FITS keyword updates to the XML tree using the FitsKeyword
-        # class method.
-        keywords_obj = self.fits_keywords()
-        for kw in sorted(keywords_obj.keywords):
-            xmltree = kw.add_to_xml(xmltree)
-
-        # Add all unique parameters to the XML tree.
+        # Add the HLSP name as a unique provenance parameter.
         self.add_unique_parameter("name", "provenance", self.hlsp_name.upper())
-        for parent, parameters in self.unique_parameters.items():
-            parent = xmltree.find(parent)
-            parent = self._add_xml_value_pairs(parent, parameters)
-
-        # Write the XML tree out to file.
-        xmltree.write(output,
-                      encoding="utf-8",
-                      xml_declaration=True,
-                      pretty_print=True,
-                      )
+
+        # Sort FITS keyword updates into the primary subtrees of the
+        # 'CompositeObservation' tree.  Every entry must belong to one of them.
+        sections = CAOMxmlBuilder.sections
+        keywords = sorted(self.fits_keywords().keywords)
+        for parent in [kw.xml_parent for kw in keywords] + list(
+                self.unique_parameters.keys()):
+            if parent not in sections:
+                err = ("'{0}' is not a CAOM template section, expected one of "
+                       "{1}".format(parent, sections))
+                raise ValueError(err)
+
+        # Each section is written in order: file types (only in
+        # 'productList'), then FITS keyword updates, then unique parameters.
+        # Entries are only made as they are written to the file, so the whole
+        # XML tree is never held in memory.
+        def section_entries(section):
+            if section == "productList":
+                for ft in sorted(self.file_types):
+                    yield ft.as_xml_element()
+            for kw in keywords:
+                if kw.xml_parent == section:
+                    yield kw.as_xml_element()
+            parameters = self.unique_parameters.get(section, {})
+            yield from self._xml_value_pairs(parameters)
+
+        # Write the XML template out to file.
+        write_caom_xml(output,
+                       [(tag, section_entries(tag)) for tag in sections],
+                       root_tag=CAOMxmlBuilder.root_tag,
+                       )
 
 # --------------------
 
@@ -0,0 +1,233 @@
+"""
+..class::  TemplateRegistry
+    :synopsis:  This class reads the YAML template files used across HLSP
+    ingestion (FITS keyword standards, CAOM static values) and keeps the
+    parsed contents, so each file is only parsed once.  One registry is
+    shared for each templates directory, so HLSPFile objects, the metadata
+    check and the GUIs all use the same parsed templates.
+
+    A cached template is checked against its file each time it is used.  If
+    the modification time or size has changed, the contents are hashed and
+    the file is only parsed again if the hash is different.  The parsed
+    templates are also saved to a cache file, so a new process does not need
+    to parse them again either.
+
+..class::  TemplateEntry
+    :synopsis:  A named tuple describing a single cached template file.
+"""
+
+import collections
+import copy
+import glob
+import hashlib
+import os
+import pickle
+import yaml
+
+from bin.read_yaml import YamlLoader
+from lib.FitsKeyword import FitsKeywordList
+
+TemplateEntry = collections.namedtuple("TemplateEntry", ["mtime",
+                                                         "size",
+                                                         "digest",
+                                                         "data",
+                                                         ])
+
+# --------------------
+
+
+class TemplateRegistry(object):
+    """
+    Parse the YAML templates used by HLSP ingestion once, and provide copies
+    of the parsed contents to any step that needs them.
+
+    ..module::  _load_cache
+    ..synopsis::  Read previously parsed templates from the cache file.
+
+    ..module::  _save_cache
+    ..synopsis::  Write the parsed templates to the cache file.
+
+    ..module::  keyword_list
+    ..synopsis::  Return a new FitsKeywordList for a FITS standard.
+
+    ..module::  read
+    ..synopsis::  Return the contents of a YAML file, parsing it only if it
+                  has changed.
+
+    ..module::  shared
+    ..synopsis::  Return the registry shared by everything using a templates
+                  directory.
+
+    ..module::  standards
+    ..synopsis::  Return the names of the FITS standards with a template.
+
+    ..module::  template
+    ..synopsis::  Return the contents of the template for a FITS standard.
+    """
+
+    # Bump this if the format of the cache file changes.
+    _cache_version = 1
+    _cache_name = os.path.join("__pycache__", "templates.pickle")
+    _template_ext = ".yml"
+
+    # The registries shared by templates directory, see shared().
+    _registries = {}
+
+    def __init__(self, templates_dir, cache_file=None):
+        """
+        Initialize a new TemplateRegistry.
+
+        :param templates_dir:  The directory holding the FITS standard
+                               templates.
+        :type templates_dir:  str
+
+        :param cache_file:  Where to save the parsed templates.  Defaults to
+                            a file in the __pycache__ directory of
+                            templates_dir.
+        :type cache_file:  str
+        """
+
+        self.templates_dir = os.path.abspath(templates_dir)
+        if cache_file is None:
+            cache_file = os.path.join(self.templates_dir, self._cache_name)
+        self.cache_file = cache_file
+        self._entries = self._load_cache()
+
+    @classmethod
+    def shared(cls, templates_dir):
+        """
+        Return the registry shared by everything using templates_dir,
+        creating it the first time.
+
+        :param templates_dir:  The directory holding the FITS standard
+                               templates.
+        :type templates_dir:  str
+        """
+
+        templates_dir = os.path.abspath(templates_dir)
+        try:
+            return cls._registries[templates_dir]
+        except KeyError:
+            registry = cls(templates_dir)
+            cls._registries[templates_dir] = registry
+            return registry
+
+    def _load_cache(self):
+        """
+        Read previously parsed templates from the cache file.  A missing or
+        unreadable cache file is treated as empty.
+        """
+
+        try:
+            with open(self.cache_file, 'rb') as cache:
+                version, entries = pickle.load(cache)
+        except (OSError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError):
+            return {}
+
+        if version != self._cache_version:
+            return {}
+
+        return {path: TemplateEntry(*entry) for path, entry in entries.items()}
+
+    def _save_cache(self):
+        """
+        Write the parsed templates to the cache file.  The cache is only an
+        optimization, so any failure to write it is ignored.
+        """
+
+        entries = {path: tuple(entry) for path, entry in self._entries.items()}
+        temp_file = ".".join([self.cache_file, str(os.getpid())])
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(temp_file, 'wb') as cache:
+                pickle.dump((self._cache_version, entries), cache)
+            os.replace(temp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def keyword_list(self, standard):
+        """
+        Return a new FitsKeywordList built from the template for a FITS
+        standard.
+
+        :param standard:  The FITS standard, such as 'timeseries_k2'.
+        :type standard:  str
+        """
+
+        template = self.template(standard)
+        return FitsKeywordList(template["PRODUCT"],
+                               template["STANDARD"],
+                               template["KEYWORDS"],
+                               )
+
+    def read(self, path):
+        """
+        Return the contents of a YAML file.  The file is only parsed if it
+        has not been parsed before, or if its contents have changed.  The
+        contents are copied, so callers may change them freely.
+
+        :param path:  The YAML file to read.
+        :type path:  str
+        """
+
+        path = os.path.abspath(path)
+        try:
+            stats = os.stat(path)
+        except FileNotFoundError:
+            err = "{0} does not exist!".format(path)
+            raise FileNotFoundError(err)
+
+        entry = self._entries.get(path)
+        if entry and (entry.mtime, entry.size) == (stats.st_mtime_ns,
+                                                   stats.st_size):
+            return copy.deepcopy(entry.data)
+
+        # The file has been touched, but only parse it again if the contents
+        # are different.
+        with open(path, 'rb') as stream:
+            contents = stream.read()
+        digest = hashlib.sha1(contents).hexdigest()
+        if entry and entry.digest == digest:
+            data = entry.data
+        else:
+            try:
+                data = yaml.load(contents, Loader=YamlLoader)
+            except yaml.YAMLError:
+                err = "{0} is not a YAML formatted file!".format(path)
+                raise TypeError(err)
+            if not isinstance(data, dict):
+                err = "{0} did not produce a YAML dictionary!".format(path)
+                raise TypeError(err)
+
+        self._entries[path] = TemplateEntry(stats.st_mtime_ns,
+                                            stats.st_size,
+                                            digest,
+                                            data,
+                                            )
+        self._save_cache()
+
+        return copy.deepcopy(data)
+
+    def standards(self):
+        """
+        Return the names of the FITS standards with a template file.
+        """
+
+        pattern = os.path.join(self.templates_dir, "*" + self._template_ext)
+        names = [os.path.basename(f)[:-len(self._template_ext)]
+                 for f in glob.glob(pattern)]
+        return sorted(names)
+
+    def template(self, standard):
+        """
+        Return the contents of the template file for a FITS standard.
+
+        :param standard:  The FITS standard, such as 'timeseries_k2'.
+        :type standard:  str
+        """
+
+        filename = "".join([standard, self._template_ext])
+        return self.read(os.path.join(self.templates_dir, filename))
+
+# --------------------
@@ -1,5 +1,8 @@
 from . import CAOMKeywordBox
 from . import CAOMXML
+from . import FileInventory
+from . import FileManifest
 from . import FileType
 from . import FitsKeyword
 from . import HLSPFile
+from . import TemplateRegistry
@@ -0,0 +1,186 @@
+"""
+.. module:: _test_caomxml.py
+
+   :synopsis: Test module for the CAOM XML classes.  The same tests are run
+       against lib/CAOMXML.py and the copy in PREP_CAOM/lib/CAOMxml.py that
+       hlsp_to_xml uses.
+
+   Run from the MAST_HLSP directory:  python -m pytest lib/_test_caomxml.py
+"""
+
+import importlib.util
+import io
+import os
+import unittest
+from lxml import etree
+
+# The two copies of the module are loaded from their files, since each lives
+# in a package named 'lib'.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COPIES = {"CAOMXML": os.path.join(BASE_DIR, "lib", "CAOMXML.py"),
+          "CAOMxml": os.path.join(BASE_DIR, "PREP_CAOM", "lib", "CAOMxml.py"),
+          }
+
+#--------------------
+
+def load_copy(name):
+    """ Load one copy of the CAOM XML module from its file.
+
+    :param name:  The key of the copy in COPIES.
+    :type name:  str
+    """
+
+    spec = importlib.util.spec_from_file_location("_test_" + name,
+                                                  COPIES[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+#--------------------
+
+class CAOMxmlBuilderTests(object):
+    """ Tests for building CAOM XML templates, for either copy. """
+
+    caom = None
+
+    def _entries(self):
+        """ Make entries with nested and missing parents. """
+        target = self.caom.CAOMxml("targetPosition")
+        target.parent = "metadataList"
+        coords = self.caom.CAOMvalue("coordinates")
+        coords.parent = "targetPosition"
+        coords.value = "0 0"
+        name = self.caom.CAOMheader("name")
+        name.parent = "provenance"
+        name.headerKeyword = "TARGET"
+        orphan = self.caom.CAOMvalue("orphan")
+        orphan.parent = "missing"
+        orphan.value = "1"
+        products = [self.caom.CAOMproduct() for _ in range(3)]
+        return [target, coords, name, orphan] + products
+
+    def test_same_tree(self):
+        """ Test that the builder matches CAOMxml.send_to_lxml. """
+        entries = sorted(self._entries())
+        composite = etree.Element("CompositeObservation")
+        xmltree = etree.ElementTree(composite)
+        for section in ["metadataList", "provenance", "productList"]:
+            etree.SubElement(composite, section)
+        for entry in entries:
+            if xmltree.find(entry.label) is None:
+                entry.send_to_lxml(xmltree)
+
+        builder = self.caom.CAOMxmlBuilder()
+        for entry in entries:
+            if builder.find(entry.label) is None:
+                builder.add(entry)
+
+        self.assertEqual(etree.tostring(builder.tree, pretty_print=True),
+                         etree.tostring(xmltree, pretty_print=True))
+        self.assertIsNotNone(builder.find("missing"))
+        self.assertEqual(len(builder.find("productList")), 3)
+
+    def test_streamed_write(self):
+        """ Test that streaming products writes the same file. """
+        entries = sorted(self._entries())
+        products = [e for e in entries
+                    if isinstance(e, self.caom.CAOMproduct)]
+        expected = self.caom.CAOMxmlBuilder()
+        streamed = self.caom.CAOMxmlBuilder()
+        for entry in entries:
+            expected.add(entry)
+            if not isinstance(entry, self.caom.CAOMproduct):
+                streamed.add(entry)
+
+        expected_file = io.BytesIO()
+        expected.write(expected_file)
+        streamed_file = io.BytesIO()
+        streamed.write(streamed_file, streams={"productList": products})
+        self.assertEqual(streamed_file.getvalue(), expected_file.getvalue())
+        self.assertEqual(len(streamed.find("productList")), 0)
+
+    def test_write_caom_xml(self):
+        """ Test that sections streamed with write_caom_xml match a tree
+        written in one go. """
+        builder = self.caom.CAOMxmlBuilder()
+        for entry in sorted(self._entries()):
+            builder.add(entry)
+        expected_file = io.BytesIO()
+        builder.write(expected_file)
+
+        root = builder.tree.getroot()
+        sections = [(child.tag, iter(child)) for child in root]
+        streamed_file = io.BytesIO()
+        self.caom.write_caom_xml(streamed_file, sections, root.tag)
+        self.assertEqual(streamed_file.getvalue(), expected_file.getvalue())
+
+#--------------------
+
+class CAOMxmlListTests(object):
+    """ Tests for the indexes of CAOMxmlList, for either copy. """
+
+    caom = None
+
+    def setUp(self):
+        """ Make a list with repeated labels and header keywords. """
+        self.caomlist = self.caom.CAOMxmlList()
+        self.members = []
+        for label, keyword in [("a", "KEY1"), ("b", "KEY2"), ("a", "KEY1"),
+                               ("c", None)]:
+            member = self.caom.CAOMheader(label)
+            member.headerKeyword = keyword
+            self.caomlist.add(member)
+            self.members.append(member)
+        self.value = self.caom.CAOMvalue("d")
+        self.caomlist.add(self.value)
+
+    def test_find(self):
+        """ Test that the first matching member is found. """
+        self.assertIs(self.caomlist.findlabel("a"), self.members[0])
+        self.assertIs(self.caomlist.findlabel("d"), self.value)
+        self.assertIsNone(self.caomlist.findlabel("e"))
+        self.assertIs(self.caomlist.findheader("KEY1"), self.members[0])
+        self.assertIsNone(self.caomlist.findheader("d"))
+        self.assertEqual(self.caomlist.labels, ["a", "b", "a", "c", "d"])
+        with self.assertRaises(TypeError):
+            self.caomlist.add("a")
+
+    def test_relabel(self):
+        """ Test that relabelled members are found in list order. """
+        self.caomlist.relabel(self.members[0], "c")
+        self.assertIs(self.caomlist.findlabel("a"), self.members[2])
+        self.assertIs(self.caomlist.findlabel("c"), self.members[0])
+        self.caomlist.relabel(self.members[2], "b")
+        self.assertIsNone(self.caomlist.findlabel("a"))
+        self.assertIs(self.caomlist.findlabel("b"), self.members[1])
+        with self.assertRaises(ValueError):
+            self.caomlist.relabel(self.caom.CAOMvalue("d"), "e")
+
+#--------------------
+
+class TestCAOMxmlBuilder(CAOMxmlBuilderTests, unittest.TestCase):
+    """ Main test class for building CAOM XML templates with lib.CAOMXML. """
+
+    caom = load_copy("CAOMXML")
+
+class TestPrepCAOMxmlBuilder(CAOMxmlBuilderTests, unittest.TestCase):
+    """ Main test class for building CAOM XML templates with the PREP_CAOM
+    copy. """
+
+    caom = load_copy("CAOMxml")
+
+class TestCAOMxmlList(CAOMxmlListTests, unittest.TestCase):
+    """ Main test class for the indexes of lib.CAOMXML.CAOMxmlList. """
+
+    caom = load_copy("CAOMXML")
+
+class TestPrepCAOMxmlList(CAOMxmlListTests, unittest.TestCase):
+    """ Main test class for the indexes of the PREP_CAOM CAOMxmlList. """
+
+    caom = load_copy("CAOMxml")
+
+#--------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+.. module:: _test_fitskeyword.py
+
+   :synopsis: Test module for lib/FitsKeyword.py, and the FitsKeywordList
+       DataFrame and Parquet functions.
+
+   Run from the MAST_HLSP directory:  python -m pytest lib/_test_fitskeyword.py
+"""
+
+import importlib.util
+import os
+import tempfile
+import unittest
+from lib import FitsKeyword
+
+# Parquet files need one of these packages.
+HAS_PARQUET = any(importlib.util.find_spec(engine)
+                  for engine in ['pyarrow', 'fastparquet'])
+
+# --------------------
+
+
+class TestFitsKeywordList(unittest.TestCase):
+    """
+    Test class for the indexes of a FitsKeywordList.
+    """
+
+    def setUp(self):
+        """ Make a list where two FITS keywords share a CAOM keyword. """
+        self.kw_list = FitsKeyword.FitsKeywordList('timeseries', 'k2', {
+            'TELESCOP': {'caom_keyword': 'telescope_name'},
+            'TELESCP2': {'caom_keyword': 'telescope_name'},
+            'INSTRUME': {'caom_keyword': 'instrument_name'},
+            })
+
+    def test_find(self):
+        """ Test finding keywords as members are added and removed. """
+        self.assertEqual(len(self.kw_list), 3)
+        self.assertEqual(self.kw_list.find_caom('telescope_name').fits_keyword,
+                         'TELESCOP')
+        self.kw_list.add(FitsKeyword.FitsKeyword(
+            'TELESCOP', parameters={'caom_keyword': 'telescope_name',
+                                    'header': 1}))
+        self.assertEqual([kw.fits_keyword for kw in self.kw_list.keywords],
+                         ['TELESCP2', 'INSTRUME', 'TELESCOP'])
+        self.assertEqual(self.kw_list.find_caom('telescope_name').fits_keyword,
+                         'TELESCP2')
+        self.assertEqual(self.kw_list.find_fits('TELESCOP').header, 1)
+        self.kw_list.remove(FitsKeyword.FitsKeyword('TELESCP2'))
+        self.kw_list.remove(FitsKeyword.FitsKeyword('TELESCOP'))
+        self.assertIsNone(self.kw_list.find_fits('TELESCOP'))
+        self.assertIsNone(self.kw_list.find_caom('telescope_name'))
+
+    def test_update(self):
+        """ Test that updates keep the CAOM keyword index current. """
+        updates = FitsKeyword.FitsKeywordList.empty_list()
+        updates.add(FitsKeyword.FitsKeyword(
+            'TELESCOP', parameters={'caom_keyword': 'instrument_name'}))
+        updates.add(FitsKeyword.FitsKeyword('FILTER'))
+        self.kw_list.update_list(updates)
+        self.assertEqual(self.kw_list.find_caom('telescope_name').fits_keyword,
+                         'TELESCP2')
+        instrument = self.kw_list.find_caom('instrument_name')
+        self.assertEqual(instrument.fits_keyword, 'TELESCOP')
+        self.assertEqual(len(self.kw_list.diff(updates)), 2)
+
+    def test_extra_attributes(self):
+        """ Test that attributes outside the standard ones are kept. """
+        keyword = FitsKeyword.FitsKeyword('FILTER', parameters={'note': 'x'})
+        self.assertTrue(keyword.update({'other': 1}))
+        self.assertEqual(keyword.copy().as_dict()['FILTER']['note'], 'x')
+        self.assertEqual(keyword.as_dict()['FILTER']['other'], 1)
+
+    def test_dataframe(self):
+        """ Test the round trip through a DataFrame, and frame operations. """
+        self.kw_list.find_fits('INSTRUME').update({'note': 'x',
+                                                   'default': 5})
+        pdframe = self.kw_list.to_dataframe()
+        self.assertEqual(list(pdframe.fits_keyword),
+                         ['TELESCOP', 'TELESCP2', 'INSTRUME'])
+        copied = FitsKeyword.FitsKeywordList.from_dataframe(pdframe)
+        self.assertEqual(copied.standard_type, 'k2')
+        self.assertEqual([kw.as_dict() for kw in copied],
+                         [kw.as_dict() for kw in self.kw_list])
+
+        standard = FitsKeyword.FitsKeywordList('timeseries', 'k2', {
+            'TELESCOP': {'caom_keyword': 'telescope_name'},
+            'INSTRUME': {'caom_keyword': 'instrument_name'},
+            })
+        diff = FitsKeyword.diff_frames(pdframe, standard.to_dataframe())
+        self.assertEqual(list(diff.fits_keyword),
+                         [kw.fits_keyword for kw in
+                          self.kw_list.diff(standard)])
+
+        found = FitsKeyword.filter_frame(
+            pdframe, caom_keyword=['telescope_name', 'other'],
+            fits_keyword='TELESCP2')
+        self.assertEqual(list(found.fits_keyword), ['TELESCP2'])
+        filled = FitsKeyword.fill_column(pdframe, 'default', 0)
+        self.assertEqual(list(filled.default), [0, 0, 5])
+
+    def test_diff_frames_none(self):
+        """ Test that an extra attribute set to None differs from one that
+        is not set, as in diff(). """
+        self.kw_list.find_fits('TELESCOP').update({'note': None})
+        self.kw_list.find_fits('INSTRUME').update({'note': 'x'})
+        standard = FitsKeyword.FitsKeywordList('timeseries', 'k2', {
+            'TELESCOP': {'caom_keyword': 'telescope_name'},
+            'TELESCP2': {'caom_keyword': 'telescope_name', 'note': None},
+            'INSTRUME': {'caom_keyword': 'instrument_name', 'note': 'x'},
+            })
+        for left, right in [(self.kw_list, standard),
+                            (standard, self.kw_list)]:
+            diff = FitsKeyword.diff_frames(left.to_dataframe(),
+                                           right.to_dataframe())
+            self.assertEqual(list(diff.fits_keyword),
+                             [kw.fits_keyword for kw in left.diff(right)])
+            self.assertEqual(len(diff), 2)
+            copied = FitsKeyword.FitsKeywordList.from_dataframe(
+                left.to_dataframe())
+            self.assertEqual([kw.as_dict() for kw in copied],
+                             [kw.as_dict() for kw in left])
+
+    @unittest.skipUnless(HAS_PARQUET, 'pyarrow or fastparquet not installed')
+    def test_parquet(self):
+        """ Test the round trip through a Parquet file. """
+        self.kw_list.find_fits('INSTRUME').update({'alternates': ['INST'],
+                                                   'default': 5})
+        self.kw_list.find_fits('TELESCOP').update({'note': None})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'keywords.parquet')
+            self.kw_list.to_parquet(path)
+            copied = FitsKeyword.FitsKeywordList.from_parquet(
+                path, 'timeseries', 'k2')
+        self.assertEqual([kw.as_dict() for kw in copied],
+                         [kw.as_dict() for kw in self.kw_list])
+
+# --------------------
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+.. module:: _test_templateregistry.py
+
+   :synopsis: Test module for the TemplateRegistry of parsed YAML templates,
+       and the YAML and binary sidecar functions in bin/read_yaml.py.
+
+   Run from the MAST_HLSP directory:
+       python -m pytest lib/_test_templateregistry.py
+"""
+
+import os
+import tempfile
+import unittest
+import unittest.mock
+from bin.read_yaml import read_sidecar, read_yaml, write_sidecar, write_yaml
+from lib.TemplateRegistry import TemplateRegistry
+
+#--------------------
+
+class TestReadYaml(unittest.TestCase):
+    """ Main test class for reading and writing YAML and binary sidecars. """
+
+    def setUp(self):
+        """ Write a small YAML file with a sidecar. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "test.hlsp")
+        self.contents = {"HlspName": "test",
+                         "KeywordUpdates": [{"KEY": {"header": 0}}],
+                         "UniqueParameters": {"provenance": {"name": "T"}}}
+        write_yaml(self.contents, self.path)
+        write_sidecar(self.contents, self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sidecar(self):
+        """ Test that the sidecar holds the same contents as the YAML. """
+        self.assertEqual(read_yaml(self.path, output=False), self.contents)
+        self.assertEqual(read_sidecar(self.path), self.contents)
+
+    def test_stale_sidecar(self):
+        """ Test that a sidecar is not used once the YAML file changes. """
+        with open(self.path, 'a') as ofile:
+            ofile.write("Extra: 1\n")
+        self.assertIsNone(read_sidecar(self.path))
+        os.remove(self.path + ".pickle")
+        self.assertIsNone(read_sidecar(self.path))
+
+#--------------------
+
+class TestTemplateRegistry(unittest.TestCase):
+    """ Main test class for the TemplateRegistry of parsed YAML templates. """
+
+    def setUp(self):
+        """ Write a small FITS standard template. """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.tmp_dir.name, "timeseries_test.yml")
+        self._write_template("A")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_template(self, value, mtime=None):
+        """ Write the template with a given keyword value. """
+        with open(self.template, 'w') as ofile:
+            ofile.write("PRODUCT: timeseries\nSTANDARD: test\nKEYWORDS:\n"
+                        "  KEY:\n    default: " + value + "\n")
+        if mtime is not None:
+            os.utime(self.template, ns=(mtime, mtime))
+
+    def test_parsed_once(self):
+        """ Test that a new registry reuses templates from the cache file. """
+        registry = TemplateRegistry(self.tmp_dir.name)
+        self.assertEqual(registry.standards(), ["timeseries_test"])
+        first = registry.template("timeseries_test")
+        first["KEYWORDS"]["KEY"]["default"] = "changed"
+        self.assertEqual(
+            registry.template("timeseries_test")["KEYWORDS"]["KEY"],
+            {"default": "A"})
+        self.assertTrue(os.path.isfile(registry.cache_file))
+        with unittest.mock.patch("yaml.load") as yaml_load:
+            reloaded = TemplateRegistry(self.tmp_dir.name)
+            keyword_list = reloaded.keyword_list("timeseries_test")
+        yaml_load.assert_not_called()
+        self.assertEqual(keyword_list.standard_type, "test")
+
+    def test_changed_template(self):
+        """ Test that templates are only parsed again if they changed. """
+        registry = TemplateRegistry(self.tmp_dir.name)
+        mtime = os.stat(self.template).st_mtime_ns
+        registry.template("timeseries_test")
+        self._write_template("A", mtime=mtime + 10**9)
+        with unittest.mock.patch("yaml.load") as yaml_load:
+            registry.template("timeseries_test")
+        yaml_load.assert_not_called()
+        self._write_template("B", mtime=mtime + 2*10**9)
+        template = registry.template("timeseries_test")
+        self.assertEqual(template["KEYWORDS"]["KEY"], {"default": "B"})
+
+#--------------------
+
+if __name__ == "__main__":
+    unittest.main()